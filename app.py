@@ -1,44 +1,102 @@
-import random
-import json
+import serving
+serving.patch()
+
+import atexit
+import collections
 import generate_qr
+import logging
+import logs
+import metrics
 import os
-import secrets
-from flask import Flask, render_template, request
-from flask_socketio import SocketIO, emit, join_room, leave_room
+import signal
+import socket
+import sys
 import threading
+from flask import Flask, Response, jsonify, render_template, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from clock_sync import ClockSync
+from game_history import PERIODS, GameHistory
+from game_room import GameRoom, RoomRegistry, normalize_room_name
+from log_writer import LogWriter
+from presence import Presence
+from question_bank import load_bank
+from question_history import QuestionHistory
+from question_stats import BANDS, UNRATED, QuestionStats
+from sampler import BucketSampler
+from scheduler import Scheduler
+from snapshots import Snapshotter
+from state_store import open_store
 import time
 
 app = Flask(__name__)
-socketio = SocketIO(app)
-GAMESTATES = {
-    'lobby',
-    'question',
-    'anticipation',
-    'answer',
-    'leaderboard',
-    'epilogue',
-}
-
-
-def is_game_started():
-    if not game_state:
-        return False
-    if game_state.get('current_question') is not None:
-        return True
-    idx = game_state.get('current_question_index')
-    return isinstance(idx, int) and 0 <= idx < len(questions)
-
-
-# Load questions from JSON file
-with open('questions.json', 'r') as f:
-    all_questions = json.load(f)['questions']
-
-# Add 'correct' index to each question (assuming first answer is correct)
-for q in all_questions:
-    q['correct'] = 0
-
-QUESTIONS_LOG_PATH = 'questions_asked.jsonl'
-questions = []
+log = logging.getLogger('quiz.app')
+# Rooms live in this process by default. With STATE_STORE=redis://... every
+# process behind the load balancer shares them, and MESSAGE_QUEUE (the same
+# Redis unless set) relays each socketio.emit to the other processes.
+STATE_STORE = os.getenv('STATE_STORE', 'memory')
+MESSAGE_QUEUE = os.getenv('MESSAGE_QUEUE') or (
+    STATE_STORE if STATE_STORE.startswith('redis://') else None)
+NODE_ID = os.getenv('NODE_ID') or f'{socket.gethostname()}-{os.getpid()}'
+state_store = open_store(STATE_STORE)
+# Engine.IO pings every socket and drops those that stop answering, which
+# is what raises the disconnect handler for a vanished client.
+socketio = SocketIO(
+    app,
+    async_mode=serving.ASYNC_MODE,
+    message_queue=MESSAGE_QUEUE,
+    ping_interval=float(os.getenv('PING_INTERVAL', '20')),
+    ping_timeout=float(os.getenv('PING_TIMEOUT', '10')))
+scheduler = Scheduler(spawn=socketio.start_background_task)
+# Clocks are re-probed only while some room has a question running.
+clock_sync = ClockSync(socketio, scheduler, live=lambda: any(
+    room.question_live() for room in list(rooms.rooms.values())))
+presence = Presence()
+
+# A bank built with question_import.py is memory-mapped when present;
+# otherwise questions.json is parsed.
+QUESTIONS_INDEX_PATH = os.getenv('QUESTIONS_INDEX', 'questions.idx')
+question_bank = load_bank(QUESTIONS_INDEX_PATH, 'questions.json')
+
+QUESTIONS_LOG_PATH = os.getenv('QUESTIONS_LOG', 'questions_asked.jsonl')
+RECENT_HALF_LIFE_SECONDS = 60 * 60  # 1 hour
+# Asked questions are logged in batches from a background task. fsync is
+# 'always' (each batch), 'interval' (at most every second) or 'never'.
+question_history = QuestionHistory(
+    QUESTIONS_LOG_PATH,
+    writer=LogWriter(
+        QUESTIONS_LOG_PATH,
+        batch_size=int(os.getenv('QUESTION_LOG_BATCH', '256')),
+        flush_interval=float(os.getenv('QUESTION_LOG_FLUSH_INTERVAL', '0.2')),
+        fsync=os.getenv('QUESTION_LOG_FSYNC', 'interval'),
+        spawn=socketio.start_background_task,
+        offload=serving.run_blocking))
+atexit.register(question_history.close)
+# Every game, round, answer and final score, for past games and leagues.
+GAME_HISTORY_PATH = os.getenv('GAME_HISTORY_PATH', 'game_history.sqlite3')
+game_history = GameHistory(
+    GAME_HISTORY_PATH,
+    spawn=socketio.start_background_task,
+    offload=serving.run_blocking)
+atexit.register(game_history.close)
+# Accuracy, latency and distractor picks per question from real rounds.
+# A question moves to the easy, medium or hard bucket of the sampler as
+# its results come in.
+question_stats = QuestionStats(
+    GAME_HISTORY_PATH,
+    interval=float(os.getenv('QUESTION_STATS_INTERVAL', '10')),
+    min_answers=int(os.getenv('QUESTION_STATS_MIN_ANSWERS', '10')),
+    on_band_change=lambda text, band: get_question_sampler().move(
+        question_bank.position(text), band),
+    spawn=socketio.start_background_task,
+    offload=serving.run_blocking)
+atexit.register(question_stats.close)
+question_sampler = None
+question_sampler_lock = threading.Lock()
+
+DEFAULT_ROOM = 'main'
+MAX_GAME_QUESTIONS = 100
+# Minimum gap between two broadcast frames to the same room or socket.
+BROADCAST_MIN_INTERVAL = float(os.getenv('BROADCAST_MIN_INTERVAL', '0.05'))
 
 
 @app.route('/')
@@ -46,249 +104,313 @@ def index():
     return render_template('index.html')
 
 
-def stop_timer_thread():
-    if game_state.get('timer_thread'):
-        game_state['timer_thread'].cancel()
-        game_state['timer_thread'] = None
-
-
-def stop_host_ping_thread():
-    if game_state.get('host_ping_thread'):
-        game_state['host_ping_thread'].cancel()
-        game_state['host_ping_thread'] = None
-
-
-def stop_intermission_thread():
-    if game_state.get('intermission_timer_thread'):
-        game_state['intermission_timer_thread'].cancel()
-        game_state['intermission_timer_thread'] = None
+def load_recent_question_times():
+    return question_history.times()
+
+
+def by_position(by_text):
+    result = {}
+    for text, value in by_text.items():
+        position = question_bank.position(text)
+        if position is not None:
+            result[position] = value
+    return result
+
+
+def get_question_sampler():
+    global question_sampler
+    if question_sampler is not None:
+        return question_sampler
+    # Built once, by whichever room asks first; the others wait for it.
+    with question_sampler_lock:
+        if question_sampler is None:
+            # Keyed by position in the bank, filed by category, ordered by
+            # iq inside it, tagged with the difficulty band from real
+            # results. Only questions already asked or rated are looked up
+            # by text; the rest come from the bank's columns undecoded.
+            times = by_position(load_recent_question_times())
+            bands = by_position(question_stats.bands())
+            question_sampler = BucketSampler.build(
+                RECENT_HALF_LIFE_SECONDS,
+                ((position, category, iq, bands.get(position, UNRATED),
+                  times.get(position, 0))
+                 for position, category, iq in question_bank.rows()),
+                now=time.time())
+    return question_sampler
+
+
+def sampler_filter(question_filter, difficulty=True):
+    return {
+        'buckets': question_filter.get('categories'),
+        'bands': ((question_filter['difficulty'],)
+                  if difficulty and question_filter.get('difficulty')
+                  else None),
+        'ranks': question_filter.get('iq'),
+    }
 
 
-def ensure_host_token():
-    if not game_state.get('host_token'):
-        game_state['host_token'] = secrets.token_urlsafe(6)
-    return game_state['host_token']
+def question_filter(data):
+    # The host's game settings: categories, an iq range, a difficulty band
+    # and how many questions. Returns (filter, error); the filter is None
+    # when the game takes any question.
+    if not isinstance(data, dict):
+        return None, None
+    sampler = get_question_sampler()
+    result = {}
+    categories = data.get('categories')
+    if isinstance(categories, str):
+        categories = [categories]
+    if categories:
+        if not isinstance(categories, list) or not all(
+                isinstance(c, str) for c in categories):
+            return None, 'Categories must be names.'
+        names = {name.casefold(): name for name in sampler.buckets if name}
+        unknown = [c for c in categories if c.casefold() not in names]
+        if unknown:
+            return None, f'Unknown category: {", ".join(unknown)}.'
+        result['categories'] = sorted({names[c.casefold()] for c in categories})
+    iq_range = [data.get('iq_min'), data.get('iq_max')]
+    if iq_range != [None, None]:
+        if not all(value is None or (isinstance(value, (int, float)) and
+                                     not isinstance(value, bool))
+                   for value in iq_range):
+            return None, 'The IQ range must be numbers.'
+        if None not in iq_range and iq_range[0] > iq_range[1]:
+            return None, 'The IQ range is empty.'
+        result['iq'] = iq_range
+    difficulty = data.get('difficulty')
+    if difficulty:
+        if difficulty not in BANDS:
+            return None, f'Unknown difficulty {difficulty!r}.'
+        result['difficulty'] = difficulty
+    count = data.get('count')
+    if count is not None:
+        if (not isinstance(count, int) or isinstance(count, bool) or
+                not 1 <= count <= MAX_GAME_QUESTIONS):
+            return None, f'Question count must be 1-{MAX_GAME_QUESTIONS}.'
+        result['count'] = count
+    if not result:
+        return None, None
+    # Difficulty is a preference: bands fill up as results come in.
+    if not sampler.count(**sampler_filter(result, difficulty=False)):
+        return None, 'No questions match those settings.'
+    return result, None
+
+
+def select_single_question(question_filter=None):
+    sampler = get_question_sampler()
+    now = time.time()
+    picked = None
+    if question_filter:
+        picked = sampler.sample(now, **sampler_filter(question_filter))
+        if picked is None and question_filter.get('difficulty'):
+            # Nothing rated in that band matches yet.
+            picked = sampler.sample(
+                now, **sampler_filter(question_filter, difficulty=False))
+    if picked is None:
+        picked = sampler.sample(now)
+    if picked is None:
+        return None
+    return question_bank[picked]
 
 
-def set_gamestate(state, broadcast=True):
-    if state not in GAMESTATES:
-        return
-    game_state['gamestate'] = state
-    if broadcast:
-        socketio.emit('gamestate', {'state': state})
+def log_question_asked(question_text):
+    timestamp = question_history.record(question_text)
+    get_question_sampler().touch(question_bank.position(question_text), timestamp)
+
+
+def create_room(name, registry):
+    room = GameRoom(
+        name,
+        socketio,
+        scheduler,
+        select_question=lambda: select_single_question(
+            room.state.get('question_filter')),
+        log_question=lambda text: log_question_asked(text),
+        question_pool=question_bank,
+        registry=registry,
+        broadcast_interval=BROADCAST_MIN_INTERVAL,
+        store=state_store,
+        node_id=NODE_ID,
+        history=game_history,
+        question_stats=question_stats,
+        clock_sync=clock_sync)
+    return room
+
+
+# Any ?room= name opens a room: cap them, and drop one nobody has been
+# connected to for ROOM_IDLE_SECONDS.
+MAX_ROOMS = int(os.getenv('MAX_ROOMS', '1000'))
+ROOM_IDLE_SECONDS = float(os.getenv('ROOM_IDLE_SECONDS', '600'))
+rooms = RoomRegistry(create_room, max_rooms=MAX_ROOMS,
+                     idle_after=ROOM_IDLE_SECONDS, keep={DEFAULT_ROOM})
+atexit.register(rooms.release_leases)
+# Rooms are written to SNAPSHOT_DIR every SNAPSHOT_INTERVAL seconds and on
+# exit, and restored on the next start.
+snapshotter = Snapshotter(
+    os.getenv('SNAPSHOT_DIR', 'snapshots'),
+    rooms,
+    interval=float(os.getenv('SNAPSHOT_INTERVAL', '5')),
+    spawn=socketio.start_background_task,
+    offload=serving.run_blocking)
+
+# Read off live state when /metrics is scraped, so they cost nothing in
+# between.
+metrics.Gauge(
+    'quiz_connected_sockets', 'Sockets connected to this process.',
+    function=lambda: presence.stats()['connected'])
+metrics.Gauge(
+    'quiz_room_players', 'Players in each room.', ('room',),
+    function=lambda: {name: room.presence()['players']
+                      for name, room in list(rooms.rooms.items())})
+metrics.Gauge(
+    'quiz_room_players_online', 'Players online in each room.', ('room',),
+    function=lambda: {name: room.presence()['online']
+                      for name, room in list(rooms.rooms.items())})
+metrics.Gauge(
+    'quiz_question_log_queue_depth',
+    'Asked questions waiting to be written to the question log.',
+    function=lambda: question_history.writer.queue_depth())
+
+
+def room_for(data):
+    if not isinstance(data, dict):
+        return None
+    token = data.get('host_token')
+    room = rooms.by_token(token)
+    if room is None:
+        # Another process may have reset the room since we last synced it.
+        room = rooms.by_sid(request.sid)
+        if room is None or not room.has_token(token):
+            return None
+    return room
+
+
+@app.route('/api/leaderboard')
+def leaderboard():
+    name = normalize_room_name(request.args.get('room'), DEFAULT_ROOM)
+    room = rooms.get(name)
+    if room is None:
+        return jsonify({'error': 'Unknown room.'}), 404
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(200, max(1, request.args.get('limit', 50, type=int)))
+    return jsonify(room.leaderboard_page(offset, limit))
+
+
+@app.route('/api/scheduler')
+def scheduler_stats():
+    return jsonify(scheduler.stats())
+
+
+@app.route('/api/question_log')
+def question_log_stats():
+    return jsonify(question_history.writer.stats())
+
+
+@app.route('/api/clock')
+def clock_stats():
+    return jsonify(clock_sync.stats())
+
+
+@app.route('/api/history')
+def history_stats():
+    return jsonify(game_history.stats())
+
+
+@app.route('/api/history/player/<name>')
+def player_history(name):
+    limit = min(200, max(1, request.args.get('limit', 20, type=int)))
+    return jsonify(game_history.player_history(name, limit))
+
+
+@app.route('/api/history/question')
+def question_history_stats():
+    text = request.args.get('text')
+    if not text:
+        return jsonify({'error': 'Missing question text.'}), 400
+    return jsonify(game_history.question_stats(text))
+
+
+@app.route('/api/history/leaderboard')
+def history_leaderboard():
+    period = request.args.get('period')
+    if period is not None and period not in PERIODS:
+        return jsonify({'error': f'Unknown period {period!r}.'}), 400
+    since = request.args.get('since', type=float)
+    until = request.args.get('until', type=float)
+    limit = min(200, max(1, request.args.get('limit', 20, type=int)))
+    try:
+        return jsonify(game_history.leaderboard(since, until, limit, period))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
 
 
-def ensure_fake_players():
-    if game_state.get('players'):
-        return
-    game_state['players'] = {
-        'Alice': {'score': 10, 'sid': None, 'ip': 'debug'},
-        'Bob': {'score': 20, 'sid': None, 'ip': 'debug'},
-        'Charle': {'score': 30, 'sid': None, 'ip': 'debug'},
-    }
+@app.route('/api/questions/stats')
+def question_stats_summary():
+    stats = question_stats.stats()
+    bands = collections.Counter()
+    for sizes in get_question_sampler().sizes().values():
+        bands.update(sizes)
+    stats['sampler'] = dict(bands)
+    return jsonify(stats)
 
 
-def broadcast_host_session():
-    socketio.emit('host_session', {'token': ensure_host_token()})
+@app.route('/api/questions/categories')
+def question_categories():
+    sizes = get_question_sampler().sizes()
+    return jsonify([
+        {'category': name, 'questions': sum(bands.values()), 'bands': bands}
+        for name, bands in sorted(
+            sizes.items(), key=lambda item: (item[0] is None, item[0] or ''))])
 
 
-def start_host_ping_thread():
-    def ping():
-        socketio.emit('host_ping', {'token': ensure_host_token()})
-        game_state['host_ping_thread'] = threading.Timer(5, ping)
-        game_state['host_ping_thread'].start()
+@app.route('/api/questions/stats/question')
+def question_stats_detail():
+    text = request.args.get('text')
+    if not text:
+        return jsonify({'error': 'Missing question text.'}), 400
+    question = question_bank.get(text)
+    if question is None:
+        return jsonify({'error': 'Unknown question.'}), 404
+    stats = question_stats.get(text, [
+        answer for i, answer in enumerate(question.answers)
+        if i != question.correct])
+    stats['iq'] = question.iq
+    return jsonify(stats)
 
-    if game_state.get('host_ping_thread') is None:
-        ping()
 
+@app.route('/api/snapshots')
+def snapshot_stats():
+    return jsonify(snapshotter.stats())
 
-def load_recent_question_times():
-    if not os.path.exists(QUESTIONS_LOG_PATH):
-        return {}
-    recent_times = {}
-    try:
-        with open(QUESTIONS_LOG_PATH, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    entry = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                question = entry.get('question')
-                timestamp = entry.get('timestamp')
-                if question and isinstance(timestamp, (int, float)):
-                    recent_times[question] = max(
-                        recent_times.get(question, 0), timestamp)
-    except OSError:
-        return {}
-    return recent_times
-
-
-def weighted_sample(items, weights):
-    pool = list(zip(items, weights))
-    total = sum(w for _, w in pool)
-    r = random.uniform(0, total)
-    upto = 0
-    picked_idx = 0
-    for i, (_item, w) in enumerate(pool):
-        upto += w
-        if upto >= r:
-            picked_idx = i
-            break
-    picked_item, _ = pool.pop(picked_idx)
-    return picked_item
-
-
-def select_single_question():
-    recent_times = load_recent_question_times()
-    now = time.time()
-    items = []
-    weights = []
-    for q in all_questions:
-        last_time = recent_times.get(q['question'], 0)
-        age = max(0, now - last_time)
-        RECENT_HALF_LIFE_SECONDS = 60 * 60  # 1 hour
-        weight = 1.0 - pow(2.718281828, -age / RECENT_HALF_LIFE_SECONDS)
-        items.append(q)
-        weights.append(weight)
-    return weighted_sample(items, weights)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
-def log_question_asked(question_text):
-    entry = {'question': question_text, 'timestamp': time.time()}
-    try:
-        with open(QUESTIONS_LOG_PATH, 'a') as f:
-            f.write(json.dumps(entry) + '\n')
-    except OSError:
-        pass
-
-
-def init_questions(count=5):
-    global questions
-    questions = list(all_questions)
-    random.shuffle(questions)
-    questions = questions[:count]
-    for q in questions:
-        answers = q.get('answers') or []
-        if not answers:
-            q['correct'] = 0
-        elif not (0 <= q.get('correct', 0) < len(answers)):
-            q['correct'] = 0
-
-
-def add_scores_for_correct_answers():
-    current_q = game_state.get('current_question')
-    if not current_q:
-        idx = game_state.get('current_question_index')
-        if isinstance(idx, int) and 0 <= idx < len(questions):
-            current_q = questions[idx]
-        else:
-            return
-    correct_answer_index = current_q['correct']
-
-    # Set intermission duration: 5s if 1 player, else 10s
-    intermission_duration = 5 if len(game_state['players']) == 1 else 10
-    game_state['intermission_duration'] = intermission_duration
-
-    # Prepare results for host screen
-    results = {
-        'next_question_time': time.time() + intermission_duration,
-        'intermission_duration': intermission_duration,
-        'question': current_q['question'],
-        'answers': current_q['answers'],
-        'correct_index': correct_answer_index,
-        'player_answers': {}
-    }
 
-    for _sid, answer_data in game_state['current_answers'].items():
-        username = answer_data['username']
-        chosen_answer_index = answer_data['answer_index']
-        answer_time = answer_data.get('time', time.time())
-
-        results['player_answers'][username] = {
-            'chosen_index': chosen_answer_index,
-            'is_correct': (chosen_answer_index == correct_answer_index)
-        }
-        if chosen_answer_index == correct_answer_index:
-            # Score based on time remaining (end_time - answer_time)
-            time_left = max(
-                0, int(
-                    game_state.get(
-                        'end_time', time.time()) - answer_time))
-            game_state['players'][username]['score'] += (100 + time_left)
-
-    socketio.emit('round_results', results)
-    set_gamestate('answer')
-    send_player_details()
-
-
-def process_answers():
-    if game_state.get('answers_processed'):
-        return
-    game_state['answers_processed'] = True
-    stop_timer_thread()
-
-    # Calculate scores first to set intermission_duration
-    add_scores_for_correct_answers()
-    game_state['current_answers'] = {}
-
-    # Start intermission timer
-    set_gamestate('anticipation')
-    duration = game_state.get('intermission_duration', 20)
-    game_state['intermission_active'] = True
-    game_state['intermission_timer_thread'] = threading.Timer(
-        duration, auto_next_question, args=[
-            game_state['current_question_index'] + 1])
-    game_state['intermission_timer_thread'].start()
-
-
-def resolve_scores():
-    sorted_players = sorted(
-        game_state['players'].items(),
-        key=lambda item: item[1]['score'],
-        reverse=True)
-    winning_players_list = []
-    if sorted_players:
-        top_score = sorted_players[0][1]['score']
-        if top_score == 0:
-            top_score += 1  # Prevent all zero score winners
-        winning_players_list = [
-            player[0] for player in sorted_players if player[1]['score'] == top_score]
-    return sorted_players, winning_players_list
-
-
-def send_player_details():
-    sorted_players, winning_players_list = resolve_scores()
-    socketio.emit('player_list', {
-        'players': dict(sorted_players),
-        'winning_players': winning_players_list
-    })
-
-
-def auto_next_question(target_index):
-    with app.app_context():
-        next_question(target_index)
+@app.route('/api/presence')
+def presence_stats():
+    stats = presence.stats()
+    stats['rooms'] = {
+        name: room.presence() for name, room in list(rooms.rooms.items())}
+    return jsonify(stats)
 
 
 @socketio.on('connect')
 def test_connect():
-    print('Client connected')
-    emit('host_session', {'token': ensure_host_token()})
-    send_player_details()
-    if game_state.get('gamestate'):
-        emit('gamestate', {'state': game_state['gamestate']})
-    if is_game_started():
-        index = game_state['current_question_index']
-        question_data = game_state.get('current_question')
-        if question_data:
-            emit('question', {**question_data, 'index': index})
-    if game_state.get('end_time') and game_state['end_time'] > time.time():
-        emit('timer', {
-            'end_time': game_state['end_time'],
-            'duration': game_state['duration'],
-        })
+    logs.event(log, 'connect', 'Client connected', sid=request.sid)
+    metrics.CONNECTS.inc()
+    name = normalize_room_name(request.args.get('room'), DEFAULT_ROOM)
+    room = rooms.get_or_create(name)
+    if room is None:
+        logs.event(log, 'room_limit', 'Refused %s: room limit reached', name,
+                   level=logging.WARNING, sid=request.sid)
+        return False
+    join_room(room.name)
+    rooms.bind_sid(request.sid, room)
+    room.send_session(request.sid)
+    presence.connect(request.sid)
 
 
 @socketio.on('time_ping')
@@ -297,264 +419,148 @@ def time_ping(data):
     emit('time_pong', {'client_ts': client_ts, 'server_ts': time.time()})
 
 
+@socketio.on('heartbeat')
+def heartbeat(_data=None):
+    presence.seen(request.sid)
+
+
+@socketio.on('clock_reply')
+def clock_reply(data):
+    presence.seen(request.sid)
+    if isinstance(data, dict):
+        clock_sync.reply(request.sid, data.get('id'), data.get('client_ts'))
+
+
 @socketio.on('disconnect')
 def test_disconnect():
-    print('Client disconnected')
+    presence.disconnect(request.sid)
+    clock_sync.remove(request.sid)
+    room = rooms.unbind_sid(request.sid)
+    if room is not None:
+        room.player_disconnected(request.sid)
+        room.stop_typing(request.sid)
+        room.broadcaster.discard(request.sid)
+    logs.event(log, 'disconnect', 'Client disconnected', sid=request.sid)
+    metrics.DISCONNECTS.inc()
 
 
 @socketio.on('join')
 def handle_join(data):
-    username = data['username']
-    client_ip = request.remote_addr
-    if data.get('host_token') != game_state.get('host_token'):
+    room = room_for(data)
+    if room is None:
         emit('error', {'message': 'Host session mismatch. Please rejoin.'})
         return
+    current = rooms.by_sid(request.sid)
+    if current is not room:
+        if current is not None:
+            leave_room(current.name)
+        join_room(room.name)
+        rooms.bind_sid(request.sid, room)
+    if room.join(data['username'], request.sid, request.remote_addr):
+        clock_sync.add(request.sid)
+    room.stop_typing(request.sid)
 
-    if username not in game_state['players']:
-        is_first_player = len(game_state['players']) == 0
-        game_state['players'][username] = {
-            'score': 3 if is_first_player else 0,
-            'sid': request.sid,
-            'ip': client_ip
-        }
-        join_room(username)
-        emit('joined', {'username': username})  # Emit to the joining player
-        socketio.emit('player_joined', {'username': username})
-        print(f'{username} joined the game from {client_ip}.')
-    else:
-        # Check if it's the same user re-joining
-        if game_state['players'][username].get('ip') == client_ip:
-            game_state['players'][username]['sid'] = request.sid
-            join_room(username)
-            emit('joined', {'username': username})
-            socketio.emit('player_joined', {'username': username})
-            print(f'{username} re-joined the game from {client_ip}.')
-        else:
-            emit('error', {'message': 'Username already taken.'})
-            return
-
-    send_player_details()
-
-    if is_game_started():
-        index = game_state['current_question_index']
-        question_data = game_state.get('current_question')
-        if question_data:
-            # Send index to allow frontend to track it
-            emit('question', {**question_data, 'index': index})
-    if game_state.get('end_time') and game_state['end_time'] > time.time():
-        emit('timer', {
-            'end_time': game_state['end_time'],
-            'duration': game_state['duration'],
-        })
+
+@socketio.on('player_list_sync')
+def handle_player_list_sync(data):
+    room = room_for(data)
+    if room is not None:
+        room.send_player_snapshot(request.sid)
 
 
 @socketio.on('set_gamestate')
 def handle_set_gamestate(data):
-    if data.get('host_token') != game_state.get('host_token'):
-        return
-    state = data.get('state')
-    if state == 'lobby':
-        stop_timer_thread()
-        stop_intermission_thread()
-        game_state['current_question_index'] = -1
-        game_state['current_question'] = None
-        game_state['current_answers'] = {}
-        game_state['answers_processed'] = False
-        game_state['intermission_active'] = False
-        game_state['end_time'] = None
-        game_state['duration'] = None
-        set_gamestate('lobby', broadcast=True)
-        socketio.emit('clear_question')
-        return
-    if state == 'question':
-        ensure_fake_players()
-        if not is_game_started():
-            start_game()
-        else:
-            set_gamestate('question', broadcast=True)
+    room = room_for(data)
+    if room is None:
         return
-    if state == 'answer':
-        ensure_fake_players()
-        if game_state.get('current_question') and not game_state.get('answers_processed'):
-            process_answers()
-        else:
-            set_gamestate('answer', broadcast=True)
-        return
-    if state in GAMESTATES and state != 'lobby':
-        ensure_fake_players()
-    set_gamestate(state, broadcast=True)
-    send_player_details()
+    room.apply_gamestate(data.get('state'))
 
 
 @socketio.on('typing_username')
 def handle_typing(data):
     username = data.get('username', '').strip()
-    print(f"DEBUG: Received typing_username from {request.sid}: '{username}'")
-    if username:
-        # Check if joining_players exists in game_state, if not initialize it
-        # or ignore
-        if 'joining_players' in game_state:
-            game_state['joining_players'][request.sid] = username
-
-
-def reset_game():
-    game_state['current_question_index'] = -1  # Reset for first question
-    game_state['current_answers'] = {}
-    game_state['current_question'] = None
-    game_state['answers_processed'] = False
-    game_state['intermission_active'] = False
-    game_state['intermission_timer_thread'] = None
-    game_state['timer_thread'] = None
-    game_state['end_time'] = None
-    game_state['duration'] = None
-    set_gamestate('lobby')
-    for player in game_state['players']:
-        game_state['players'][player]['score'] = 0  # Reset scores
-
-    init_questions()
+    logs.event(log, 'typing', 'Typing username %r', username,
+               level=logging.DEBUG, sid=request.sid)
+    room = room_for(data)
+    if room is not None:
+        room.note_typing(request.sid, username)
 
 
 @socketio.on('start_game')
-def start_game():
-    socketio.emit('game_started')
-    set_gamestate('question')
-    next_question(0)
-
-
-game_state = None
+def start_game(data=None):
+    room = room_for(data)
+    if room is None:
+        return
+    settings, error = question_filter(data)
+    if error:
+        emit('error', {'message': error})
+        return
+    room.start_game(settings)
 
 
 @socketio.on('reset_all')
-def reset_all():
-    global game_state
-
-    if game_state is None:
-        game_state = {}
-    else:
-        game_state.clear()
-
-    stop_timer_thread()
-    stop_host_ping_thread()
-    # if 'players' not in game_state:
-    game_state['players'] = {}
-    game_state['host_token'] = secrets.token_urlsafe(6)
-
-    reset_game()
-
-    broadcast_host_session()
-    start_host_ping_thread()
-    socketio.emit('game_reset')
-    send_player_details()
-    print('Game and players fully reset.')
+def reset_all(data=None):
+    room = room_for(data)
+    if room is not None:
+        room.reset_all()
 
 
 @socketio.on('answer')
 def handle_answer(data):
-    username = data['username']
-    answer_index = data['answer_index']
-
-    # Check if timer is running (end_time > now)
-    if game_state.get('end_time') and time.time(
-    ) < game_state['end_time'] and username in game_state['players']:
-        game_state['current_answers'][request.sid] = {
-            'username': username,
-            'answer_index': answer_index,
-            'time': time.time()
-        }
-        print(f'{username} answered: {answer_index}')
-
-        # Check if all active players have answered
-        if len(game_state['current_answers']) == len(game_state['players']):
-            process_answers()
+    received_at = time.time()
+    room = room_for(data)
+    if room is not None:
+        answered_at = clock_sync.answer_time(
+            request.sid, data.get('client_ts'), received_at)
+        counted = room.record_answer(
+            request.sid, data['username'], data['answer_index'],
+            answered_at=answered_at)
+        metrics.ANSWERS.labels('counted' if counted else 'rejected').inc()
 
 
 @socketio.on('next_question')
-def next_question(question_index):
-
-    if question_index <= game_state['current_question_index']:
-        return  # Ignore if same question index or irregular jump back
-
-    # Check if intermission is active (manual skip)
-    if game_state.get('intermission_active'):
-        game_state['intermission_active'] = False
-        if game_state.get('intermission_timer_thread'):
-            game_state['intermission_timer_thread'].cancel()
-
-    print(f'Moving to question index: {question_index}')
-    if game_state['current_question_index'] != -1:
-        process_answers()
-
-    game_state['current_question_index'] = question_index
-    game_state['current_answers'] = {}  # Clear answers for new question
-    game_state['answers_processed'] = False
-
-    next_q = select_single_question()
-
-    if next_q is None:
-        game_state['game_started'] = False
-        set_gamestate('epilogue')
-        socketio.emit('game_over', game_state['players'])
-        print('Game over!')
-        return
-
-    game_state['current_question'] = next_q
-    question_data = game_state['current_question']
-    log_question_asked(question_data['question'])
-
-    # Get correct answer text before mutation
-    correct_answer_text = question_data['answers'][question_data['correct']]
-
-    # Separate correct and incorrect
-    incorrect_answers = [
-        a for i, a in enumerate(
-            question_data['answers']) if i != question_data['correct']]
-
-    # Limit to 3 random incorrect answers if there are more
-    if len(incorrect_answers) > 3:
-        incorrect_answers = random.sample(incorrect_answers, 3)
-
-    # Combine and shuffle
-    new_answers = [correct_answer_text] + incorrect_answers
-    random.shuffle(new_answers)
-
-    # Update the question object directly
-    question_data['answers'] = new_answers
-    question_data['correct'] = new_answers.index(correct_answer_text)
-
-    # Include index in payload
-    socketio.emit(
-        'question', {
-            **question_data, 'index': game_state['current_question_index']})
-    set_gamestate('question')
-
-    duration = 25
-    game_state['duration'] = duration
-    game_state['end_time'] = time.time() + duration
-    game_state['timer_thread'] = threading.Timer(duration, process_answers)
-    game_state['timer_thread'].start()
-    socketio.emit('timer', {
-        'end_time': game_state['end_time'],
-        'duration': duration
-    })
-    print(f'Question {game_state["current_question_index"] + 1} started.')
+def next_question(data):
+    room = room_for(data)
+    if room is not None and isinstance(data.get('index'), int):
+        room.next_question(data['index'])
 
 
 if __name__ == '__main__':
+    # LOG_LEVEL, LOG_FORMAT (text or json) and LOG_SAMPLE, e.g.
+    # 'answer=0.1,connect=0.01' to keep one answer line in ten.
+    logs.setup(os.getenv('LOG_LEVEL', 'INFO'), os.getenv('LOG_FORMAT', 'text'),
+               os.getenv('LOG_SAMPLE', ''))
     # TODO we should not change prod code for tests
     is_pytest = os.getenv('PYTEST_CURRENT_TEST') is not None
     if not is_pytest:
         generate_qr.generate_qr()
-    reset_all()
+    question_history.load()
+    question_stats.load()
+    question_stats.start()
+    snapshotter.restore()
+    rooms.get_or_create(DEFAULT_ROOM)
+    scheduler.call_every(ROOM_IDLE_SECONDS / 10, rooms.evict_idle)
+    snapshotter.start()
+    atexit.register(snapshotter.close)
+    # Run the atexit handlers (final snapshot, lease release) on SIGTERM.
+    signal.signal(signal.SIGTERM, lambda *_args: sys.exit(0))
     port = int(os.getenv('PORT', '9145'))
-    debug = os.getenv('DEBUG', '1') == '1'
-    use_reloader = os.getenv('USE_RELOADER', '1') == '1'
     host = os.getenv('HOST')
     if not host:
         host = '127.0.0.1' if is_pytest else '0.0.0.0'
-    socketio.run(
-        app,
-        debug=debug,
-        host=host,
-        port=port,
-        allow_unsafe_werkzeug=True,
-        use_reloader=use_reloader)
+    if serving.ASYNC_MODE == 'threading':
+        debug = os.getenv('DEBUG', '1') == '1'
+        use_reloader = os.getenv('USE_RELOADER', '1') == '1'
+        socketio.run(
+            app,
+            debug=debug,
+            host=host,
+            port=port,
+            allow_unsafe_werkzeug=True,
+            use_reloader=use_reloader)
+    else:
+        limit = serving.raise_fd_limit()
+        logs.event(log, 'startup', 'Serving with %s on %s:%s',
+                   serving.ASYNC_MODE, host, port,
+                   max_connections=serving.MAX_CONNECTIONS, fd_limit=limit)
+        socketio.run(app, host=host, port=port, **serving.server_options())
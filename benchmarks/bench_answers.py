@@ -0,0 +1,96 @@
+import argparse
+import contextlib
+import io
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_room import GameRoom
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Answers per second into one room from concurrent handlers, "
+                    "every answer raced by duplicates from the other threads."
+    )
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    return parser.parse_args()
+
+
+class NullSocketIO:
+    def emit(self, *_args, **_kwargs):
+        pass
+
+
+class NullScheduler:
+    class Handle:
+        def cancel(self):
+            pass
+
+    def call_later(self, *_args):
+        return self.Handle()
+
+    call_every = call_later
+
+
+def open_round(players):
+    room = GameRoom(
+        "bench", NullSocketIO(), NullScheduler(),
+        select_question=lambda: None,
+        log_question=lambda _text: None,
+        question_pool=[])
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.reset_all()
+    room.state["players"] = {
+        f"p{i}": {"score": 0, "sid": f"sid{i}", "ip": "127.0.0.1"}
+        for i in range(players)
+    }
+    room.state["current_question_index"] = 0
+    room.state["current_question"] = {
+        "question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
+    room.state["end_time"] = time.time() + 60
+    return room
+
+
+def burst(players, threads):
+    room = open_round(players)
+    start = threading.Barrier(threads + 1)
+    counted = [0] * threads
+
+    def answer_all(offset):
+        start.wait()
+        for i in range(players):
+            i = (i + offset * 61) % players
+            if room.record_answer(f"sid{i}", f"p{i}", i % 2):
+                counted[offset] += 1
+
+    workers = [threading.Thread(target=answer_all, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - began, sum(counted)
+
+
+def main():
+    args = parse_args()
+    events = args.players * args.threads
+    print(f"players={args.players} threads={args.threads} answer events={events}")
+    print(f"{'round':>5} {'ms':>8} {'answers/s':>10} {'counted':>8} {'rejected':>9}")
+    for index in range(args.rounds):
+        elapsed, counted = burst(args.players, args.threads)
+        print(f"{index:>5} {elapsed * 1000:8.1f} {events / elapsed:10.0f} "
+              f"{counted:>8} {events - counted:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import socketio
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Load generator: live sockets and time_ping latency per ASYNC_MODE."
+    )
+    parser.add_argument("--modes", nargs="+",
+                        default=["threading", "eventlet", "gevent"])
+    parser.add_argument("--clients", type=int, default=2000,
+                        help="Stop ramping at this many connections.")
+    parser.add_argument("--step", type=int, default=100,
+                        help="Connections opened at once while ramping.")
+    parser.add_argument("--pings", type=int, default=5,
+                        help="time_ping round trips per client at full load.")
+    parser.add_argument("--port", type=int, default=9300)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    return parser.parse_args()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def start_server(mode, port, clients):
+    env = dict(os.environ, ASYNC_MODE=mode, PORT=str(port), HOST="127.0.0.1",
+               DEBUG="0", USE_RELOADER="0",
+               MAX_CONNECTIONS=str(clients * 2),
+               QUESTION_LOG_FSYNC="never")
+    server = subprocess.Popen(
+        [sys.executable, "app.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {server.returncode}")
+        try:
+            presence(port)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def presence(port):
+    with urllib.request.urlopen(
+            f"http://127.0.0.1:{port}/api/presence", timeout=5) as response:
+        return json.load(response)
+
+
+class Client:
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.pongs = {}
+        self.sio.on("time_pong", self.on_pong)
+        self.sio.on("clock_probe", self.on_probe)
+
+    async def on_pong(self, data):
+        waiter = self.pongs.pop(data.get("client_ts"), None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+    async def on_probe(self, data):
+        if self.sio.connected:
+            await self.sio.emit("clock_reply", {
+                "id": data.get("id"), "client_ts": time.time() * 1000})
+
+    async def connect(self):
+        try:
+            await self.sio.connect(
+                self.url, transports=["websocket"], wait_timeout=self.timeout)
+            return True
+        except Exception:
+            return False
+
+    async def ping(self):
+        key = time.time() * 1000
+        waiter = asyncio.get_running_loop().create_future()
+        self.pongs[key] = waiter
+        sent = time.perf_counter()
+        await self.sio.emit("time_ping", {"client_ts": key})
+        try:
+            received = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self.pongs.pop(key, None)
+            return None
+        return received - sent
+
+    async def pings(self, count):
+        samples = []
+        for _ in range(count):
+            sample = await self.ping()
+            if sample is not None:
+                samples.append(sample)
+        return samples, count - len(samples)
+
+
+async def load(port, args):
+    url = f"http://127.0.0.1:{port}?room=load"
+    connected = []
+    failed = 0
+    while len(connected) < args.clients:
+        batch = [Client(url, args.timeout)
+                 for _ in range(min(args.step, args.clients - len(connected)))]
+        results = await asyncio.gather(*(client.connect() for client in batch))
+        connected += [client for client, ok in zip(batch, results) if ok]
+        failed += results.count(False)
+        if not all(results):
+            break  # the server has stopped accepting; this is its ceiling
+    await asyncio.sleep(1.0)
+    live = presence(port)["connected"]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client.pings(args.pings)
+                                     for client in connected))
+    elapsed = time.perf_counter() - started
+    samples = [sample for client_samples, _ in results
+               for sample in client_samples]
+    lost = sum(missing for _, missing in results)
+    await asyncio.gather(*(client.sio.disconnect() for client in connected),
+                         return_exceptions=True)
+    return {
+        "connected": len(connected),
+        "live": live,
+        "failed": failed,
+        "pings_per_s": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 0.5) * 1000 if samples else None,
+        "p99_ms": percentile(samples, 0.99) * 1000 if samples else None,
+        "lost": lost,
+    }
+
+
+def main():
+    args = parse_args()
+    raise_fd_limit()
+    print(f"clients={args.clients} step={args.step} pings={args.pings}")
+    print(f"{'mode':>10} {'connected':>10} {'live':>6} {'failed':>7} "
+          f"{'pings/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'lost':>6}")
+    for offset, mode in enumerate(args.modes):
+        port = args.port + offset
+        try:
+            server = start_server(mode, port, args.clients)
+        except RuntimeError as e:
+            print(f"{mode:>10} {e}")
+            continue
+        try:
+            result = asyncio.run(load(port, args))
+        finally:
+            server.terminate()
+            server.wait()
+        p50 = f"{result['p50_ms']:8.1f}" if result["p50_ms"] is not None else f"{'-':>8}"
+        p99 = f"{result['p99_ms']:8.1f}" if result["p99_ms"] is not None else f"{'-':>8}"
+        print(f"{mode:>10} {result['connected']:>10} {result['live']:>6} "
+              f"{result['failed']:>7} {result['pings_per_s']:9.0f} "
+              f"{p50} {p99} {result['lost']:>6}")
+
+
+if __name__ == "__main__":
+    main()
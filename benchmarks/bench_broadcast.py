@@ -0,0 +1,109 @@
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+from socketio import packet
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from broadcast import Broadcaster
+from game_room import GameRoom
+from question_bank import QuestionBank
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Frames and fan-out CPU per game: one emit per event vs batched transitions."
+    )
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=50,
+                        help="Players answering; the rest are spectators.")
+    parser.add_argument("--rounds", type=int, default=5)
+    return parser.parse_args()
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, event, payload=None, to=None):
+        self.sent.append((event, payload, to))
+
+
+class NullScheduler:
+    class Handle:
+        def cancel(self):
+            pass
+
+    def call_later(self, *_args):
+        return self.Handle()
+
+    call_every = call_later
+
+
+class Unbatched(Broadcaster):
+    # Every emit goes straight out, as it did before batching.
+    def batch(self):
+        return contextlib.nullcontext(self)
+
+
+def play(broadcaster_class, players, rounds):
+    random.seed(0)
+    pool = QuestionBank.from_json(ROOT / "questions.json")
+    socketio = RecordingSocketIO()
+    room = GameRoom(
+        "bench", socketio, NullScheduler(),
+        select_question=lambda: random.choice(pool),
+        log_question=lambda _text: None,
+        question_pool=pool)
+    room.broadcaster = broadcaster_class(socketio)
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.reset_all()
+        for i in range(players):
+            room.join(f"player-{i:03d}", f"sid-{i:03d}", "127.0.0.1")
+        socketio.sent.clear()
+        room.start_game()
+        for index in range(rounds):
+            for i in range(players):
+                room.record_answer(f"sid-{i:03d}", f"player-{i:03d}", i % 4)
+            room.auto_next_question(index + 1)
+    return [(event, payload) for event, payload, to in socketio.sent
+            if to == room.name]
+
+
+def fan_out(frames, clients):
+    # python-socketio encodes a room emit once and then writes it to every
+    # socket in the room; the per-socket write is modelled as a copy into
+    # that socket's buffer.
+    buffers = [bytearray() for _ in range(clients)]
+    start = time.perf_counter()
+    for event, payload in frames:
+        encoded = packet.Packet(
+            packet.EVENT, data=[event, payload], namespace="/").encode()
+        frame = ("4" + encoded).encode()
+        for buffer in buffers:
+            buffer += frame
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(len(buffer) for buffer in buffers)
+
+
+def main():
+    args = parse_args()
+    print(f"clients={args.clients} players={args.players} rounds={args.rounds}")
+    print(f"{'mode':>10} {'frames/client':>14} {'total frames':>13} "
+          f"{'MB':>8} {'cpu ms':>8}")
+    for name, broadcaster_class in (("per-event", Unbatched), ("batched", Broadcaster)):
+        frames = play(broadcaster_class, args.players, args.rounds)
+        elapsed, size = fan_out(frames, args.clients)
+        print(f"{name:>10} {len(frames):>14} {len(frames) * args.clients:>13} "
+              f"{size / 1e6:8.2f} {elapsed * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
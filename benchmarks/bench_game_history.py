@@ -0,0 +1,107 @@
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_history import DAY, GameHistory
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Fill a game history with recorded games, then time its queries."
+    )
+    parser.add_argument("--answers", type=int, default=2_000_000)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--per-game", type=int, default=50, help="players per game")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--ranges", type=int, nargs="+", default=[1, 7, 30, 90, 365],
+                        help="Date range leaderboards to time, in days back from now.")
+    return parser.parse_args()
+
+
+def fill(history, args, rng):
+    # Goes through the same queue and batched writer as a live room.
+    now = time.time()
+    per_game = args.per_game * args.rounds
+    games = max(1, args.answers // per_game)
+    for game in range(games):
+        game_id = f"game-{game:07d}"
+        started_at = now - rng.random() * args.days * DAY
+        players = [f"player-{rng.randrange(args.players):05d}" for _ in range(args.per_game)]
+        players = list(dict.fromkeys(players))
+        scores = dict.fromkeys(players, 0)
+        history.game_started(game_id, "main", started_at)
+        for index in range(args.rounds):
+            asked_at = started_at + index * 35
+            question = f"Question {rng.randrange(args.questions)}?"
+            rows = []
+            for player in players:
+                latency = rng.random() * 25
+                correct = rng.random() < 0.6
+                points = 100 + int(25 - latency) if correct else 0
+                scores[player] += points
+                rows.append((player, f"Answer {rng.randrange(4)}", correct, latency, points,
+                             asked_at + latency))
+            history.round_finished(game_id, index, question, asked_at, rows)
+        board = sorted(scores.items(), key=lambda item: -item[1])
+        history.game_finished(game_id, asked_at + 35, [
+            (player, score, rank) for rank, (player, score) in enumerate(board, 1)])
+    history.flush()
+    return games
+
+
+def timed(repeat, query):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        history = GameHistory(str(Path(directory) / "history.sqlite3"), batch_size=2048)
+        start = time.perf_counter()
+        games = fill(history, args, rng)
+        elapsed = time.perf_counter() - start
+        stats = history.stats()
+        print(f"games={games} answers={games * args.per_game * args.rounds} "
+              f"load={elapsed:.1f}s batch p50={stats['batch_p50_ms']:.1f}ms "
+              f"max={stats['batch_max_ms']:.1f}ms")
+
+        now = time.time()
+        queries = (
+            ("player_history", lambda: history.player_history(
+                f"player-{rng.randrange(args.players):05d}")),
+            ("question_stats", lambda: history.question_stats(
+                f"Question {rng.randrange(args.questions)}?")),
+            ("leaderboard day", lambda: history.leaderboard(period="day")),
+            ("leaderboard week", lambda: history.leaderboard(period="week")),
+            ("leaderboard month", lambda: history.leaderboard(period="month")),
+            ("leaderboard year", lambda: history.leaderboard(period="year")),
+            ("leaderboard all", lambda: history.leaderboard()),
+            *((f"range {days} days", lambda days=days: history.leaderboard(now - days * DAY, now))
+              for days in args.ranges),
+        )
+        print(f"{'query':>17} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, query in queries:
+            p50, p99 = timed(args.repeat, query)
+            print(f"{name:>17} {p50:8.2f} {p99:8.2f}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
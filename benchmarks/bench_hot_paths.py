@@ -0,0 +1,264 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# app.py opens its logs and history at import; keep this run's apart.
+SCRATCH = tempfile.TemporaryDirectory()
+os.environ.setdefault("QUESTIONS_LOG", str(Path(SCRATCH.name) / "questions_asked.jsonl"))
+os.environ.setdefault("GAME_HISTORY_PATH", str(Path(SCRATCH.name) / "game_history.sqlite3"))
+os.environ.setdefault("SNAPSHOT_DIR", str(Path(SCRATCH.name) / "snapshots"))
+
+import app as app_module
+from game_room import GameRoom
+from question_bank import Question, QuestionBank
+from question_history import QuestionHistory
+
+BASELINE = ROOT / "benchmarks" / "baseline_hot_paths.json"
+CATEGORIES = ("Geography", "Science", "Nature", "History", "Arts", "Maths",
+              "Music", "TV", "General")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time the game engine's hot paths at several sizes; "
+                    "optionally fail on a regression against a baseline."
+    )
+    parser.add_argument("--players", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--bank", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--log", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Lines in the asked-questions log.")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="Seconds to spend on each case, at least.")
+    parser.add_argument("--max-repeat", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Time each case this many times and keep the best p50; "
+                             "the best is what moves least with other load on the machine.")
+    parser.add_argument("--only", help="Run cases whose name contains this.")
+    parser.add_argument("--out", help="Write the results to this JSON file.")
+    parser.add_argument("--check", nargs="?", const=str(BASELINE),
+                        help="Compare p50s with a baseline (default: the committed one).")
+    parser.add_argument("--threshold", type=float, default=1.0,
+                        help="Allowed p50 slowdown against the baseline, as a fraction. "
+                             "Shared machines swing by 1.5x or more; tighten it on a quiet one.")
+    parser.add_argument("--noise-us", type=float, default=5.0,
+                        help="Slowdowns smaller than this many microseconds never fail.")
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args()
+
+
+def measure(run, setup=None, min_time=0.2, max_repeat=2000):
+    # setup runs outside the timing, before each call. The collector is
+    # off while timing, as in timeit, so a pass does not land on one case.
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(samples) < max_repeat:
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+            if len(samples) >= 5 and time.perf_counter() - started >= min_time:
+                break
+    finally:
+        gc.enable()
+    samples.sort()
+    return {
+        "repeat": len(samples),
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+    }
+
+
+def make_bank(size, rng):
+    return QuestionBank(
+        Question(f"Question {i}?", (f"Right {i}", f"Wrong {i}a", f"Wrong {i}b",
+                                    f"Wrong {i}c"),
+                 0, rng.randrange(60, 160), CATEGORIES[i % len(CATEGORIES)])
+        for i in range(size))
+
+
+def use_bank(bank, directory):
+    app_module.question_bank = bank
+    app_module.question_history = QuestionHistory(str(Path(directory) / "empty.jsonl"))
+    app_module.question_sampler = None
+    app_module.get_question_sampler()
+
+
+def write_log(path, lines, questions, rng):
+    now = time.time()
+    with open(path, "w") as f:
+        for i in range(lines):
+            f.write(json.dumps({"question": f"Question {rng.randrange(questions)}?",
+                                "timestamp": now - (lines - i)}) + "\n")
+
+
+class NullSocketIO:
+    def emit(self, *_args, **_kwargs):
+        pass
+
+
+class NullScheduler:
+    class Handle:
+        def cancel(self):
+            pass
+
+    def call_later(self, *_args):
+        return self.Handle()
+
+    call_every = call_later
+
+
+def make_room(players, rng):
+    question = Question("Which planet is largest?", ("Jupiter", "Mars", "Venus", "Earth"), 0, 120)
+    room = GameRoom(
+        "bench", NullSocketIO(), NullScheduler(),
+        select_question=lambda: question,
+        log_question=lambda _text: None,
+        question_pool=[question])
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.load_or_reset()
+    room.state["players"] = {
+        f"player-{i:05d}": {"score": rng.randrange(5000), "sid": f"sid-{i}",
+                            "ip": "10.0.0.1", "online": True, "last_seen": time.time()}
+        for i in range(players)}
+    room.send_player_details()
+    return room, question
+
+
+def answer_round(room, question, rng):
+    # Every player has answered the current question.
+    now = time.time()
+    room.state["current_question"] = question.for_round()
+    room.state["end_time"] = now + 20
+    room.state["duration"] = 25
+    room.state["current_answers"] = {
+        name: {"username": name, "answer_index": rng.randrange(4),
+               "time": now - rng.random() * 5, "sid": player["sid"]}
+        for name, player in room.state["players"].items()}
+
+
+def rescore(room, rng, fraction=0.1):
+    players = room.state["players"]
+    for name in rng.sample(sorted(players), max(1, int(len(players) * fraction))):
+        players[name]["score"] += rng.randrange(100, 125)
+        room.ranked().set_score(name, players[name]["score"])
+        room.changed("players", name)
+
+
+def cases(args, directory, rng):
+    for size in args.bank:
+        bank = make_bank(size, rng)
+        use_bank(bank, directory)
+        sampler = app_module.get_question_sampler()
+        now = time.time()
+        narrow = {"categories": ["Science"], "iq": [90, 110]}
+        yield f"question_sampler.sample[bank={size}]", lambda: sampler.sample(now), None
+        yield (f"question_sampler.sample[bank={size},filtered]",
+               lambda: sampler.sample(now, **app_module.sampler_filter(narrow)), None)
+        yield f"select_single_question[bank={size}]", app_module.select_single_question, None
+        yield (f"select_single_question[bank={size},filtered]",
+               lambda: app_module.select_single_question(narrow), None)
+
+        def cold():
+            app_module.question_sampler = None
+        yield f"get_question_sampler[bank={size}]", app_module.get_question_sampler, cold
+
+    for lines in args.log:
+        path = str(Path(directory) / f"asked-{lines}.jsonl")
+        write_log(path, lines, max(1, lines // 10), rng)
+
+        def fresh(path=path):
+            # A cold start: the log is read once, then served from memory.
+            app_module.question_history = QuestionHistory(
+                path, compact_min_lines=float("inf"))
+        yield (f"load_recent_question_times[log={lines}]",
+               app_module.load_recent_question_times, fresh)
+
+    for players in args.players:
+        room, question = make_room(players, rng)
+        yield (f"add_scores_for_correct_answers[players={players}]",
+               room.add_scores_for_correct_answers,
+               lambda room=room, question=question: answer_round(room, question, rng))
+        yield f"resolve_scores[players={players}]", room.resolve_scores, None
+        yield (f"send_player_details[players={players}]", room.send_player_details,
+               lambda room=room: rescore(room, rng))
+
+    question = Question("Which planet is largest?", ("Jupiter", "Mars", "Venus", "Earth"), 0, 120)
+    yield "next_question shuffle", question.for_round, None
+
+
+def regressed(result, base, threshold, noise_us):
+    slower = result["p50_us"] - base["p50_us"]
+    return slower > noise_us and result["p50_us"] > base["p50_us"] * (1 + threshold)
+
+
+def best(run, setup, args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return min((measure(run, setup, args.min_time, args.max_repeat)
+                    for _ in range(args.rounds)),
+                   key=lambda result: result["p50_us"])
+
+
+def main():
+    args = parse_args()
+    baseline = {}
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)["cases"]
+    rng = random.Random(7)
+    results, regressions = {}, []
+    print(f"{'case':>52} {'runs':>6} {'p50 us':>10} {'p99 us':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run, setup in cases(args, directory, rng):
+            if args.only and args.only not in name:
+                continue
+            result = best(run, setup, args)
+            base = baseline.get(name)
+            if base is not None and regressed(result, base, args.threshold, args.noise_us):
+                # Time it again before calling it a regression; a busy
+                # machine slows a whole stretch of cases at once.
+                result = min(result, best(run, setup, args), key=lambda r: r["p50_us"])
+                if regressed(result, base, args.threshold, args.noise_us):
+                    regressions.append((name, base["p50_us"], result["p50_us"]))
+            results[name] = result
+            print(f"{name:>52} {result['repeat']:>6} {result['p50_us']:10.1f} "
+                  f"{result['p99_us']:10.1f}")
+
+    report = {"python": platform.python_version(), "machine": platform.machine(),
+              "cases": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(BASELINE, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {BASELINE.relative_to(ROOT)}")
+    if args.check:
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p50 {before:.1f} -> {after:.1f} us "
+                  f"({after / before:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions past {args.threshold:.0%} "
+              f"against {len(set(results) & set(baseline))} baseline cases")
+
+
+if __name__ == "__main__":
+    main()
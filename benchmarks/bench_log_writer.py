@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from log_writer import LogWriter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Caller-side cost of logging a question: open/append/close vs LogWriter."
+    )
+    parser.add_argument("--records", type=int, default=20000)
+    return parser.parse_args()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def line(i):
+    return json.dumps({"question": f"Question {i}?", "timestamp": time.time()})
+
+
+def legacy(path, records, fsync):
+    # What record() used to do on the handler thread.
+    costs = []
+    for i in range(records):
+        start = time.perf_counter()
+        with open(path, "a") as f:
+            f.write(line(i) + "\n")
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        costs.append(time.perf_counter() - start)
+    return costs, None
+
+
+def batched(path, records, fsync):
+    writer = LogWriter(path, fsync=fsync)
+    costs = []
+    for i in range(records):
+        start = time.perf_counter()
+        writer.append(line(i))
+        costs.append(time.perf_counter() - start)
+    writer.close()
+    return costs, writer.stats()
+
+
+def main():
+    args = parse_args()
+    modes = [
+        ("open/append/close", lambda p: legacy(p, args.records, False)),
+        ("... + fsync", lambda p: legacy(p, args.records, True)),
+        ("LogWriter never", lambda p: batched(p, args.records, "never")),
+        ("LogWriter interval", lambda p: batched(p, args.records, "interval")),
+        ("LogWriter always", lambda p: batched(p, args.records, "always")),
+    ]
+    print(f"records={args.records}")
+    print(f"{'mode':>20} {'p50 us':>8} {'p99 us':>8} {'total ms':>9} "
+          f"{'batches':>8} {'fsyncs':>7} {'flush p99 ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, (name, run) in enumerate(modes):
+            path = os.path.join(tmp, f"log-{n}.jsonl")
+            costs, stats = run(path)
+            batches = stats["batches"] if stats else args.records
+            fsyncs = stats["fsyncs"] if stats else ("-" if "fsync" not in name else args.records)
+            flush_p99 = f"{stats['flush_p99_ms']:.2f}" if stats else "-"
+            print(f"{name:>20} {percentile(costs, 0.5) * 1e6:8.1f} "
+                  f"{percentile(costs, 0.99) * 1e6:8.1f} {sum(costs) * 1000:9.1f} "
+                  f"{batches:>8} {fsyncs:>7} {flush_p99:>13}")
+
+
+if __name__ == "__main__":
+    main()
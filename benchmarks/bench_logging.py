@@ -0,0 +1,77 @@
+import argparse
+import contextlib
+import io
+import logging
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import logs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Handler-side cost of one log line: print() as before, against "
+                    "the queued logger with logging off, on, and sampled."
+    )
+    parser.add_argument("--events", type=int, default=200_000)
+    return parser.parse_args()
+
+
+@contextlib.contextmanager
+def pipe():
+    # stdout as a server has it: a line-buffered pipe to another process.
+    reader = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    stream = io.TextIOWrapper(reader.stdin, line_buffering=True)
+    try:
+        yield stream
+    finally:
+        stream.close()
+        reader.wait()
+
+
+def printed(events, stream):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(stream):
+        for i in range(events):
+            print(f"player-{i % 1000} answered: {i % 4}")
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def logged(events, stream, level, sample):
+    setup = logs.setup(level=level, sample=sample, stream=stream, max_queue=events + 1)
+    log = logging.getLogger("quiz.bench")
+    start = time.perf_counter()
+    for i in range(events):
+        logs.event(log, "answer", "%s answered %s", f"player-{i % 1000}", i % 4,
+                   room="main")
+    handler = time.perf_counter() - start
+    setup.close()
+    return handler, time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    print(f"events={args.events}")
+    print(f"{'method':>22} {'handler ns/event':>17} {'until written s':>16}")
+    runs = (
+        ("print", lambda stream: printed(args.events, stream)),
+        ("logger, level off", lambda stream: logged(args.events, stream, "WARNING", "")),
+        ("logger, every event", lambda stream: logged(args.events, stream, "INFO", "")),
+        ("logger, 1% sampled", lambda stream: logged(args.events, stream, "INFO", "answer=0.01")),
+    )
+    for name, run in runs:
+        logs.sampler = logs.Sampler()
+        with pipe() as stream:
+            handler, total = run(stream)
+        print(f"{name:>22} {handler / args.events * 1e9:17.0f} {total:16.2f}")
+
+
+if __name__ == "__main__":
+    main()
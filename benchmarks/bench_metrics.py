@@ -0,0 +1,65 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import metrics
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Cost of recording a metric on a hot path, and of one scrape."
+    )
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--rooms", type=int, default=1000,
+                        help="Label values per family when timing a scrape.")
+    return parser.parse_args()
+
+
+def per_call(calls, function):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    args = parse_args()
+    registry = metrics.Registry()
+    counter = metrics.Counter("bench_total", "Counter.", ("outcome",), registry=registry)
+    counted = counter.labels("counted")
+    histogram = metrics.Histogram("bench_seconds", "Histogram.", registry=registry)
+
+    def plain():
+        pass
+
+    wrapped = metrics.timed(histogram)(plain)
+    baseline = None
+    print(f"{'operation':>26} {'ns/call':>9}")
+    for name, function in (
+            ("empty call", plain),
+            ("counter child inc", counted.inc),
+            ("counter labels().inc", lambda: counter.labels("counted").inc()),
+            ("histogram observe", lambda: histogram.observe(0.003)),
+            ("timed() call", wrapped)):
+        cost = per_call(args.calls, function)
+        baseline = cost if baseline is None else baseline
+        print(f"{name:>26} {cost:9.0f}  (+{max(0.0, cost - baseline):.0f})")
+
+    for i in range(args.rooms):
+        counter.labels(f"room-{i}").inc()
+        histogram.observe(i / args.rooms)
+    metrics.Gauge("bench_players", "Gauge.", ("room",), registry=registry,
+                  function=lambda: {f"room-{i}": i for i in range(args.rooms)})
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"scrape of {args.rooms} label values: "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms, {len(text) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import payloads
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bytes and encode CPU per event: JSON objects vs schema arrays."
+    )
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    return parser.parse_args()
+
+
+def sample_events(players):
+    rng = random.Random(0)
+    names = [f"player-{i:04d}" for i in range(players)]
+    now = time.time()
+    question = {
+        "question": "Which planet is known as the red planet?",
+        "answers": ["Mars", "Venus", "Jupiter", "Mercury"],
+        "correct": 0,
+        "iq": 85,
+    }
+    return [
+        # The old question emit spread the whole round dict, 'correct' included.
+        ("question", {**question, "index": 3}),
+        ("timer", {"end_time": now + 25, "duration": 25}),
+        ("gamestate", {"state": "question"}),
+        ("round_results", {
+            "next_question_time": now + 10,
+            "intermission_duration": 10,
+            "question": question["question"],
+            "answers": question["answers"],
+            "correct_index": 0,
+            "player_answers": {
+                name: {"chosen_index": c, "is_correct": c == 0}
+                for name in names for c in [rng.randrange(4)]
+            },
+        }),
+        ("player_list", {
+            "seq": 42,
+            "scores": [[name, rng.randrange(1000)] for name in names[:50]],
+            "order": names[:50],
+            "winning_players": names[:1],
+        }),
+        ("player_rank", {"username": names[7], "rank": 8, "score": 640}),
+    ]
+
+
+def packet(event, payload):
+    # The text Socket.IO puts on the wire for one event.
+    return "42" + json.dumps([event, payload], separators=(",", ":"))
+
+
+def main():
+    args = parse_args()
+    events = sample_events(args.players)
+    print(f"players={args.players}")
+    print(f"{'event':>14} {'json B':>8} {'schema B':>9} {'saved':>6} "
+          f"{'json us':>8} {'schema us':>10}")
+    totals = [0, 0, 0.0, 0.0]
+    for event, payload in events:
+        before = len(packet(event, payload))
+        after = len(packet(event, payloads.encode(event, payload)))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            packet(event, payload)
+        json_us = (time.perf_counter() - start) / args.repeat * 1e6
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            packet(event, payloads.encode(event, payload))
+        schema_us = (time.perf_counter() - start) / args.repeat * 1e6
+        totals[0] += before
+        totals[1] += after
+        totals[2] += json_us
+        totals[3] += schema_us
+        print(f"{event:>14} {before:8} {after:9} {1 - after / before:6.0%} "
+              f"{json_us:8.1f} {schema_us:10.1f}")
+    print(f"{'total':>14} {totals[0]:8} {totals[1]:9} "
+          f"{1 - totals[1] / totals[0]:6.0%} {totals[2]:8.1f} {totals[3]:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
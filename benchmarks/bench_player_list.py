@@ -0,0 +1,111 @@
+import argparse
+import contextlib
+import io
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_room import GameRoom
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bytes on the wire for player_list during a lobby join storm."
+    )
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=None,
+        help="Connected sockets receiving each broadcast (default players + 1).",
+    )
+    return parser.parse_args()
+
+
+def wire_size(payload):
+    return len(json.dumps(payload, separators=(",", ":")))
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, event, payload=None, to=None):
+        self.sent.append((event, payload, to))
+
+
+class NullScheduler:
+    class Handle:
+        def cancel(self):
+            pass
+
+    def call_later(self, *_args):
+        return self.Handle()
+
+    call_every = call_later
+
+
+def legacy_bytes(players, clients):
+    # Before: every join broadcast the whole sorted players dict,
+    # sid and ip included, to every socket.
+    total = 0
+    roster = {}
+    for i in range(players):
+        roster[f"player-{i:04d}"] = {
+            "score": 3 if i == 0 else 0,
+            "sid": f"{i:020d}",
+            "ip": "192.168.1.23",
+        }
+        ordered = dict(sorted(
+            roster.items(), key=lambda item: item[1]["score"], reverse=True))
+        winners = [name for name, stats in ordered.items() if stats["score"] == 3]
+        total += wire_size(
+            {"players": ordered, "winning_players": winners}) * clients
+    return total
+
+
+def delta_bytes(players, clients):
+    socketio = RecordingSocketIO()
+    room = GameRoom(
+        "bench", socketio, NullScheduler(),
+        select_question=lambda: None,
+        log_question=lambda _text: None,
+        question_pool=[])
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.reset_all()
+        socketio.sent.clear()
+        for i in range(players):
+            room.join(f"player-{i:04d}", f"{i:020d}", "192.168.1.23")
+    total = 0
+    broadcasts = 0
+    for event, payload, to in socketio.sent:
+        # Room frames may batch several events; count the leaderboard ones.
+        events = payload if event == "batch" else [(event, payload)]
+        for name, data in events:
+            if name not in ("player_list", "player_rank"):
+                continue
+            if to == room.name:
+                broadcasts += 1
+                total += wire_size(data) * clients
+            else:
+                total += wire_size(data)
+    return total, broadcasts
+
+
+def main():
+    args = parse_args()
+    clients = args.clients or args.players + 1
+    before = legacy_bytes(args.players, clients)
+    after, broadcasts = delta_bytes(args.players, clients)
+    print(f"players={args.players} clients={clients}")
+    print(f"full player_list: {before / 1e6:10.2f} MB")
+    print(f"delta player_list: {after / 1e6:9.2f} MB ({broadcasts} broadcasts)")
+    print(f"saving: {before / max(after, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from question_bank import IndexedQuestionBank, QuestionBank
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Memory and startup: raw JSON dicts vs QuestionBank vs mmap index."
+    )
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000,
+                        help="Distinct answer strings shared across questions.")
+    return parser.parse_args()
+
+
+def write_bank(path, count, vocabulary):
+    rng = random.Random(0)
+    words = [f"answer-{i}" for i in range(vocabulary)]
+    with open(path, "w") as f:
+        f.write('{"questions": [')
+        for i in range(count):
+            if i:
+                f.write(",")
+            json.dump({
+                "question": f"Synthetic question number {i}?",
+                "answers": rng.sample(words, 5),
+                "iq": rng.randint(70, 140),
+            }, f)
+        f.write("]}")
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def load_dicts(path):
+    # What app.py did before: every question as a dict of fresh strings.
+    with open(path) as f:
+        questions = json.load(f)["questions"]
+    for q in questions:
+        q["correct"] = 0
+    return questions
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "questions.json")
+        index_path = os.path.join(tmp, "questions.idx")
+        write_bank(json_path, args.questions, args.vocabulary)
+        QuestionBank.from_json(json_path).write_index(index_path)
+
+        print(f"questions={args.questions} answer vocabulary={args.vocabulary}")
+        print(f"json {os.path.getsize(json_path) / 1e6:.1f} MB, "
+              f"index {os.path.getsize(index_path) / 1e6:.1f} MB")
+        print(f"{'loader':>14} {'startup s':>10} {'heap MB':>9} {'B/question':>11}")
+        for name, load in (
+            ("json dicts", lambda: load_dicts(json_path)),
+            ("QuestionBank", lambda: QuestionBank.from_json(json_path)),
+            ("mmap index", lambda: IndexedQuestionBank(index_path)),
+        ):
+            bank, elapsed, heap = measure(load)
+            print(f"{name:>14} {elapsed:10.3f} {heap / 1e6:9.1f} "
+                  f"{heap / args.questions:11.1f}")
+            if isinstance(bank, IndexedQuestionBank):
+                start = time.perf_counter()
+                rng = random.Random(1)
+                for _ in range(10_000):
+                    bank[rng.randrange(len(bank))].for_round()
+                per_pick = (time.perf_counter() - start) / 10_000
+                print(f"{'':>14} random record + round copy: {per_pick * 1e6:.1f} us")
+                bank.close()
+            del bank
+
+
+if __name__ == "__main__":
+    main()
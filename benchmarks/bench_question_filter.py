@@ -0,0 +1,94 @@
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sampler import BucketSampler
+
+HALF_LIFE = 3600.0
+BANDS = ("unrated", "easy", "medium", "hard")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Filtered question picks: bucket sampler vs filtering the bank per pick."
+    )
+    parser.add_argument("--questions", type=int, default=200000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--picks", type=int, default=5000)
+    parser.add_argument("--linear-picks", type=int, default=10)
+    return parser.parse_args()
+
+
+def bank(args, rng, now):
+    for i in range(args.questions):
+        yield (f"question {i}", f"category {i % args.categories}",
+               rng.randint(60, 160), rng.choice(BANDS),
+               now - rng.uniform(0, 86400) if rng.random() < 0.2 else 0)
+
+
+FILTERS = (
+    ("any question", {}),
+    ("1 category", {"buckets": ["category 3"]}),
+    ("iq 90-110", {"ranks": (90, 110)}),
+    ("1 category, iq 90-110", {"buckets": ["category 3"], "ranks": (90, 110)}),
+    ("3 categories, hard, iq 90-110",
+     {"buckets": ["category 1", "category 2", "category 3"], "bands": ["hard"],
+      "ranks": (90, 110)}),
+)
+
+
+def linear_pick(entries, times, now, rng, buckets=None, bands=None, ranks=None):
+    # What selection costs without the index: filter, weigh, then pick.
+    keys, weights = [], []
+    for key, bucket, rank, band, _ in entries:
+        if buckets is not None and bucket not in buckets:
+            continue
+        if bands is not None and band not in bands:
+            continue
+        if ranks is not None and not ranks[0] <= rank <= ranks[1]:
+            continue
+        keys.append(key)
+        weights.append(1.0 - math.exp(-max(0, now - times[key]) / HALF_LIFE))
+    return rng.choices(keys, weights)[0] if keys else None
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(3)
+    now = time.time()
+    entries = list(bank(args, rng, now))
+    times = {key: last_time for key, _, _, _, last_time in entries}
+
+    start = time.perf_counter()
+    sampler = BucketSampler.build(HALF_LIFE, entries, now=now)
+    print(f"questions={args.questions} categories={args.categories} "
+          f"build={(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'filter':>30} {'matches':>8} {'pick us':>8} {'pick+touch us':>14} {'linear us':>10}")
+    for name, options in FILTERS:
+        matches = sampler.count(**options)
+        start = time.perf_counter()
+        for _ in range(args.picks):
+            sampler.sample(now, rng=rng, **options)
+        pick_us = (time.perf_counter() - start) / args.picks * 1e6
+        start = time.perf_counter()
+        for i in range(args.picks):
+            key = sampler.sample(now + i, rng=rng, **options)
+            sampler.touch(key, now + i)
+        touch_us = (time.perf_counter() - start) / args.picks * 1e6
+        start = time.perf_counter()
+        for _ in range(args.linear_picks):
+            linear_pick(entries, times, now, rng, **options)
+        linear_us = (time.perf_counter() - start) / args.linear_picks * 1e6
+        print(f"{name:>30} {matches:8d} {pick_us:8.1f} {touch_us:14.1f} {linear_us:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+from question_history import QuestionHistory
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Question selection time as questions_asked.jsonl grows."
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000,100000,1000000,10000000",
+        help="Comma separated log sizes in lines.",
+    )
+    parser.add_argument("--picks", type=int, default=200)
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=1000000,
+        help="Skip the old rescan-per-pick measurement above this size.",
+    )
+    return parser.parse_args()
+
+
+def write_log(path, lines, questions):
+    now = time.time()
+    with open(path, "w") as f:
+        chunk = []
+        for i in range(lines):
+            entry = {
+                "question": random.choice(questions),
+                "timestamp": now - (lines - i),
+            }
+            chunk.append(json.dumps(entry))
+            if len(chunk) >= 10000:
+                f.write("\n".join(chunk) + "\n")
+                chunk = []
+        if chunk:
+            f.write("\n".join(chunk) + "\n")
+
+
+def legacy_load(path):
+    recent_times = {}
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            question = entry.get("question")
+            timestamp = entry.get("timestamp")
+            if question and isinstance(timestamp, (int, float)):
+                recent_times[question] = max(recent_times.get(question, 0), timestamp)
+    return recent_times
+
+
+def per_pick_ms(fn, picks):
+    start = time.perf_counter()
+    for _ in range(picks):
+        fn()
+    return (time.perf_counter() - start) * 1000 / picks
+
+
+def main():
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    questions = list(app_module.question_bank.texts())
+    print(f"{'lines':>10} {'startup ms':>11} {'select ms':>10} {'rescan ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"asked-{size}.jsonl")
+            write_log(path, size, questions)
+
+            legacy = "-"
+            if size <= args.legacy_max:
+                legacy_picks = max(1, min(args.picks, 10000000 // size))
+                legacy = f"{per_pick_ms(lambda: legacy_load(path), legacy_picks):10.3f}"
+
+            history = QuestionHistory(path)
+            start = time.perf_counter()
+            history.load()
+            startup_ms = (time.perf_counter() - start) * 1000
+            app_module.question_history = history
+            app_module.question_sampler = None
+            select_ms = per_pick_ms(app_module.select_single_question, args.picks)
+            print(f"{size:>10} {startup_ms:11.1f} {select_ms:10.3f} {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from question_import import import_questions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Streaming import throughput and peak memory per source format."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["jsonl", "csv", "json"], default="jsonl")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--bad-rate", type=float, default=0.01)
+    return parser.parse_args()
+
+
+def rows(count, duplicate_rate, bad_rate):
+    rng = random.Random(0)
+    for i in range(count):
+        n = rng.randrange(i) if i and rng.random() < duplicate_rate else i
+        answers = [f"answer {n} {k}" for k in range(5)]
+        if rng.random() < bad_rate:
+            answers = answers[:1]
+        yield {"question": f"Imported question {n}?", "answers": answers,
+               "iq": rng.randint(70, 140)}
+
+
+def write_source(path, fmt, source_rows):
+    with open(path, "w", newline="") as f:
+        if fmt == "jsonl":
+            for row in source_rows:
+                f.write(json.dumps(row) + "\n")
+        elif fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["question", "answers", "iq"])
+            for row in source_rows:
+                writer.writerow([row["question"], "|".join(row["answers"]), row["iq"]])
+        else:
+            f.write('{"questions": [')
+            for i, row in enumerate(source_rows):
+                f.write(("," if i else "") + json.dumps(row))
+            f.write("]}")
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, f"bank.{args.format}")
+        write_source(source, args.format,
+                     rows(args.rows, args.duplicate_rate, args.bad_rate))
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report = import_questions([source], os.path.join(tmp, "bank.idx")).as_dict()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        size = os.path.getsize(source)
+        index_size = os.path.getsize(os.path.join(tmp, "bank.idx"))
+    print(f"{args.format}: {args.rows} rows, {size / 1e6:.1f} MB source, "
+          f"{index_size / 1e6:.1f} MB index")
+    print(f"imported={report['imported']} duplicates={report['duplicates']} "
+          f"rejected={report['rejected']}")
+    print(f"{report['seconds']}s, {report['rows_per_second']} rows/s, "
+          f"{report['mb_per_second']} MB/s")
+    # ru_maxrss is in KiB on Linux
+    print(f"peak RSS growth during import: {(after - before) / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
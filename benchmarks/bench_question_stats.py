@@ -0,0 +1,87 @@
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from question_stats import BANDS, QuestionStats
+from sampler import BucketSampler
+
+HALF_LIFE = 3600.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Per-question stats updates, flushes and difficulty-band picks."
+    )
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=50000)
+    parser.add_argument("--players", type=int, default=50, help="answers per round")
+    parser.add_argument("--picks", type=int, default=2000)
+    return parser.parse_args()
+
+
+def rounds(args, rng):
+    for _ in range(args.rounds):
+        question = f"question {rng.randrange(args.questions)}"
+        skill = rng.random()
+        yield question, [
+            (f"p{i}", "right" if correct else f"wrong {rng.randrange(3)}",
+             correct, rng.random() * 25)
+            for i in range(args.players)
+            for correct in (rng.random() < skill,)]
+
+
+def linear_band_pick(stats, keys, band, rng):
+    # Filter the whole bank, then pick: what selection costs without buckets.
+    matching = [key for key in keys if stats.band(key) == band]
+    return rng.choice(matching) if matching else None
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(11)
+    keys = [f"question {i}" for i in range(args.questions)]
+    now = time.time()
+    with tempfile.TemporaryDirectory() as directory:
+        stats = QuestionStats(
+            str(Path(directory) / "stats.sqlite3"), min_answers=args.players)
+        sampler = BucketSampler.build(
+            HALF_LIFE, ((key, None, None, stats.band(key), 0) for key in keys), now=now)
+        stats.on_band_change = sampler.move
+
+        played = list(rounds(args, rng))
+        start = time.perf_counter()
+        for question, answers in played:
+            stats.record_round(question, answers)
+        elapsed = time.perf_counter() - start
+        per_answer = elapsed / (args.rounds * args.players) * 1e6
+        print(f"record_round: {elapsed / args.rounds * 1e6:.1f} us/round, "
+              f"{per_answer:.2f} us/answer")
+
+        queued = stats.stats()["queued"]
+        start = time.perf_counter()
+        stats.flush()
+        print(f"flush {queued} queued rounds, {stats.rows_written} rows in all: "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+        print(f"bands: {sampler.sizes()}")
+
+        for band in BANDS:
+            start = time.perf_counter()
+            for _ in range(args.picks):
+                sampler.sample(now, bands=(band,), rng=rng)
+            bucket_us = (time.perf_counter() - start) / args.picks * 1e6
+            start = time.perf_counter()
+            for _ in range(10):
+                linear_band_pick(stats, keys, band, rng)
+            linear_us = (time.perf_counter() - start) / 10 * 1e6
+            print(f"{band:>7} pick: bucket {bucket_us:8.1f} us   linear {linear_us:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
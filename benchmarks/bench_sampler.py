@@ -0,0 +1,88 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sampler import BucketSampler
+
+HALF_LIFE = 3600.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bucket sampler vs the old linear weighted scan."
+    )
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--picks", type=int, default=2000)
+    parser.add_argument(
+        "--legacy-picks",
+        type=int,
+        default=20,
+        help="Picks to time for the linear scan (it is slow at 1M).",
+    )
+    return parser.parse_args()
+
+
+def legacy_pick(keys, recent_times, now):
+    items = []
+    weights = []
+    for key in keys:
+        age = max(0, now - recent_times.get(key, 0))
+        items.append(key)
+        weights.append(1.0 - pow(2.718281828, -age / HALF_LIFE))
+    pool = list(zip(items, weights))
+    total = sum(w for _, w in pool)
+    r = random.uniform(0, total)
+    upto = 0
+    for item, w in pool:
+        upto += w
+        if upto >= r:
+            return item
+    return pool[0][0]
+
+
+def main():
+    args = parse_args()
+    print(f"{'questions':>10} {'build ms':>9} {'pick us':>8} "
+          f"{'pick+touch us':>14} {'linear us':>10}")
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        now = time.time()
+        keys = [f"question {i}" for i in range(size)]
+        recent_times = {
+            key: now - random.uniform(0, 86400)
+            for key in random.sample(keys, min(size, 5000))
+        }
+
+        start = time.perf_counter()
+        sampler = BucketSampler.build(
+            HALF_LIFE, ((k, None, None, None, recent_times.get(k, 0)) for k in keys),
+            now=now)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.picks):
+            sampler.sample(now)
+        pick_us = (time.perf_counter() - start) * 1e6 / args.picks
+
+        start = time.perf_counter()
+        for i in range(args.picks):
+            picked = sampler.sample(now + i)
+            sampler.touch(picked, now + i)
+        touch_us = (time.perf_counter() - start) * 1e6 / args.picks
+
+        start = time.perf_counter()
+        for _ in range(args.legacy_picks):
+            legacy_pick(keys, recent_times, now)
+        linear_us = (time.perf_counter() - start) * 1e6 / args.legacy_picks
+
+        print(f"{size:>10} {build_ms:9.1f} {pick_us:8.2f} "
+              f"{touch_us:14.2f} {linear_us:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scheduler import Scheduler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Timer lateness: one threading.Timer per deadline vs Scheduler."
+    )
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=2.0,
+                        help="Deadlines are spread over this many seconds.")
+    return parser.parse_args()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def run(schedule, games, spread):
+    done = threading.Event()
+    lateness = []
+    lock = threading.Lock()
+    peak_threads = threading.active_count()
+
+    def fire(deadline):
+        late = time.monotonic() - deadline
+        with lock:
+            lateness.append(late)
+            if len(lateness) == games:
+                done.set()
+
+    start = time.perf_counter()
+    for _ in range(games):
+        delay = random.uniform(0.1, spread)
+        schedule(delay, fire, time.monotonic() + delay)
+        peak_threads = max(peak_threads, threading.active_count())
+    setup_ms = (time.perf_counter() - start) * 1000
+    done.wait(spread + 30)
+    return setup_ms, peak_threads, lateness
+
+
+def main():
+    args = parse_args()
+
+    def timer_schedule(delay, fn, *fn_args):
+        timer = threading.Timer(delay, fn, args=fn_args)
+        timer.start()
+        return timer
+
+    scheduler = Scheduler()
+    modes = [
+        ("threading.Timer", timer_schedule),
+        ("Scheduler", scheduler.call_later),
+    ]
+    print(f"{'mode':>16} {'setup ms':>9} {'threads':>8} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for name, schedule in modes:
+        setup_ms, threads, lateness = run(schedule, args.games, args.spread)
+        print(f"{name:>16} {setup_ms:9.1f} {threads:>8} "
+              f"{percentile(lateness, 0.5) * 1000:7.2f} "
+              f"{percentile(lateness, 0.99) * 1000:7.2f} "
+              f"{max(lateness) * 1000:7.2f}")
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_room import LOCAL_KEYS, GameRoom, RoomRegistry
+from question_bank import Question
+from snapshots import Snapshotter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Snapshot cost for one room: time under the room lock, write time, size, restore."
+    )
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args()
+
+
+class NullSocketIO:
+    def emit(self, *_args, **_kwargs):
+        pass
+
+
+class NullScheduler:
+    class Handle:
+        def cancel(self):
+            pass
+
+    def call_later(self, *_args):
+        return self.Handle()
+
+    call_every = call_later
+
+
+def registry():
+    question = Question("Which planet is largest?", ("Jupiter", "Mars", "Venus", "Earth"), 0, 120)
+
+    def factory(name, rooms):
+        return GameRoom(
+            name, NullSocketIO(), NullScheduler(),
+            select_question=lambda: question,
+            log_question=lambda _text: None,
+            question_pool=[question],
+            registry=rooms)
+    return RoomRegistry(factory)
+
+
+def populated_room(players):
+    rooms = registry()
+    with contextlib.redirect_stdout(io.StringIO()):
+        room = rooms.get_or_create("main")
+        room.start_game()
+    now = time.time()
+    room.state["players"] = {
+        f"player-{i:05d}": {
+            "score": (i * 37) % 2000, "sid": f"{i:020d}", "ip": "10.0.0.1",
+            "online": True, "last_seen": now,
+        }
+        for i in range(players)}
+    room.state["current_answers"] = {
+        f"player-{i:05d}": {
+            "username": f"player-{i:05d}", "answer_index": i % 4,
+            "time": now, "sid": f"{i:020d}",
+        }
+        for i in range(0, players, 2)}
+    room.keep_lease()  # a locked call, so the store picks the room up
+    return rooms, room
+
+
+def naive(room, repeat):
+    # Serialise the whole state under the lock, then compress it.
+    held, total, size = [], [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with room.lock:
+            text = json.dumps(
+                {k: v for k, v in room.state.items() if k not in LOCAL_KEYS},
+                default=dict)
+        held.append(time.perf_counter() - start)
+        data = gzip.compress(text.encode(), compresslevel=1)
+        total.append(time.perf_counter() - start)
+        size = len(data)
+    return held, total, size
+
+
+def snapshotter(room, directory, repeat):
+    writer = Snapshotter(directory, registry())
+    held, total = [], []
+    for _ in range(repeat):
+        room.state["players"]["player-00000"]["score"] += 1
+        room.changed("players", "player-00000")
+        start = time.perf_counter()
+        parts = room.snapshot()
+        held.append(time.perf_counter() - start)
+        writer.write(room.name, parts)
+        total.append(time.perf_counter() - start)
+    return held, total, writer.last_bytes
+
+
+def ms(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[-1] * 1000
+
+
+def main():
+    args = parse_args()
+    _, room = populated_room(args.players)
+    print(f"players={args.players} answers={len(room.state['current_answers'])}")
+    print(f"{'method':>12} {'lock p50':>9} {'lock max':>9} "
+          f"{'total p50':>10} {'KB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run in (("json.dumps", lambda: naive(room, args.repeat)),
+                          ("snapshotter", lambda: snapshotter(room, directory, args.repeat))):
+            held, total, size = run()
+            held_p50, held_max = ms(held)
+            total_p50, _ = ms(total)
+            print(f"{name:>12} {held_p50:9.2f} {held_max:9.2f} "
+                  f"{total_p50:10.2f} {size / 1024:8.1f}")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            restored = Snapshotter(directory, registry()).restore()
+        print(f"restore {restored[0]}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
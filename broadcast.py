@@ -0,0 +1,117 @@
+import contextlib
+import threading
+import time
+
+from metrics import EMIT_SECONDS
+
+# Only the last of these per batch matters to a client.
+SUPERSEDED_EVENTS = {'gamestate', 'timer'}
+
+
+class Broadcaster:
+    # Collects the emits of one state transition and sends them as a single
+    # 'batch' event per target, so a round change costs one frame per
+    # socket instead of six or seven. Flushes to a target are spaced at
+    # least min_interval apart; anything emitted sooner is folded into the
+    # next flush. encode(event, payload) turns a payload into its wire form.
+
+    def __init__(self, socketio, scheduler=None, min_interval=0.0,
+                 clock=time.monotonic, encode=None):
+        self.socketio = socketio
+        self.encode = encode
+        self.scheduler = scheduler
+        self.min_interval = min_interval
+        self.clock = clock
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.pending = {}
+        self.last_flush = {}
+        self.deferred = {}
+        self.frames = 0
+        self.events = 0
+        self.dropped = 0
+
+    @contextlib.contextmanager
+    def batch(self):
+        with self.lock:
+            self.depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.depth -= 1
+                if self.depth == 0:
+                    for target in list(self.pending):
+                        self._flush_or_defer(target)
+
+    def emit(self, event, payload, to):
+        with self.lock:
+            self.pending.setdefault(to, []).append((event, payload))
+            self.events += 1
+            if self.depth == 0:
+                self._flush_or_defer(to)
+
+    def _flush_or_defer(self, target):
+        if target in self.deferred:
+            return
+        wait = self.last_flush.get(target, float('-inf')) + \
+            self.min_interval - self.clock()
+        if wait > 0 and self.scheduler is not None:
+            self.deferred[target] = self.scheduler.call_later(
+                wait, self._deferred_flush, target)
+            return
+        self._flush(target)
+
+    def _deferred_flush(self, target):
+        with self.lock:
+            self.deferred.pop(target, None)
+            if self.depth == 0:
+                self._flush(target)
+
+    def _flush(self, target):
+        events = self.pending.pop(target, None)
+        if not events:
+            return
+        events = self.coalesce(events)
+        if self.encode is not None:
+            events = [(event, self.encode(event, payload))
+                      for event, payload in events]
+        self.last_flush[target] = self.clock()
+        self.frames += 1
+        started = time.perf_counter()
+        if len(events) == 1:
+            event, payload = events[0]
+            self.socketio.emit(event, payload, to=target)
+        else:
+            self.socketio.emit(
+                'batch', [[event, payload] for event, payload in events],
+                to=target)
+        EMIT_SECONDS.observe(time.perf_counter() - started)
+
+    def coalesce(self, events):
+        last_index = {}
+        for i, (event, _) in enumerate(events):
+            if event in SUPERSEDED_EVENTS:
+                last_index[event] = i
+        if not last_index:
+            return events
+        kept = [
+            (event, payload) for i, (event, payload) in enumerate(events)
+            if event not in last_index or last_index[event] == i]
+        self.dropped += len(events) - len(kept)
+        return kept
+
+    def discard(self, target):
+        with self.lock:
+            self.pending.pop(target, None)
+            self.last_flush.pop(target, None)
+            handle = self.deferred.pop(target, None)
+            if handle is not None:
+                handle.cancel()
+
+    def stats(self):
+        return {
+            'events': self.events,
+            'frames': self.frames,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,186 @@
+import collections
+import itertools
+import threading
+import time
+
+PROBE_INTERVAL = 15.0
+WARMUP_PROBES = 4
+FILTER_SAMPLES = 8
+RTT_ALPHA = 0.125
+RTTVAR_BETA = 0.25
+MAX_ANSWER_CREDIT = 1.0  # seconds an answer can be credited before receipt
+MAX_PENDING_PROBES = 4
+
+
+class ClientClock:
+    __slots__ = ('offset', 'rtt', 'rttvar', 'samples', 'recent', 'pending',
+                 'last_sample')
+
+    def __init__(self):
+        self.offset = None  # server time minus client time, seconds
+        self.rtt = None
+        self.rttvar = 0.0
+        self.samples = 0
+        self.recent = collections.deque(maxlen=FILTER_SAMPLES)
+        self.pending = collections.OrderedDict()
+        self.last_sample = None
+
+
+class ClockSync:
+    # NTP-style offset and round-trip tracking per socket. The server sends
+    # a clock_probe stamped with its own send time and the client answers
+    # at once with its clock; the round trip is measured entirely on the
+    # server. RTT is smoothed the way TCP does; the offset comes from the
+    # lowest-RTT recent sample, which is the least skewed by queueing.
+    #
+    # A player is probed when they join, WARMUP_PROBES times back to back,
+    # and then every probe_interval only while live() says a question is
+    # running somewhere: wake() starts that when one goes live, and it
+    # stops itself once none is, so idle phones are left alone.
+
+    def __init__(self, socketio, scheduler=None, wall_clock=time.time,
+                 probe_interval=PROBE_INTERVAL, rtt_window=4096, live=None):
+        self.socketio = socketio
+        self.scheduler = scheduler
+        self.live = live
+        self.wall_clock = wall_clock
+        self.probe_interval = probe_interval
+        self.clients = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.rtt_samples = collections.deque(maxlen=rtt_window)
+        self.probe_timer = None
+        self.corrected = 0
+        self.clamped = 0
+        self.uncorrected = 0
+
+    def add(self, sid):
+        with self.lock:
+            self.clients.setdefault(sid, ClientClock())
+        self.probe(sid)
+
+    def wake(self):
+        with self.lock:
+            if self.probe_timer is None and self.scheduler is not None:
+                self.probe_timer = self.scheduler.call_every(
+                    self.probe_interval, self.probe_all)
+
+    def remove(self, sid):
+        with self.lock:
+            self.clients.pop(sid, None)
+
+    def probe(self, sid):
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return
+            probe_id = next(self.ids)
+            sent_at = self.wall_clock()
+            client.pending[probe_id] = sent_at
+            while len(client.pending) > MAX_PENDING_PROBES:
+                client.pending.popitem(last=False)
+        self.socketio.emit(
+            'clock_probe', {'id': probe_id, 'server_ts': sent_at}, to=sid)
+
+    def probe_all(self):
+        # live() is asked under the lock wake() takes, so a question that
+        # goes live while this is stopping the timer starts a new one.
+        with self.lock:
+            if self.live is not None and not self.live():
+                if self.probe_timer is not None:
+                    self.probe_timer.cancel()
+                    self.probe_timer = None
+                return
+            sids = list(self.clients)
+        for sid in sids:
+            self.probe(sid)
+
+    def reply(self, sid, probe_id, client_ts_ms):
+        received_at = self.wall_clock()
+        if not isinstance(client_ts_ms, (int, float)):
+            return None
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return None
+            sent_at = client.pending.pop(probe_id, None)
+            if sent_at is None:
+                return None  # unknown, duplicate or stale probe
+            rtt = max(0.0, received_at - sent_at)
+            offset = (sent_at + received_at) / 2 - client_ts_ms / 1000
+            self._add_sample(client, rtt, offset)
+            client.last_sample = received_at
+            warming_up = client.samples < WARMUP_PROBES
+        if warming_up:
+            self.probe(sid)
+        return offset
+
+    def _add_sample(self, client, rtt, offset):
+        client.samples += 1
+        if client.rtt is None:
+            client.rtt = rtt
+            client.rttvar = rtt / 2
+        else:
+            client.rttvar += RTTVAR_BETA * (abs(client.rtt - rtt) - client.rttvar)
+            client.rtt += RTT_ALPHA * (rtt - client.rtt)
+        client.recent.append((rtt, offset))
+        client.offset = min(client.recent)[1]
+        self.rtt_samples.append(rtt)
+
+    def get(self, sid):
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None or client.offset is None:
+                return None
+            return {
+                'offset_ms': client.offset * 1000,
+                'rtt_ms': client.rtt * 1000,
+                'rttvar_ms': client.rttvar * 1000,
+                'samples': client.samples,
+            }
+
+    def answer_time(self, sid, client_ts_ms, received_at):
+        # When the player actually answered, on the server clock. Credit
+        # is capped by what the measured link could explain, so a client
+        # cannot claim an earlier answer by lying about its clock.
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None or client.rtt is None:
+                self.uncorrected += 1
+                return received_at
+            max_credit = min(MAX_ANSWER_CREDIT,
+                             client.rtt + 4 * client.rttvar)
+            if (client.offset is None or
+                    not isinstance(client_ts_ms, (int, float))):
+                self.uncorrected += 1
+                return received_at - min(client.rtt / 2, max_credit)
+            answered_at = client_ts_ms / 1000 + client.offset
+            earliest = received_at - max_credit
+            if answered_at > received_at or answered_at < earliest:
+                self.clamped += 1
+                answered_at = min(received_at, max(earliest, answered_at))
+            self.corrected += 1
+            return answered_at
+
+    def stats(self):
+        samples = sorted(self.rtt_samples)
+        with self.lock:
+            smoothed = sorted(
+                client.rtt for client in self.clients.values()
+                if client.rtt is not None)
+            stats = {
+                'clients': len(self.clients),
+                'synced': len(smoothed),
+                'answers_corrected': self.corrected,
+                'answers_clamped': self.clamped,
+                'answers_uncorrected': self.uncorrected,
+            }
+        for name, values in (('rtt', samples), ('client_rtt', smoothed)):
+            for label, pct in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+                value = 0.0
+                if values:
+                    value = values[min(len(values) - 1,
+                                       int(len(values) * pct))] * 1000
+                stats[f'{name}_{label}_ms'] = value
+            stats[f'{name}_max_ms'] = values[-1] * 1000 if values else 0.0
+        return stats
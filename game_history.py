@@ -0,0 +1,432 @@
+import collections
+import datetime
+import math
+import sqlite3
+import threading
+import time
+
+from group_commit import GroupCommitWriter
+from metrics import LOG_WRITE_SECONDS
+
+DAY = 86400
+EPOCH = datetime.date(1970, 1, 1)
+PERIODS = ('day', 'week', 'month', 'year', 'all')
+
+
+def day_key(day):
+    return f'day:{day:06d}'
+
+
+def period_keys(at):
+    # Every rollup a game ending at `at` counts towards, in UTC. Weeks
+    # start on Monday; day 0 of the epoch was a Thursday.
+    day = int(at // DAY)
+    month = time.gmtime(at)
+    return {
+        'day': day_key(day),
+        'week': f'week:{(day + 3) // 7:05d}',
+        'month': f'month:{month.tm_year:04d}-{month.tm_mon:02d}',
+        'year': f'year:{month.tm_year:04d}',
+        'all': 'all',
+    }
+
+
+def period_span(period, day):
+    # (first day, last day, key) of the day, week, month or year holding
+    # `day`.
+    if period == 'day':
+        return day, day, day_key(day)
+    if period == 'week':
+        week = (day + 3) // 7
+        return week * 7 - 3, week * 7 + 3, f'week:{week:05d}'
+    date = EPOCH + datetime.timedelta(days=day)
+    if period == 'month':
+        start = date.replace(day=1)
+        end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        key = f'month:{date.year:04d}-{date.month:02d}'
+    else:
+        start = date.replace(month=1, day=1)
+        end = start.replace(year=date.year + 1)
+        key = f'year:{date.year:04d}'
+    return (start - EPOCH).days, (end - EPOCH).days - 1, key
+
+
+def range_periods(first, last, periods=('year', 'month', 'week')):
+    # The fewest rollups covering days first..last: the whole years in it,
+    # then whole months either side of those, then whole weeks, then
+    # single days at either end.
+    if first > last:
+        return []
+    if not periods:
+        return [day_key(day) for day in range(first, last + 1)]
+    start, end, _ = period_span(periods[0], first)
+    if start < first:
+        start = end + 1
+    keys = []
+    day = start
+    while day <= last:
+        _, end, key = period_span(periods[0], day)
+        if end > last:
+            break
+        keys.append(key)
+        day = end + 1
+    if not keys:
+        return range_periods(first, last, periods[1:])
+    return (range_periods(first, start - 1, periods[1:]) + keys +
+            range_periods(day, last, periods[1:]))
+
+
+def covering_period(first, last):
+    # The shortest single rollup holding all of days first..last.
+    for period in ('day', 'week', 'month', 'year'):
+        start, end, key = period_span(period, first)
+        if end >= last:
+            return key
+    return 'all'
+
+
+RANGE_TOTALS = (
+    'SELECT player, SUM(score) AS total, SUM(games) FROM period_scores '
+    'WHERE period IN (%s)%s GROUP BY player ORDER BY total DESC, player '
+    'LIMIT ?')
+TOP_SCORES = (
+    'SELECT player, score, games FROM period_scores WHERE period = ? '
+    'ORDER BY score DESC, player LIMIT ?')
+
+
+def range_leaders(conn, keys, limit, cover='all', budget=2000):
+    # Summing every player over the range reads every row in it. Scores
+    # only go up, so any `limit` players' range totals give a floor on the
+    # winning ones, and a player can only reach it if
+    #  - their score in `cover`, a period holding the whole range, does, or
+    #  - their score in one of the range's periods comes close enough.
+    # Only the players one of those leaves are summed; if both leave too
+    # many, everyone is.
+    if len(keys) == 1:
+        return conn.execute(TOP_SCORES, (keys[0], limit)).fetchall()
+    marks = ','.join('?' * len(keys))
+
+    def totals(players=None):
+        if players is None:
+            return conn.execute(
+                RANGE_TOTALS % (marks, ''), (*keys, limit)).fetchall()
+        return conn.execute(
+            RANGE_TOTALS % (marks, ' AND player IN (%s)' %
+                            ','.join('?' * len(players))),
+            (*keys, *players, limit)).fetchall()
+
+    def floor(players):
+        rows = totals(players)
+        return rows[-1][1] if len(rows) == limit else 0
+
+    def top(key):
+        return conn.execute(TOP_SCORES, (key, limit)).fetchall()
+
+    if (len(keys) + 1) * limit > budget:
+        return totals()
+    # The leaders of the cover usually lead the range too.
+    seeds = {player for player, _, _ in top(cover)}
+    least = floor(seeds)
+    if least:
+        players = [player for player, in conn.execute(
+            'SELECT player FROM period_scores WHERE period = ? '
+            'AND score >= ? LIMIT ?', (cover, least, budget + 1))]
+        if len(players) <= budget:
+            return totals(players)
+    tops = [top(key) for key in keys]
+    seeds.update(player for rows in tops for player, _, _ in rows)
+    least = max(least, floor(seeds))
+    if not least:
+        return totals()
+    best = sum(rows[0][1] for rows in tops if rows)
+    players = set()
+    for key, rows in zip(keys, tops):
+        need = max(least / len(keys),
+                   least - best + (rows[0][1] if rows else 0))
+        players.update(player for player, in conn.execute(
+            'SELECT player FROM period_scores WHERE period = ? '
+            'AND score >= ? LIMIT ?', (key, need, budget + 1)))
+        if len(players) > budget:
+            return totals()
+    return totals(players)
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    room TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    players INTEGER
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    game_id TEXT NOT NULL,
+    question_index INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    asked_at REAL NOT NULL,
+    answers INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    PRIMARY KEY (game_id, question_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS answers (
+    game_id TEXT NOT NULL,
+    question_index INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    chosen TEXT,
+    correct INTEGER NOT NULL,
+    latency REAL,
+    points INTEGER NOT NULL,
+    answered_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_player
+    ON answers (player, answered_at, correct, latency, points);
+CREATE INDEX IF NOT EXISTS answers_by_question
+    ON answers (question_id, correct, latency);
+CREATE TABLE IF NOT EXISTS scores (
+    game_id TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    rank INTEGER,
+    ended_at REAL NOT NULL,
+    PRIMARY KEY (game_id, player)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (player, ended_at);
+CREATE TABLE IF NOT EXISTS period_scores (
+    period TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (period, player)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS period_scores_by_score
+    ON period_scores (period, score DESC, player, games);
+'''
+
+
+class GameHistory(GroupCommitWriter):
+    # Games, rounds, answers and final scores in SQLite. The room only
+    # queues a record; each batch is committed in one transaction. Reads
+    # use their own connection, and WAL lets them run while a batch is
+    # being written. Leaderboards read per-player totals for each day,
+    # week, month, year and all time, kept up to date as each game
+    # finishes: a whole period is a walk down its score index, and an
+    # arbitrary date range sums the largest periods that fit in it.
+
+    def __init__(self, path, batch_size=512, flush_interval=0.5,
+                 max_pending=50000, spawn=None, offload=None,
+                 clock=time.monotonic, latency_window=1024):
+        super().__init__(
+            batch_size=batch_size, flush_interval=flush_interval,
+            max_pending=max_pending, spawn=spawn, offload=offload,
+            write_seconds=LOG_WRITE_SECONDS.labels('game_history'),
+            clock=clock, latency_window=latency_window)
+        self.path = path
+        self.read_lock = threading.Lock()
+        self.writer = None
+        self.reader = None
+        self.question_ids = {}
+
+    def _connect(self, path):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        # Year rollups came after the others; build them once from the
+        # final scores of a history written before them.
+        if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+                conn.execute(
+                    "INSERT INTO period_scores SELECT "
+                    "'year:' || strftime('%Y', ended_at, 'unixepoch'), "
+                    "player, SUM(score), COUNT(*) FROM scores "
+                    "GROUP BY 1, player")
+                conn.execute('PRAGMA user_version = 1')
+            conn.execute('COMMIT')
+        return conn
+
+    # Recording, called from the room under its lock.
+
+    def game_started(self, game_id, room, started_at):
+        self.append(('game', game_id, room, started_at))
+
+    def round_finished(self, game_id, question_index, question, asked_at,
+                       answers):
+        # answers: (player, chosen answer text, is_correct, latency, points,
+        # answered_at) for everyone who answered.
+        self.append(('round', game_id, question_index, question, asked_at,
+                     answers))
+
+    def game_finished(self, game_id, ended_at, scores):
+        # scores: (player, score, rank) for every player in the game.
+        self.append(('finish', game_id, ended_at, scores))
+
+    def write_batch(self, batch):
+        self._blocking(self._write, batch)
+
+    def stopped(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def _question_id(self, conn, text):
+        question_id = self.question_ids.get(text)
+        if question_id is None:
+            conn.execute(
+                'INSERT OR IGNORE INTO questions (text) VALUES (?)', (text,))
+            question_id = conn.execute(
+                'SELECT id FROM questions WHERE text = ?', (text,)).fetchone()[0]
+            self.question_ids[text] = question_id
+        return question_id
+
+    def _write(self, batch):
+        if self.writer is None:
+            self.writer = self._connect(self.path)
+        conn = self.writer
+        games, rounds, answers, scores, finished, totals = [], [], [], [], [], {}
+        round_counts = collections.Counter()
+        for record in batch:
+            kind = record[0]
+            if kind == 'game':
+                games.append(record[1:])
+            elif kind == 'round':
+                _, game_id, index, question, asked_at, rows = record
+                question_id = self._question_id(conn, question)
+                rounds.append((game_id, index, question_id, asked_at,
+                               len(rows), sum(1 for row in rows if row[2])))
+                round_counts[game_id] += 1
+                answers.extend(
+                    (game_id, index, question_id, player, chosen,
+                     int(correct), latency, points, answered_at)
+                    for player, chosen, correct, latency, points, answered_at
+                    in rows)
+            elif kind == 'finish':
+                _, game_id, ended_at, rows = record
+                finished.append((ended_at, len(rows), game_id))
+                periods = period_keys(ended_at).values()
+                for player, score, rank in rows:
+                    scores.append((game_id, player, score, rank, ended_at))
+                    for period in periods:
+                        total = totals.setdefault((period, player), [0, 0])
+                        total[0] += score
+                        total[1] += 1
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO games (id, room, started_at) '
+                'VALUES (?, ?, ?)', games)
+            conn.executemany(
+                'INSERT OR REPLACE INTO rounds VALUES (?, ?, ?, ?, ?, ?)',
+                rounds)
+            conn.executemany(
+                'INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                answers)
+            conn.executemany(
+                'UPDATE games SET rounds = rounds + ? WHERE id = ?',
+                [(count, game_id) for game_id, count in round_counts.items()])
+            conn.executemany(
+                'INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)', scores)
+            conn.executemany(
+                'UPDATE games SET ended_at = ?, players = ? WHERE id = ?',
+                finished)
+            conn.executemany(
+                'INSERT INTO period_scores VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (period, player) DO UPDATE SET '
+                'score = score + excluded.score, games = games + excluded.games',
+                [(period, player, score, games)
+                 for (period, player), (score, games) in totals.items()])
+
+    # Queries.
+
+    def _read(self, fn, *args):
+        def run():
+            with self.read_lock:
+                if self.reader is None:
+                    self.reader = self._connect(self.path)
+                return fn(self.reader, *args)
+        return self._blocking(run)
+
+    def _query(self, sql, args=()):
+        return self._read(
+            lambda conn: conn.execute(sql, args).fetchall())
+
+    def player_history(self, player, limit=20):
+        summary = self._query(
+            'SELECT COUNT(*), COALESCE(SUM(correct), 0), AVG(latency), '
+            'COALESCE(SUM(points), 0) FROM answers WHERE player = ?',
+            (player,))[0]
+        games = self._query(
+            'SELECT s.game_id, g.room, s.ended_at, s.score, s.rank, g.players '
+            'FROM scores s JOIN games g ON g.id = s.game_id '
+            'WHERE s.player = ? ORDER BY s.ended_at DESC LIMIT ?',
+            (player, limit))
+        return {
+            'player': player,
+            'answers': summary[0],
+            'correct': summary[1],
+            'accuracy': summary[1] / summary[0] if summary[0] else None,
+            'mean_latency': summary[2],
+            'points': summary[3],
+            'games': [
+                {'game_id': game_id, 'room': room, 'ended_at': ended_at,
+                 'score': score, 'rank': rank, 'players': players}
+                for game_id, room, ended_at, score, rank, players in games],
+        }
+
+    def question_stats(self, question):
+        row = self._query(
+            'SELECT COUNT(*), COALESCE(SUM(a.correct), 0), AVG(a.latency) '
+            'FROM questions q JOIN answers a ON a.question_id = q.id '
+            'WHERE q.text = ?', (question,))[0]
+        return {
+            'question': question,
+            'answers': row[0],
+            'correct': row[1],
+            'accuracy': row[1] / row[0] if row[0] else None,
+            'mean_latency': row[2],
+        }
+
+    def leaderboard(self, since=None, until=None, limit=20, period=None):
+        # Either the current day, week, month or all time, or the whole UTC
+        # days covering [since, until].
+        for bound in (since, until):
+            if bound is not None and not math.isfinite(bound):
+                raise ValueError(f'{bound!r} is not a timestamp')
+        if period is None and since is None and until is None:
+            period = 'all'
+        if period is not None:
+            rows = self._query(
+                TOP_SCORES, (period_keys(time.time())[period], limit))
+        else:
+            # Clamped to the epoch and today, so a range is a key per year
+            # since 1970 and a few dozen more at most.
+            today = int(time.time() // DAY)
+            first = int(max(since, 0) // DAY) if since is not None else 0
+            last = today
+            if until is not None:
+                last = int(min(max(until, 0), time.time()) // DAY)
+            keys = range_periods(first, last)
+            rows = self._read(
+                range_leaders, keys, limit,
+                covering_period(first, last)) if keys else []
+        return [{'player': player, 'score': score, 'games': games}
+                for player, score, games in rows]
+
+    def stats(self):
+        samples = sorted(self.latency)
+        with self.condition:
+            depth = len(self.pending)
+        return {
+            'queue_depth': depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+            'batch_p50_ms': samples[len(samples) // 2] * 1000 if samples else 0.0,
+            'batch_max_ms': samples[-1] * 1000 if samples else 0.0,
+        }
@@ -0,0 +1,1033 @@
+import functools
+import json
+import logging
+import random
+import re
+import secrets
+import threading
+import time
+
+import logs
+import payloads
+from broadcast import Broadcaster
+from metrics import SECTION_SECONDS, timed
+from leaderboard import Leaderboard, VersionedView
+from presence import Typing
+from state_store import MemoryStore
+
+log = logging.getLogger('quiz.room')
+
+GAMESTATES = {
+    'lobby',
+    'question',
+    'anticipation',
+    'answer',
+    'leaderboard',
+    'epilogue',
+}
+
+ROOM_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+LEADERBOARD_TOP_N = 50
+TIMER_LEASE_TTL = 6.0
+# At most one 'update_joining_players' per room this often, however fast
+# people type.
+JOINING_INTERVAL = 1.0
+
+# Timer handle -> (saved deadline, callback). The deadline is stored with the
+# round so whichever node holds the timer lease can arm it.
+DEADLINES = {
+    'timer_thread': ('question_deadline', 'on_question_deadline'),
+    'intermission_timer_thread': (
+        'intermission_deadline', 'auto_next_question'),
+}
+# Kept per process: timer handles.
+LOCAL_KEYS = {'timer_thread', 'intermission_timer_thread'}
+# State entries stored as hashes so one player or answer is one write.
+HASH_SECTIONS = {'players': 'players', 'answers': 'current_answers'}
+
+
+def normalize_room_name(name, default):
+    if isinstance(name, str) and ROOM_NAME_PATTERN.match(name):
+        return name
+    return default
+
+
+def locked(method):
+    # Entry points run under the room lock, and everything they emit goes
+    # out as one batch when they return. The outermost one also holds the
+    # store's room lock and syncs the round with the store around the call.
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            if self.depth:
+                return method(self, *args, **kwargs)
+            self.depth += 1
+            room_lock = self.store.locked(self.key('lock'))
+            try:
+                with room_lock, self.broadcaster.batch():
+                    self.refresh()
+                    try:
+                        return method(self, *args, **kwargs)
+                    finally:
+                        # Extends the store lock if the call ran long, or
+                        # raises if it expired and another process may
+                        # have written the room meanwhile.
+                        room_lock.hold()
+                        self.save()
+                        self.rearm()
+            finally:
+                self.depth -= 1
+    return wrapper
+
+
+def to_json(value):
+    return json.dumps(value, separators=(',', ':'), default=dict)
+
+
+class GameRoom:
+    def __init__(self, name, socketio, scheduler, select_question,
+                 log_question, question_pool, registry=None,
+                 broadcast_interval=0.0, store=None, node_id=None,
+                 history=None, question_stats=None, clock_sync=None):
+        self.name = name
+        self.socketio = socketio
+        self.scheduler = scheduler
+        self.select_question = select_question
+        self.log_question = log_question
+        self.question_pool = question_pool
+        self.registry = registry
+        self.history = history
+        self.question_stats = question_stats
+        self.clock_sync = clock_sync
+        self.state = {}
+        self.questions = []
+        self.leaderboard = Leaderboard()
+        self.player_view = VersionedView()
+        self.top_n = LEADERBOARD_TOP_N
+        self.sent_ranks = {}
+        # Whose rank goes out with the next player list: players who just
+        # joined, or None for everyone once scores settle at round end.
+        self.rank_due = set()
+        # Socket.IO handlers and scheduler callbacks both mutate the round,
+        # so every entry point takes the room lock.
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.broadcaster = Broadcaster(
+            socketio, scheduler, min_interval=broadcast_interval,
+            encode=payloads.encode)
+        self.store = store if store is not None else MemoryStore()
+        self.node_id = node_id or secrets.token_hex(4)
+        self.versions = {}
+        self.synced = {'round': None, 'players': None, 'answers': None,
+                       'view': 0}
+        self.dirty = {'players': set(), 'answers': set()}
+        self.owner = None
+        self.lease_timer = None
+        self.armed = {}
+        # Typing sockets are per process, outside the round and its lock.
+        self.typing = Typing()
+        self.joining_interval = JOINING_INTERVAL
+        self.joining_timer = None
+        self.joining_sent = []
+
+    def key(self, part):
+        return f'room:{self.name}:{part}'
+
+    def changed(self, section, field):
+        self.dirty[section].add(field)
+
+    def round_doc(self):
+        doc = {k: v for k, v in self.state.items()
+               if k not in LOCAL_KEYS and k not in HASH_SECTIONS.values()}
+        doc['questions'] = self.questions
+        return to_json(doc)
+
+    def save(self):
+        # Write what changed since the last sync: the round document when
+        # it differs, and only the touched players and answers unless the
+        # whole dict was replaced.
+        if not self.state:
+            return
+        written = []
+        doc = self.round_doc()
+        if doc != self.synced['round']:
+            self.store.set(self.key('round'), doc)
+            self.synced['round'] = doc
+            written.append('round')
+        for section, state_key in HASH_SECTIONS.items():
+            entries = self.state.get(state_key)
+            dirty = self.dirty[section]
+            if entries is None:
+                continue
+            if entries is not self.synced[section]:
+                self.store.delete(self.key(section))
+                self.store.hset(self.key(section), {
+                    name: to_json(value) for name, value in entries.items()})
+                self.synced[section] = entries
+            elif dirty:
+                self.store.hset(self.key(section), {
+                    name: to_json(entries[name])
+                    for name in dirty if name in entries})
+                self.store.hdel(self.key(section),
+                                [name for name in dirty if name not in entries])
+            else:
+                continue
+            dirty.clear()
+            written.append(section)
+        # Processes sharing a room take turns sending its player_list
+        # deltas, so the view they diff against and its sequence number
+        # are shared too.
+        if self.store.shared and self.player_view.seq != self.synced['view']:
+            self.store.set(self.key('view'), to_json(self.player_view.dump()))
+            self.synced['view'] = self.player_view.seq
+            written.append('view')
+        for section in written:
+            self.versions[section] = str(
+                self.store.hincrby(self.key('versions'), section))
+
+    def refresh(self):
+        # Reload whatever another process has written since our last sync.
+        versions = self.store.hgetall(self.key('versions'))
+        if versions == self.versions:
+            return False
+        old_token = self.state.get('host_token')
+        if versions.get('round') != self.versions.get('round'):
+            doc = self.store.get(self.key('round'))
+            if doc is not None:
+                loaded = json.loads(doc)
+                self.questions = loaded.pop('questions', [])
+                local = {k: self.state[k] for k in
+                         LOCAL_KEYS | set(HASH_SECTIONS.values())
+                         if k in self.state}
+                self.state.clear()
+                self.state.update(loaded)
+                self.state.update(local)
+                self.synced['round'] = doc
+        for section, state_key in HASH_SECTIONS.items():
+            if versions.get(section) != self.versions.get(section):
+                entries = {name: json.loads(value) for name, value in
+                           self.store.hgetall(self.key(section)).items()}
+                self.state[state_key] = entries
+                self.synced[section] = entries
+                self.dirty[section].clear()
+        if versions.get('view') != self.versions.get('view'):
+            doc = self.store.get(self.key('view'))
+            if doc is not None:
+                self.player_view.load(json.loads(doc))
+                self.synced['view'] = self.player_view.seq
+        self.versions = versions
+        new_token = self.state.get('host_token')
+        if new_token != old_token and self.registry is not None:
+            self.registry.token_changed(self, old_token, new_token)
+        return True
+
+    @locked
+    def load_or_reset(self, saved=None):
+        # Another process may already be running this room; otherwise pick
+        # up from a snapshot, or start afresh.
+        if self.state:
+            return
+        if saved is not None:
+            self.restore(saved)
+        else:
+            self.reset_all()
+
+    @locked
+    def snapshot(self, since=None):
+        # The store already holds the round as JSON text; copying those
+        # strings is all that happens under the room lock.
+        self.save()
+        if self.synced['round'] is None or self.versions == since:
+            return None
+        return {
+            'versions': dict(self.versions),
+            'round': self.synced['round'],
+            'players': self.store.hgetall(self.key('players')),
+            'answers': self.store.hgetall(self.key('answers')),
+        }
+
+    def restore(self, saved):
+        round_state = dict(saved['round'])
+        self.questions = round_state.pop('questions', [])
+        self.state.clear()
+        self.state.update(round_state)
+        # Their sockets died with the old process; each comes back online
+        # when its client reconnects and re-joins.
+        players = saved.get('players', {})
+        for player in players.values():
+            player['sid'] = None
+            player['online'] = False
+        self.state['players'] = players
+        self.state['current_answers'] = saved.get('answers', {})
+        if self.registry is not None:
+            self.registry.token_changed(self, None, self.state.get('host_token'))
+        logs.event(log, 'restore', 'Restored %s', self.name, room=self.name,
+                   players=len(players),
+                   question=self.state.get('current_question_index', -1) + 1)
+
+    def start_lease(self):
+        if self.lease_timer is None:
+            self.lease_timer = self.scheduler.call_every(
+                TIMER_LEASE_TTL / 3, self.keep_lease)
+        self.keep_lease()
+
+    @locked
+    def keep_lease(self):
+        # One node per room owns the question and intermission timers; the
+        # lease outlives a missed renewal or two, then another node takes
+        # over and re-arms from the saved deadlines.
+        self.claim_timers()
+
+    def claim_timers(self):
+        lease = self.key('timers')
+        self.owner = (
+            self.store.renew(lease, self.node_id, TIMER_LEASE_TTL) or
+            self.store.acquire(lease, self.node_id, TIMER_LEASE_TTL))
+        return self.owner
+
+    def close(self):
+        # Dropped from the registry: stop every timer so nothing keeps the
+        # room alive.
+        with self.lock:
+            self.release_lease()
+            for handle_key in DEADLINES:
+                self.cancel_timer(handle_key)
+            if self.joining_timer is not None:
+                self.joining_timer.cancel()
+                self.joining_timer = None
+
+    def release_lease(self):
+        if self.lease_timer is not None:
+            self.lease_timer.cancel()
+            self.lease_timer = None
+        if self.owner:
+            self.store.release(self.key('timers'), self.node_id)
+        self.owner = False
+
+    def schedule(self, handle_key, delay, index):
+        self.state[DEADLINES[handle_key][0]] = [time.time() + delay, index]
+        self.arm(handle_key)
+
+    def arm(self, handle_key):
+        spec_key, callback = DEADLINES[handle_key]
+        spec = self.state.get(spec_key)
+        if self.owner is None:
+            self.claim_timers()
+        if spec is not None and self.owner:
+            if self.armed.get(handle_key) == spec and self.state.get(
+                    handle_key) is not None:
+                return
+            self.cancel_timer(handle_key)
+            deadline, index = spec
+            self.state[handle_key] = self.scheduler.call_later(
+                max(0, deadline - time.time()), getattr(self, callback), index)
+            self.armed[handle_key] = spec
+        else:
+            self.cancel_timer(handle_key)
+
+    def rearm(self):
+        for handle_key in DEADLINES:
+            self.arm(handle_key)
+
+    def cancel_timer(self, handle_key):
+        if self.state.get(handle_key):
+            self.state[handle_key].cancel()
+            self.state[handle_key] = None
+        self.armed.pop(handle_key, None)
+
+    def emit(self, event, payload=None, to=None):
+        self.broadcaster.emit(event, payload, to or self.name)
+
+    def question_live(self):
+        return self.state.get('gamestate') == 'question'
+
+    def is_game_started(self):
+        if not self.state:
+            return False
+        if self.state.get('current_question') is not None:
+            return True
+        idx = self.state.get('current_question_index')
+        return isinstance(idx, int) and 0 <= idx < len(self.questions)
+
+    def stop_timer_thread(self):
+        self.state.pop('question_deadline', None)
+        self.cancel_timer('timer_thread')
+
+    def stop_intermission_thread(self):
+        self.state.pop('intermission_deadline', None)
+        self.cancel_timer('intermission_timer_thread')
+
+    def set_host_token(self, token):
+        old_token = self.state.get('host_token')
+        self.state['host_token'] = token
+        if self.registry is not None:
+            self.registry.token_changed(self, old_token, token)
+        return token
+
+    def ensure_host_token(self):
+        if not self.state.get('host_token'):
+            self.set_host_token(secrets.token_urlsafe(6))
+        return self.state['host_token']
+
+    @locked
+    def has_token(self, token):
+        return bool(token) and self.state.get('host_token') == token
+
+    def set_gamestate(self, state, broadcast=True):
+        if state not in GAMESTATES:
+            return
+        self.state['gamestate'] = state
+        if broadcast:
+            self.emit('gamestate', {'state': state})
+
+    def ensure_fake_players(self):
+        if self.state.get('players'):
+            return
+        self.state['players'] = {
+            'Alice': {'score': 10, 'sid': None, 'ip': 'debug'},
+            'Bob': {'score': 20, 'sid': None, 'ip': 'debug'},
+            'Charle': {'score': 30, 'sid': None, 'ip': 'debug'},
+        }
+
+    def broadcast_host_session(self):
+        # Sent when the token changes; new sockets get it in send_session.
+        self.emit('host_session', {'token': self.ensure_host_token()})
+
+    def init_questions(self, count=5):
+        # Index into the pool rather than copying it; an mmap-backed bank
+        # would otherwise decode every record.
+        pool = self.question_pool
+        picked = random.sample(range(len(pool)), min(count, len(pool)))
+        self.questions = [pool[position] for position in picked]
+
+    def add_scores_for_correct_answers(self):
+        game_state = self.state
+        current_q = game_state.get('current_question')
+        if not current_q:
+            idx = game_state.get('current_question_index')
+            if isinstance(idx, int) and 0 <= idx < len(self.questions):
+                current_q = self.questions[idx]
+            else:
+                return
+        correct_answer_index = current_q['correct']
+        board = self.ranked()
+
+        # Set intermission duration: 5s if 1 player, else 10s
+        intermission_duration = 5 if len(game_state['players']) == 1 else 10
+        game_state['intermission_duration'] = intermission_duration
+
+        # Prepare results for host screen
+        results = {
+            'next_question_time': time.time() + intermission_duration,
+            'intermission_duration': intermission_duration,
+            'question': current_q['question'],
+            'answers': current_q['answers'],
+            'correct_index': correct_answer_index,
+            'player_answers': {}
+        }
+
+        asked_at = (game_state.get('end_time') or time.time()) - (
+            game_state.get('duration') or 0)
+        history_rows = []
+        answers = current_q['answers']
+        for _sid, answer_data in game_state['current_answers'].items():
+            username = answer_data['username']
+            chosen_answer_index = answer_data['answer_index']
+            answer_time = answer_data.get('time', time.time())
+
+            results['player_answers'][username] = {
+                'chosen_index': chosen_answer_index,
+                'is_correct': (chosen_answer_index == correct_answer_index)
+            }
+            points = 0
+            if chosen_answer_index == correct_answer_index:
+                # Score based on time remaining (end_time - answer_time)
+                time_left = max(
+                    0, int(
+                        game_state.get(
+                            'end_time', time.time()) - answer_time))
+                points = 100 + time_left
+                player = game_state['players'][username]
+                player['score'] += points
+                board.set_score(username, player['score'])
+                self.changed('players', username)
+            chosen = (answers[chosen_answer_index]
+                      if isinstance(chosen_answer_index, int) and
+                      0 <= chosen_answer_index < len(answers) else None)
+            history_rows.append((
+                username, chosen,
+                chosen_answer_index == correct_answer_index,
+                max(0.0, answer_time - asked_at), points, answer_time))
+
+        if self.history is not None and game_state.get('game_id'):
+            self.history.round_finished(
+                game_state['game_id'], game_state['current_question_index'],
+                current_q['question'], asked_at, history_rows)
+        if self.question_stats is not None:
+            self.question_stats.record_round(
+                current_q['question'], history_rows)
+
+        self.emit('round_results', results)
+        self.set_gamestate('answer')
+        self.rank_due = None
+        self.send_player_details()
+
+    @timed(SECTION_SECONDS.labels('process_answers'))
+    @locked
+    def process_answers(self):
+        game_state = self.state
+        if game_state.get('answers_processed'):
+            return
+        game_state['answers_processed'] = True
+        self.stop_timer_thread()
+
+        # Calculate scores first to set intermission_duration
+        self.add_scores_for_correct_answers()
+        game_state['current_answers'] = {}
+        game_state['answered_count'] = 0
+
+        # Start intermission timer
+        self.set_gamestate('anticipation')
+        duration = game_state.get('intermission_duration', 20)
+        game_state['intermission_active'] = True
+        self.schedule('intermission_timer_thread', duration,
+                      game_state['current_question_index'] + 1)
+
+    def ranked(self):
+        players = self.state.get('players', {})
+        if self.leaderboard.players is not players:
+            self.leaderboard.rebuild(players)
+            self.sent_ranks = {}
+            self.rank_due = None
+        return self.leaderboard
+
+    def resolve_scores(self):
+        board = self.ranked()
+        players = self.state['players']
+        sorted_players = [(name, players[name]) for name in board.names()]
+        return sorted_players, board.winners()
+
+    def public_scores(self, count=None):
+        board = self.ranked()
+        return {name: {'score': score}
+                for name, score in board.top(count or self.top_n)}
+
+    @timed(SECTION_SECONDS.labels('send_player_details'))
+    def send_player_details(self, to=None):
+        board = self.ranked()
+        delta = self.player_view.diff(
+            board.top(self.top_n), board.winners(limit=self.top_n), len(board))
+        if delta is not None:
+            self.emit('player_list', delta)
+        due, self.rank_due = self.rank_due, set()
+        self.send_player_ranks(due)
+        if to is not None:
+            self.emit('player_list', self.player_view.snapshot(), to=to)
+
+    @locked
+    def send_player_snapshot(self, sid):
+        self.send_player_details(to=sid)
+
+    def send_player_ranks(self, names=None):
+        # Players outside the broadcast top N still need their own rank,
+        # so send it to each of `names` (default everyone) whose rank or
+        # score actually moved.
+        board = self.ranked()
+        players = self.state['players']
+        for name in players if names is None else names:
+            stats = players.get(name)
+            sid = stats and stats.get('sid')
+            if not sid:
+                continue
+            rank_info = (board.rank(name), stats['score'])
+            if self.sent_ranks.get(name) == rank_info:
+                continue
+            self.sent_ranks[name] = rank_info
+            self.emit('player_rank', {
+                'username': name,
+                'rank': rank_info[0],
+                'score': rank_info[1],
+            }, to=sid)
+
+    @locked
+    def leaderboard_page(self, offset=0, limit=50):
+        board = self.ranked()
+        return {
+            'room': self.name,
+            'total': len(board),
+            'offset': offset,
+            'limit': limit,
+            'players': [
+                {'rank': board.rank(name), 'name': name, 'score': score}
+                for name, score in board.page(offset, limit)],
+        }
+
+    @locked
+    def auto_next_question(self, target_index):
+        self.next_question(target_index)
+
+    @locked
+    def on_question_deadline(self, question_index):
+        # A deadline popped just as the host skipped ahead must not end
+        # the round that replaced it.
+        if self.state.get('current_question_index') == question_index:
+            self.process_answers()
+
+    def question_payload(self, index):
+        # What players see: never the correct index.
+        question = self.state['current_question']
+        return {
+            'index': index,
+            'question': question['question'],
+            'answers': list(question['answers']),
+            'iq': question.get('iq'),
+            'category': question.get('category'),
+            'total': (self.state.get('question_filter') or {}).get('count'),
+        }
+
+    def send_current_round(self, sid):
+        game_state = self.state
+        if self.is_game_started():
+            index = game_state['current_question_index']
+            question_data = game_state.get('current_question')
+            if question_data:
+                # Send index to allow frontend to track it
+                self.emit('question', self.question_payload(index), to=sid)
+        if game_state.get('end_time') and game_state['end_time'] > time.time():
+            self.emit('timer', {
+                'end_time': game_state['end_time'],
+                'duration': game_state['duration'],
+            }, to=sid)
+
+    @locked
+    def send_session(self, sid):
+        self.emit('host_session', {'token': self.ensure_host_token()}, to=sid)
+        self.send_player_details(to=sid)
+        for username, player in self.state['players'].items():
+            if not player.get('online', True):
+                self.emit('player_presence', {
+                    'username': username,
+                    'online': False,
+                    'last_seen': player['last_seen'],
+                }, to=sid)
+        if self.state.get('gamestate'):
+            self.emit('gamestate', {'state': self.state['gamestate']}, to=sid)
+        self.send_current_round(sid)
+
+    @locked
+    def join(self, username, sid, client_ip):
+        players = self.state['players']
+        board = self.ranked()
+        if username not in players:
+            is_first_player = len(players) == 0
+            players[username] = {
+                'score': 3 if is_first_player else 0,
+                'sid': sid,
+                'ip': client_ip,
+                'online': True,
+                'last_seen': time.time(),
+            }
+            self.changed('players', username)
+            board.add(username, players[username]['score'])
+            self.rank_owed(username)
+            logs.event(log, 'join', '%s joined', username, room=self.name,
+                       ip=client_ip)
+        elif players[username].get('ip') == client_ip:
+            # Same user re-joining
+            players[username]['sid'] = sid
+            self.changed('players', username)
+            self.sent_ranks.pop(username, None)
+            self.rank_owed(username)
+            self.set_online(username, True)
+            logs.event(log, 'join', '%s re-joined', username, room=self.name,
+                       ip=client_ip)
+        else:
+            self.emit('error', {'message': 'Username already taken.'}, to=sid)
+            return False
+
+        self.emit('joined', {'username': username}, to=sid)
+        self.emit('player_joined', {'username': username})
+        self.send_player_details()
+        self.send_current_round(sid)
+        return True
+
+    def rank_owed(self, username):
+        if self.rank_due is not None:
+            self.rank_due.add(username)
+
+    def set_online(self, username, online):
+        player = self.state['players'][username]
+        was_online = player.get('online', True)
+        player['online'] = online
+        player['last_seen'] = time.time()
+        self.changed('players', username)
+        if was_online != online:
+            self.emit('player_presence', {
+                'username': username,
+                'online': online,
+                'last_seen': player['last_seen'],
+            })
+
+    @locked
+    def player_disconnected(self, sid):
+        for username, player in self.state['players'].items():
+            if player.get('sid') == sid:
+                player['sid'] = None
+                self.set_online(username, False)
+                return username
+        return None
+
+    def presence(self):
+        players = self.state.get('players', {})
+        online = sum(1 for p in players.values() if p.get('online', True))
+        return {'players': len(players), 'online': online}
+
+    @locked
+    def apply_gamestate(self, state):
+        game_state = self.state
+        if state == 'lobby':
+            self.stop_timer_thread()
+            self.stop_intermission_thread()
+            game_state['current_question_index'] = -1
+            game_state['current_question'] = None
+            game_state['current_answers'] = {}
+            game_state['answered_count'] = 0
+            game_state['answers_processed'] = False
+            game_state['intermission_active'] = False
+            game_state['end_time'] = None
+            game_state['duration'] = None
+            self.set_gamestate('lobby', broadcast=True)
+            self.emit('clear_question')
+            return
+        if state == 'question':
+            self.ensure_fake_players()
+            if not self.is_game_started():
+                self.start_game()
+            else:
+                self.set_gamestate('question', broadcast=True)
+            return
+        if state == 'answer':
+            self.ensure_fake_players()
+            if game_state.get('current_question') and not game_state.get(
+                    'answers_processed'):
+                self.process_answers()
+            else:
+                self.set_gamestate('answer', broadcast=True)
+            return
+        if state in GAMESTATES and state != 'lobby':
+            self.ensure_fake_players()
+        if state == 'epilogue':
+            self.finish_game()
+        self.set_gamestate(state, broadcast=True)
+        self.send_player_details()
+
+    def note_typing(self, sid, username):
+        # Keystrokes only update the table; the list goes out on the next
+        # tick, so the host sees one update per interval, not per key.
+        self.typing.note(sid, username)
+        self.arm_joining()
+
+    def stop_typing(self, sid):
+        if self.typing.remove(sid):
+            self.arm_joining()
+
+    def arm_joining(self):
+        with self.typing.lock:
+            if self.joining_timer is None:
+                self.joining_timer = self.scheduler.call_later(
+                    self.joining_interval, self.send_joining_players)
+
+    def send_joining_players(self):
+        with self.typing.lock:
+            names = self.typing.names()
+            # Keep ticking while anyone is left to expire.
+            self.joining_timer = None
+            if self.typing:
+                self.arm_joining()
+        if names != self.joining_sent:
+            self.joining_sent = names
+            self.emit('update_joining_players', names)
+
+    def finish_game(self):
+        # Final scores go to the history once per game: on game over, the
+        # epilogue, or a reset part-way through.
+        game_id = self.state.pop('game_id', None)
+        if self.history is None or not game_id:
+            return
+        board = self.ranked()
+        self.history.game_finished(game_id, time.time(), [
+            (name, score, board.rank(name)) for name, score in board.page()])
+
+    def reset_game(self):
+        game_state = self.state
+        self.finish_game()
+        game_state['current_question_index'] = -1  # Reset for first question
+        game_state['current_answers'] = {}
+        game_state['answered_count'] = 0
+        game_state['current_question'] = None
+        game_state['answers_processed'] = False
+        game_state['intermission_active'] = False
+        game_state['intermission_timer_thread'] = None
+        game_state['timer_thread'] = None
+        game_state['end_time'] = None
+        game_state['duration'] = None
+        self.set_gamestate('lobby')
+        for player in game_state['players']:
+            game_state['players'][player]['score'] = 0  # Reset scores
+            self.changed('players', player)
+        self.leaderboard.rebuild(game_state['players'])
+        self.sent_ranks = {}
+        self.rank_due = None
+
+        self.init_questions()
+
+    @locked
+    def start_game(self, question_filter=None):
+        if self.state['current_question_index'] >= 0:
+            return  # Already running, or over and waiting for a reset
+        self.finish_game()
+        # Which part of the bank this game draws from, and how many
+        # questions it runs to; see question_filter() in app.py.
+        self.state['question_filter'] = question_filter
+        self.state['game_id'] = secrets.token_hex(8)
+        if self.history is not None:
+            self.history.game_started(
+                self.state['game_id'], self.name, time.time())
+        self.emit('game_started')
+        self.set_gamestate('question')
+        self.next_question(0)
+
+    @locked
+    def reset_all(self):
+        self.finish_game()
+        self.stop_timer_thread()
+        self.stop_intermission_thread()
+        old_token = self.state.get('host_token')
+        self.state.clear()
+        self.state['players'] = {}
+        if self.registry is not None:
+            self.registry.token_changed(self, old_token, None)
+        self.set_host_token(secrets.token_urlsafe(6))
+
+        self.reset_game()
+
+        self.broadcast_host_session()
+        self.emit('game_reset')
+        self.send_player_details()
+        logs.event(log, 'game', 'Game and players fully reset', room=self.name)
+
+    @locked
+    def record_answer(self, sid, username, answer_index, answered_at=None):
+        # answered_at is the clock-corrected time the player answered;
+        # without it the answer counts from when it arrived.
+        game_state = self.state
+        now = time.time() if answered_at is None else answered_at
+        if game_state.get('answers_processed'):
+            return False
+        # Check if timer is running (end_time > now)
+        end_time = game_state.get('end_time')
+        if not end_time or now >= end_time:
+            return False
+        if game_state.get('duration'):
+            now = max(now, end_time - game_state['duration'])
+        if username not in game_state['players']:
+            return False
+        current_answers = game_state['current_answers']
+        if username in current_answers:
+            return False  # First answer counts, even from a second tab
+        current_answers[username] = {
+            'username': username,
+            'answer_index': answer_index,
+            'time': now,
+            'sid': sid,
+        }
+        self.changed('answers', username)
+        game_state['answered_count'] = game_state.get('answered_count', 0) + 1
+        logs.event(log, 'answer', '%s answered %s', username, answer_index,
+                   room=self.name)
+
+        # Check if all active players have answered
+        if game_state['answered_count'] >= len(game_state['players']):
+            self.process_answers()
+        return True
+
+    @timed(SECTION_SECONDS.labels('next_question'))
+    @locked
+    def next_question(self, question_index):
+        game_state = self.state
+        if question_index <= game_state['current_question_index']:
+            return  # Ignore if same question index or irregular jump back
+
+        # Check if intermission is active (manual skip)
+        if game_state.get('intermission_active'):
+            game_state['intermission_active'] = False
+            self.stop_intermission_thread()
+
+        logs.event(log, 'question', 'Moving to question index %s',
+                   question_index, room=self.name)
+        if game_state['current_question_index'] != -1:
+            self.process_answers()
+
+        game_state['current_question_index'] = question_index
+        game_state['current_answers'] = {}  # Clear answers for new question
+        game_state['answered_count'] = 0
+        game_state['answers_processed'] = False
+
+        limit = (game_state.get('question_filter') or {}).get('count')
+        if limit and question_index >= limit:
+            next_q = None
+        else:
+            next_q = self.select_question()
+
+        if next_q is None:
+            game_state['game_started'] = False
+            self.finish_game()
+            self.set_gamestate('epilogue')
+            self.emit('game_over', self.public_scores())
+            logs.event(log, 'game', 'Game over', room=self.name)
+            return
+
+        # Bank entries are shared and read-only; shuffle a per-round copy
+        game_state['current_question'] = next_q.for_round()
+        question_data = game_state['current_question']
+        self.log_question(question_data['question'])
+
+        self.emit('question', self.question_payload(
+            game_state['current_question_index']))
+        self.set_gamestate('question')
+        if self.clock_sync is not None:
+            self.clock_sync.wake()
+
+        duration = 25
+        game_state['duration'] = duration
+        game_state['end_time'] = time.time() + duration
+        self.schedule('timer_thread', duration, question_index)
+        self.emit('timer', {
+            'end_time': game_state['end_time'],
+            'duration': duration
+        })
+        logs.event(log, 'question', 'Question %s started',
+                   game_state['current_question_index'] + 1, room=self.name)
+
+
+class RoomRegistry:
+    # Rooms by name, token and socket. Any ?room= name makes a room, so
+    # there are at most max_rooms of them, and one with no socket bound
+    # for idle_after seconds is dropped (rooms named in keep never are).
+
+    def __init__(self, factory, max_rooms=None, idle_after=None, keep=(),
+                 clock=time.monotonic):
+        self.factory = factory
+        self.max_rooms = max_rooms
+        self.idle_after = idle_after
+        self.keep = set(keep)
+        self.clock = clock
+        self.rooms = {}
+        self.rooms_by_token = {}
+        self.rooms_by_sid = {}
+        self.sockets = {}
+        self.idle_since = {}
+        self.evicted = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def get(self, name):
+        return self.rooms.get(name)
+
+    def get_or_create(self, name, saved=None):
+        # None when the registry is full of rooms that are in use.
+        room = self.rooms.get(name)
+        if room is not None:
+            return room
+        dropped = None
+        with self.lock:
+            room = self.rooms.get(name)
+            if room is None:
+                if self.max_rooms and len(self.rooms) >= self.max_rooms:
+                    idle = [other for other in
+                            sorted(self.idle_since, key=self.idle_since.get)
+                            if other not in self.keep]
+                    if not idle:
+                        return None
+                    dropped = self.drop(idle[0])
+                room = self.factory(name, self)
+                self.rooms[name] = room
+                self.idle_since[name] = self.clock()
+                room.load_or_reset(saved)
+                room.start_lease()
+        if dropped is not None:
+            dropped.close()
+        return room
+
+    def drop(self, name):
+        # Under self.lock. The caller closes the room once it is released:
+        # a room takes the registry lock under its own when its token
+        # changes.
+        room = self.rooms.pop(name, None)
+        self.idle_since.pop(name, None)
+        if room is not None:
+            for token in [token for token, other in self.rooms_by_token.items()
+                          if other is room]:
+                del self.rooms_by_token[token]
+            self.evicted += 1
+        return room
+
+    def evict_idle(self):
+        if self.idle_after is None:
+            return []
+        cutoff = self.clock() - self.idle_after
+        with self.lock:
+            dropped = [self.drop(name) for name, since in
+                       list(self.idle_since.items())
+                       if since <= cutoff and name not in self.keep]
+        for room in dropped:
+            room.close()
+        return [room.name for room in dropped]
+
+    def by_token(self, token):
+        if not token:
+            return None
+        return self.rooms_by_token.get(token)
+
+    def token_changed(self, room, old_token, new_token):
+        with self.lock:
+            if old_token and self.rooms_by_token.get(old_token) is room:
+                del self.rooms_by_token[old_token]
+            if new_token:
+                self.rooms_by_token[new_token] = room
+
+    def bind_sid(self, sid, room):
+        with self.lock:
+            old = self.rooms_by_sid.get(sid)
+            if old is room:
+                return
+            if old is not None:
+                self.left(old)
+            self.rooms_by_sid[sid] = room
+            self.sockets[room.name] = self.sockets.get(room.name, 0) + 1
+            self.idle_since.pop(room.name, None)
+
+    def unbind_sid(self, sid):
+        with self.lock:
+            room = self.rooms_by_sid.pop(sid, None)
+            if room is not None:
+                self.left(room)
+            return room
+
+    def left(self, room):
+        count = self.sockets.get(room.name, 0) - 1
+        if count > 0:
+            self.sockets[room.name] = count
+        else:
+            self.sockets.pop(room.name, None)
+            if self.rooms.get(room.name) is room:
+                self.idle_since[room.name] = self.clock()
+
+    def by_sid(self, sid):
+        return self.rooms_by_sid.get(sid)
+
+    def release_leases(self):
+        for room in list(self.rooms.values()):
+            room.release_lease()
@@ -0,0 +1,154 @@
+import collections
+import logging
+import threading
+import time
+
+log = logging.getLogger('quiz.writer')
+
+
+class GroupCommitWriter:
+    # Callers queue a record; one background task hands whatever has
+    # queued up to write_batch() once batch_size records are waiting or
+    # the oldest has waited flush_interval, so many records share one
+    # write or one transaction. A crash loses at most the queued records,
+    # never more than max_pending: past that, callers wait for the writer.
+    # Subclasses implement write_batch() and, to release what they hold
+    # when the writer stops, stopped().
+
+    def __init__(self, batch_size=256, flush_interval=0.2, max_pending=10000,
+                 spawn=None, offload=None, write_seconds=None,
+                 clock=time.monotonic, latency_window=1024):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spawn = spawn
+        # Runs the blocking calls; serving.run_blocking under a green
+        # server so a slow disk does not stall every socket.
+        self.offload = offload
+        self.write_seconds = write_seconds
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.pending = []
+        self.first_queued_at = None
+        self.enqueued = 0
+        self.written = 0
+        self.flush_requested = False
+        self.running = False
+        self.closing = False
+        self.batches = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.latency = collections.deque(maxlen=latency_window)
+        self.max_latency = 0.0
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            self.closing = False
+        if self.spawn is not None:
+            self.spawn(self.run)
+        else:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def append(self, record):
+        if not self.running:
+            self.start()
+        with self.condition:
+            # Back-pressure instead of unbounded loss if the disk stalls.
+            while len(self.pending) >= self.max_pending and self.running:
+                self.condition.wait()
+            if not self.pending:
+                self.first_queued_at = self.clock()
+            self.pending.append(record)
+            self.enqueued += 1
+            if len(self.pending) > self.max_depth:
+                self.max_depth = len(self.pending)
+            if len(self.pending) in (1, self.batch_size):
+                self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        # Wait until everything queued so far has been written.
+        with self.condition:
+            if not self.running:
+                return self.written >= self.enqueued
+            target = self.enqueued
+            self.flush_requested = True
+            self.condition.notify_all()
+            return self.condition.wait_for(
+                lambda: self.written >= target or not self.running, timeout)
+
+    def close(self):
+        with self.condition:
+            if not self.running:
+                return
+            self.closing = True
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: not self.running)
+
+    def queue_depth(self):
+        with self.condition:
+            return len(self.pending)
+
+    def _next_batch(self):
+        with self.condition:
+            while True:
+                if self.pending and (
+                        self.closing or self.flush_requested or
+                        len(self.pending) >= self.batch_size):
+                    break
+                if not self.pending:
+                    if self.closing:
+                        return None
+                    self.flush_requested = False
+                    self.condition.wait()
+                    continue
+                remaining = (self.first_queued_at + self.flush_interval -
+                             self.clock())
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch, self.pending = self.pending, []
+            self.first_queued_at = None
+            self.condition.notify_all()
+            return batch
+
+    def run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            started = self.clock()
+            try:
+                self.write_batch(batch)
+            except Exception:
+                self.errors += 1
+                log.exception('%s could not write a batch of %d',
+                              type(self).__name__, len(batch))
+            took = self.clock() - started
+            self.latency.append(took)
+            if self.write_seconds is not None:
+                self.write_seconds.observe(took)
+            if took > self.max_latency:
+                self.max_latency = took
+            self.batches += 1
+            with self.condition:
+                self.written += len(batch)
+                self.condition.notify_all()
+        self.stopped()
+        with self.condition:
+            self.running = False
+            self.flush_requested = False
+            self.condition.notify_all()
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+    def stopped(self):
+        pass
+
+    def _blocking(self, fn, *args):
+        if self.offload is None:
+            return fn(*args)
+        return self.offload(fn, *args)
@@ -0,0 +1,161 @@
+import bisect
+import itertools
+
+
+class Leaderboard:
+    # Players kept sorted by score (highest first) and then by join order,
+    # the same order a stable sort of the players dict gives. Score changes
+    # move one entry instead of re-sorting everyone, and ranks come from a
+    # binary search.
+
+    def __init__(self):
+        self.entries = []
+        self.keys = {}
+        self.counter = itertools.count()
+        self.players = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.keys
+
+    def clear(self):
+        self.entries = []
+        self.keys = {}
+        self.players = None
+
+    def rebuild(self, players):
+        self.clear()
+        self.players = players
+        self.entries = [
+            (-stats['score'], next(self.counter), name)
+            for name, stats in players.items()]
+        self.entries.sort()
+        self.keys = {entry[2]: entry for entry in self.entries}
+
+    def add(self, name, score=0):
+        if name in self.keys:
+            self.set_score(name, score)
+            return
+        key = (-score, next(self.counter), name)
+        self.keys[name] = key
+        bisect.insort(self.entries, key)
+
+    def remove(self, name):
+        key = self.keys.pop(name, None)
+        if key is None:
+            return
+        del self.entries[bisect.bisect_left(self.entries, key)]
+
+    def set_score(self, name, score):
+        key = self.keys.get(name)
+        if key is None:
+            self.add(name, score)
+            return
+        if -key[0] == score:
+            return
+        del self.entries[bisect.bisect_left(self.entries, key)]
+        key = (-score, key[1], name)
+        self.keys[name] = key
+        bisect.insort(self.entries, key)
+
+    def score(self, name):
+        return -self.keys[name][0]
+
+    def rank(self, name):
+        # Competition ranking: players on the same score share a rank.
+        key = self.keys.get(name)
+        if key is None:
+            return None
+        return bisect.bisect_left(self.entries, (key[0],)) + 1
+
+    def page(self, offset=0, limit=None):
+        end = len(self.entries) if limit is None else offset + limit
+        return [(name, -neg_score)
+                for neg_score, _, name in self.entries[offset:end]]
+
+    def top(self, count):
+        return self.page(0, count)
+
+    def names(self):
+        return [name for _, _, name in self.entries]
+
+    def winners(self, limit=None):
+        if not self.entries:
+            return []
+        top_score = -self.entries[0][0]
+        if top_score == 0:
+            top_score += 1  # Prevent all zero score winners
+        start = bisect.bisect_left(self.entries, (-top_score,))
+        end = bisect.bisect_right(self.entries, (-top_score, float('inf')))
+        if limit is not None:
+            end = min(end, start + limit)
+        return [name for _, _, name in self.entries[start:end]]
+
+
+class VersionedView:
+    # The top N view last broadcast to a room. Each broadcast sends only
+    # what changed since then, tagged with a sequence number so clients can
+    # spot a missed update and ask for a full snapshot.
+
+    def __init__(self):
+        self.seq = 0
+        self.entries = []
+        self.winners = []
+        self.total = 0
+
+    def snapshot(self):
+        return {
+            'seq': self.seq,
+            'snapshot': True,
+            'players': [[name, score] for name, score in self.entries],
+            'winning_players': list(self.winners),
+            'total_players': self.total,
+        }
+
+    def dump(self):
+        return [self.seq, self.entries, self.winners, self.total]
+
+    def load(self, saved):
+        seq, entries, winners, total = saved
+        self.seq = seq
+        self.entries = [(name, score) for name, score in entries]
+        self.winners = winners
+        self.total = total
+
+    def diff(self, entries, winners, total):
+        old_scores = dict(self.entries)
+        new_scores = dict(entries)
+        delta = {}
+        removed = [name for name in old_scores if name not in new_scores]
+        added = [[name, score] for name, score in entries
+                 if name not in old_scores]
+        changed = [[name, score] for name, score in entries
+                   if name in old_scores and old_scores[name] != score]
+        if removed:
+            delta['removed'] = removed
+        if added:
+            delta['added'] = added
+        if changed:
+            delta['scores'] = changed
+        # Clients re-sort by score with a stable sort after applying the
+        # delta; only send the order when that would get it wrong.
+        names = [name for name, _ in entries]
+        expected = [name for name, _ in self.entries if name in new_scores]
+        expected += [name for name, _ in added]
+        expected.sort(key=lambda name: -new_scores[name])
+        if expected != names:
+            delta['order'] = names
+        if winners != self.winners:
+            delta['winning_players'] = list(winners)
+        if total != self.total:
+            delta['total_players'] = total
+        if not delta:
+            return None
+        self.seq += 1
+        self.entries = list(entries)
+        self.winners = list(winners)
+        self.total = total
+        delta['seq'] = self.seq
+        return delta
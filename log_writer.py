@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+from group_commit import GroupCommitWriter
+from metrics import LOG_WRITE_SECONDS
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class LogWriter(GroupCommitWriter):
+    # Appends lines to a file, a batch per write. A crash loses the queued
+    # lines and, unless fsync is 'always', what the OS has not yet written
+    # out.
+
+    def __init__(self, path, batch_size=256, flush_interval=0.2,
+                 fsync='interval', fsync_interval=1.0, max_pending=10000,
+                 spawn=None, on_flush=None, offload=None,
+                 clock=time.monotonic, latency_window=1024):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'fsync must be one of {FSYNC_POLICIES}')
+        super().__init__(
+            batch_size=batch_size, flush_interval=flush_interval,
+            max_pending=max_pending, spawn=spawn, offload=offload,
+            write_seconds=LOG_WRITE_SECONDS.labels(os.path.basename(path)),
+            clock=clock, latency_window=latency_window)
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.on_flush = on_flush
+        self.io_lock = threading.RLock()
+        self.file = None
+        self.last_fsync = clock()
+        self.fsyncs = 0
+
+    def stopped(self):
+        with self.io_lock:
+            self._sync(force=True)
+            self._close_file()
+
+    def _append(self, data):
+        if self.file is None:
+            self.file = open(self.path, 'a')
+        self.file.write(data)
+        self.file.flush()
+
+    def write_batch(self, batch):
+        with self.io_lock:
+            try:
+                self._blocking(self._append, '\n'.join(batch) + '\n')
+                self._sync()
+            except OSError:
+                self.errors += 1
+                self._close_file()
+                return
+            if self.on_flush is not None:
+                self.on_flush(len(batch))
+
+    def _sync(self, force=False):
+        if self.file is None or self.fsync == 'never':
+            return
+        now = self.clock()
+        if (force or self.fsync == 'always' or
+                now - self.last_fsync >= self.fsync_interval):
+            try:
+                self._blocking(os.fsync, self.file.fileno())
+            except OSError:
+                self.errors += 1
+                return
+            self.last_fsync = now
+            self.fsyncs += 1
+
+    def _close_file(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+
+    def _write_file(self, path, lines):
+        with open(path, 'w') as f:
+            for line in lines:
+                f.write(line + '\n')
+            f.flush()
+            if self.fsync != 'never':
+                os.fsync(f.fileno())
+
+    def rewrite(self, lines):
+        # Atomically replace the file; queued lines are appended after.
+        with self.io_lock:
+            tmp_path = self.path + '.tmp'
+            self._blocking(self._write_file, tmp_path, lines)
+            self._close_file()
+            os.replace(tmp_path, self.path)
+
+    def stats(self):
+        samples = sorted(self.latency)
+        stats = {
+            'queue_depth': self.queue_depth(),
+            'queue_depth_max': self.max_depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'fsyncs': self.fsyncs,
+            'errors': self.errors,
+            'fsync': self.fsync,
+            'flush_max_ms': self.max_latency * 1000,
+            'flush_p50_ms': 0.0,
+            'flush_p99_ms': 0.0,
+        }
+        if samples:
+            stats['flush_p50_ms'] = samples[len(samples) // 2] * 1000
+            stats['flush_p99_ms'] = samples[
+                min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+        return stats
@@ -0,0 +1,300 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import traceback
+
+
+class Sampler:
+    # Keeps one record in every round(1 / rate) of an event type, counted
+    # rather than drawn, so a rate of 0.01 logs exactly one answer in a
+    # hundred. Types without a rate are all kept.
+
+    def __init__(self, rates=None):
+        self.every = {}
+        self.counts = {}
+        self.dropped = 0
+        for name, rate in (rates or {}).items():
+            self.set_rate(name, rate)
+
+    def set_rate(self, name, rate):
+        if rate >= 1:
+            self.every.pop(name, None)
+        else:
+            self.every[name] = 0 if rate <= 0 else max(1, round(1 / rate))
+        self.counts[name] = 0
+
+    def keep(self, name):
+        every = self.every.get(name)
+        if every is None:
+            return True
+        if every:
+            count = self.counts[name] = self.counts.get(name, 0) + 1
+            if count % every == 0:
+                return True
+        self.dropped += 1
+        return False
+
+
+sampler = Sampler()
+
+
+def parse_rates(text):
+    # 'typing=0,answer=0.1' -> {'typing': 0.0, 'answer': 0.1}
+    rates = {}
+    for part in (text or '').split(','):
+        name, _, rate = part.partition('=')
+        if name.strip():
+            try:
+                rates[name.strip()] = float(rate)
+            except ValueError:
+                raise ValueError(f'Bad LOG_SAMPLE entry {part!r}') from None
+    return rates
+
+
+class Event:
+    # What event() queues once setup() has run: just the parts of a
+    # LogRecord that StructuredFormatter reads.
+    __slots__ = ('name', 'levelno', 'event', 'msg', 'args', 'fields',
+                 'created')
+    exc_info = None
+
+    def __init__(self, name, levelno, event, msg, args, fields):
+        self.name = name
+        self.levelno = levelno
+        self.event = event
+        self.msg = msg
+        self.args = args
+        self.fields = fields
+        self.created = time.time()
+
+    @property
+    def levelname(self):
+        return logging.getLevelName(self.levelno)
+
+    @property
+    def msecs(self):
+        return (self.created - int(self.created)) * 1000
+
+    def getMessage(self):
+        return self.msg % self.args if self.args else self.msg
+
+
+# The handler setup() installed; None until then.
+queue_handler = None
+
+
+def event(logger, name, message, *args, level=logging.INFO, **fields):
+    # One structured line: a message for people and fields for machines.
+    # Disabled levels and sampled-out events return before anything is
+    # built. Once set up, events skip the LogRecord, the caller lookup and
+    # the handler locks and go straight onto the writer's queue; that is
+    # most of what logging costs on the calling side.
+    if not logger.isEnabledFor(level) or not sampler.keep(name):
+        return
+    if queue_handler is None:
+        logger.log(level, message, *args,
+                   extra={'event': name, 'fields': fields})
+        return
+    queue_handler.enqueue(Event(logger.name, level, name, message, args,
+                                fields))
+
+
+class StructuredFormatter(logging.Formatter):
+    # text: 'time LEVEL logger message key=value ...'
+    # json: one object per line with the same keys.
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+        self.second = None
+        self.stamp = ''
+
+    def formatTime(self, record, datefmt=None):
+        # A batch mostly shares its second; strftime once per second.
+        second = int(record.created)
+        if second != self.second:
+            self.second = second
+            self.stamp = time.strftime('%Y-%m-%d %H:%M:%S',
+                                       self.converter(second))
+        return f'{self.stamp},{int(record.msecs):03d}'
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        if self.json_lines:
+            entry = {
+                'ts': round(record.created, 3),
+                'level': record.levelname,
+                'logger': record.name,
+                'event': getattr(record, 'event', None),
+                'msg': record.getMessage(),
+            }
+            entry.update(fields)
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str, separators=(',', ':'))
+        line = (f'{self.formatTime(record)} {record.levelname} '
+                f'{record.name} {record.getMessage()}')
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}'
+                                   for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class RecordQueue:
+    # What the queue handler puts records into and the writer empties a
+    # batch at a time. The writer is woken for the first record of a batch
+    # and when batch_size are waiting, not for every record: a wake-up per
+    # record would hand the GIL to the writer on every log call.
+
+    def __init__(self, maxsize=10000, batch_size=256, flush_interval=0.1,
+                 clock=time.monotonic):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.pending = []
+        self.closing = False
+
+    def put_nowait(self, record):
+        with self.condition:
+            if len(self.pending) >= self.maxsize:
+                raise queue.Full
+            self.pending.append(record)
+            if len(self.pending) in (1, self.batch_size):
+                self.condition.notify()
+
+    def qsize(self):
+        return len(self.pending)
+
+    def next_batch(self):
+        with self.condition:
+            while not self.pending:
+                if self.closing:
+                    return None
+                self.condition.wait()
+            deadline = self.clock() + self.flush_interval
+            while len(self.pending) < self.batch_size and not self.closing:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch, self.pending = self.pending, []
+            return batch
+
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # Hands records to the writer. When the queue is full the record is
+    # counted and dropped rather than blocking the handler that logged.
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The writer formats; the arguments are plain values, so there is
+        # nothing to freeze on this side.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchWriter:
+    # Formats and writes each batch from a RecordQueue in one write.
+
+    def __init__(self, records, stream, formatter, spawn=None):
+        self.records = records
+        self.stream = stream
+        self.formatter = formatter
+        self.spawn = spawn
+        self.done = threading.Event()
+        self.written = 0
+        self.errors = 0
+
+    def start(self):
+        if self.spawn is not None:
+            self.spawn(self.run)
+        else:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        try:
+            while True:
+                batch = self.records.next_batch()
+                if batch is None:
+                    return
+                try:
+                    self.stream.write(''.join(
+                        self.formatter.format(record) + '\n'
+                        for record in batch))
+                    self.stream.flush()
+                except Exception:
+                    # This is where quiz.* records end up, so logging the
+                    # failure would only queue it behind the one that failed.
+                    self.errors += 1
+                    traceback.print_exc()
+                self.written += len(batch)
+        finally:
+            self.done.set()
+
+    def close(self, timeout=5):
+        # Writes out what is still queued.
+        self.records.close()
+        self.done.wait(timeout)
+
+
+class LogSetup:
+    def __init__(self, handler, writer):
+        self.handler = handler
+        self.writer = writer
+
+    def stats(self):
+        return {
+            'queued': self.handler.queue.qsize(),
+            'written': self.writer.written,
+            'dropped_full': self.handler.dropped,
+            'dropped_sampled': sampler.dropped,
+            'errors': self.writer.errors,
+        }
+
+    def close(self):
+        self.writer.close()
+
+
+def setup(level='INFO', fmt='text', sample='', stream=None,
+          max_queue=10000, spawn=None):
+    # Route the 'quiz' loggers through the queue to one background writer.
+    # Call once at startup.
+    global queue_handler
+    for name, rate in parse_rates(sample).items():
+        sampler.set_rate(name, rate)
+    records = RecordQueue(max_queue)
+    handler = DroppingQueueHandler(records)
+    writer = BatchWriter(
+        records, stream or sys.stdout,
+        StructuredFormatter(json_lines=fmt == 'json'), spawn=spawn)
+    root = logging.getLogger('quiz')
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.handlers[:] = [handler]
+    root.propagate = False
+    writer.start()
+    queue_handler = handler
+    logs = LogSetup(handler, writer)
+    atexit.register(logs.close)
+    return logs
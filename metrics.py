@@ -0,0 +1,235 @@
+import bisect
+import functools
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds, from 100us to 10s.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    # Metrics register themselves here; render() formats them in the
+    # Prometheus text format. Recording is a plain increment on a slot, so
+    # the cost of the metrics sits in render(), which runs per scrape.
+
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {escape_help(metric.help)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, labels, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{format_labels(labels)} '
+                             f'{format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    # One metric family. With label names, labels(*values) returns the
+    # child for those values; without, the metric is its own only child.
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.label_names:
+            self.default = self.labels()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(
+                    f'{self.name} takes labels {self.label_names}')
+            with self.lock:
+                child = self.children.setdefault(values, self.child())
+        return child
+
+    def label_pairs(self, values):
+        return tuple(zip(self.label_names, values))
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            yield '', self.label_pairs(values), child.value
+
+
+class CounterValue:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter(Metric):
+    kind = 'counter'
+    child = CounterValue
+
+    def inc(self, amount=1):
+        self.default.value += amount
+
+
+class GaugeValue(CounterValue):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Gauge(Metric):
+    # function, if given, is called at scrape time instead: it returns the
+    # value, or {label values: value} for a gauge with labels. Gauges
+    # that can be read off existing state cost nothing between scrapes.
+    kind = 'gauge'
+    child = GaugeValue
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY,
+                 function=None):
+        self.function = function
+        super().__init__(name, help, labels, registry)
+
+    def set(self, value):
+        self.default.value = value
+
+    def inc(self, amount=1):
+        self.default.value += amount
+
+    def dec(self, amount=1):
+        self.default.value -= amount
+
+    def samples(self):
+        if self.function is None:
+            yield from super().samples()
+            return
+        value = self.function()
+        if not self.label_names:
+            yield '', (), value
+            return
+        for values, child_value in value.items():
+            if not isinstance(values, tuple):
+                values = (values,)
+            yield '', self.label_pairs(values), child_value
+
+
+class HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY,
+                 buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels, registry)
+
+    def child(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.default.observe(value)
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            labels = self.label_pairs(values)
+            total = 0
+            for bound, count in zip(self.buckets + (math.inf,),
+                                    child.counts):
+                total += count
+                yield '_bucket', labels + (('le', format_value(bound)),), total
+            yield '_sum', labels, child.sum
+            yield '_count', labels, total
+
+
+def timed(histogram):
+    # Decorator: observe how long each call takes, in seconds.
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+SECTION_SECONDS = Histogram(
+    'quiz_section_seconds',
+    'Time spent in a game-engine hot path, lock and emits included.',
+    ('section',))
+EMIT_SECONDS = Histogram(
+    'quiz_emit_seconds',
+    'Time to hand one broadcast frame to Socket.IO, which fans it out to '
+    'every socket of its target.')
+TIMER_LATENESS = Histogram(
+    'quiz_timer_lateness_seconds',
+    'How long after its deadline a scheduled timer ran.')
+LOG_WRITE_SECONDS = Histogram(
+    'quiz_log_write_seconds',
+    'Time to write one batch to a log or the game history.', ('log',))
+ANSWERS = Counter(
+    'quiz_answers_total', 'Answers received, by whether they counted.',
+    ('outcome',))
+CONNECTS = Counter('quiz_socket_connects_total', 'Socket connections opened.')
+DISCONNECTS = Counter(
+    'quiz_socket_disconnects_total', 'Socket connections closed.')
@@ -0,0 +1,73 @@
+# Wire schemas for the high-frequency events. A payload goes out as a list
+# of its field values in this order, trailing empty fields dropped, so
+# keys are never repeated on the wire and only fields listed here reach the
+# client. static/app.js keeps a copy of this table to decode them.
+SCHEMAS = {
+    'question': ('index', 'question', 'answers', 'iq', 'category', 'total'),
+    'timer': ('end_time', 'duration'),
+    'gamestate': ('state',),
+    'host_session': ('token',),
+    'player_presence': ('username', 'online', 'last_seen'),
+    'player_rank': ('username', 'rank', 'score'),
+    'round_results': (
+        'next_question_time', 'intermission_duration', 'question', 'answers',
+        'correct_index', 'player_answers'),
+    'player_list': (
+        'seq', 'snapshot', 'players', 'removed', 'added', 'scores', 'order',
+        'winning_players', 'total_players'),
+}
+
+
+def round_time(value):
+    return round(value, 3)
+
+
+def encode_player_answers(answers):
+    return [[name, result['chosen_index'], int(result['is_correct'])]
+            for name, result in answers.items()]
+
+
+def decode_player_answers(rows):
+    return {name: {'chosen_index': chosen, 'is_correct': bool(correct)}
+            for name, chosen, correct in rows}
+
+
+FIELD_ENCODERS = {
+    'end_time': round_time,
+    'last_seen': round_time,
+    'next_question_time': round_time,
+    'player_answers': encode_player_answers,
+}
+
+FIELD_DECODERS = {
+    'player_answers': decode_player_answers,
+}
+
+
+def encode(event, payload):
+    fields = SCHEMAS.get(event)
+    if fields is None or not isinstance(payload, dict):
+        return payload
+    values = []
+    for field in fields:
+        value = payload.get(field)
+        if value is not None and field in FIELD_ENCODERS:
+            value = FIELD_ENCODERS[field](value)
+        values.append(value)
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+
+def decode(event, data):
+    fields = SCHEMAS.get(event)
+    if fields is None or not isinstance(data, list):
+        return data
+    payload = {}
+    for field, value in zip(fields, data):
+        if value is None:
+            continue
+        if field in FIELD_DECODERS:
+            value = FIELD_DECODERS[field](value)
+        payload[field] = value
+    return payload
@@ -0,0 +1,85 @@
+import threading
+import time
+
+HEARTBEAT_INTERVAL = 15.0  # HEARTBEAT_MS in static/app.js
+LIVE_WINDOW = 3 * HEARTBEAT_INTERVAL  # three missed heartbeats
+
+
+class Presence:
+    # Connected sockets and when each was last heard from. Dead sockets are
+    # found by Engine.IO's own ping/pong, which ends in a disconnect event;
+    # last_seen is refreshed by the heartbeat each client sends every
+    # HEARTBEAT_INTERVAL, and by its clock-sync replies. Nothing is
+    # broadcast to keep this current.
+
+    def __init__(self, live_window=LIVE_WINDOW, clock=time.time):
+        self.live_window = live_window
+        self.clock = clock
+        self.last_seen = {}
+        self.lock = threading.Lock()
+
+    def connect(self, sid):
+        with self.lock:
+            self.last_seen[sid] = self.clock()
+
+    def seen(self, sid):
+        with self.lock:
+            if sid in self.last_seen:
+                self.last_seen[sid] = self.clock()
+
+    def disconnect(self, sid):
+        with self.lock:
+            return self.last_seen.pop(sid, None)
+
+    def is_live(self, sid):
+        with self.lock:
+            seen = self.last_seen.get(sid)
+        return seen is not None and self.clock() - seen <= self.live_window
+
+    def stats(self):
+        now = self.clock()
+        with self.lock:
+            connected = len(self.last_seen)
+            live = sum(1 for seen in self.last_seen.values()
+                       if now - seen <= self.live_window)
+        return {'connected': connected, 'live': live, 'stale': connected - live}
+
+
+TYPING_TTL = 5.0
+USERNAME_LIMIT = 32
+
+
+class Typing:
+    # What each socket has typed into the join form so far. An entry lasts
+    # ttl after its last keystroke, so a tab left half-filled drops out of
+    # the list without waiting for a disconnect.
+
+    def __init__(self, ttl=TYPING_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.typing = {}
+        self.lock = threading.RLock()
+
+    def note(self, sid, username):
+        username = username[:USERNAME_LIMIT]
+        with self.lock:
+            if username:
+                self.typing[sid] = (username, self.clock())
+            else:
+                self.typing.pop(sid, None)
+
+    def remove(self, sid):
+        with self.lock:
+            return self.typing.pop(sid, None) is not None
+
+    def names(self):
+        # Expires what is due and returns who is still typing, by name.
+        cutoff = self.clock() - self.ttl
+        with self.lock:
+            for sid in [sid for sid, (_, noted) in self.typing.items()
+                        if noted < cutoff]:
+                del self.typing[sid]
+            return sorted({username for username, _ in self.typing.values()})
+
+    def __len__(self):
+        return len(self.typing)
@@ -0,0 +1,471 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+INDEX_MAGIC = b'QBANK\x00\x00\x04'
+HEADER = struct.Struct('<8sQQQ')
+OFFSET = struct.Struct('<Q')
+CATEGORY_NUMBER = struct.Struct('<I')
+IQ = struct.Struct('<h')
+RECORD_HEAD = struct.Struct('<hB')
+STRING_LENGTH = struct.Struct('<H')
+MAX_STRING_BYTES = 0xFFFF
+NO_IQ = -1
+MAX_IQ = 0x7FFF
+ROUND_WRONG_ANSWERS = 3
+
+log = logging.getLogger('quiz.questions')
+
+
+def fits_record(text):
+    # Strings are stored with a 16-bit byte length; a UTF-8 character is
+    # at most four bytes, so most need no encoding to check.
+    return (len(text) * 4 <= MAX_STRING_BYTES
+            or len(text.encode('utf-8')) <= MAX_STRING_BYTES)
+
+
+def text_hash(text):
+    # Stable across processes, unlike hash().
+    return int.from_bytes(
+        hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(),
+        'little')
+
+
+class Question:
+    # One bank entry. Read-only once built, so every room can share it;
+    # rounds work on the copy returned by for_round(). Supports q['key'],
+    # q.get() and dict(q) so it drops in where the JSON dicts used to be.
+    __slots__ = ('question', 'answers', 'correct', 'iq', 'category')
+    FIELDS = __slots__
+
+    def __init__(self, question, answers, correct=0, iq=None, category=None):
+        set_field = object.__setattr__
+        set_field(self, 'question', question)
+        set_field(self, 'answers', answers)
+        set_field(self, 'correct', correct)
+        set_field(self, 'iq', iq)
+        set_field(self, 'category', category)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError('question must be an object')
+        text = data.get('question')
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError('question text is missing')
+        if not fits_record(text.strip()):
+            raise ValueError(f'{text[:40]!r}...: question text is too long')
+        answers = data.get('answers')
+        if not isinstance(answers, list) or len(answers) < 2:
+            raise ValueError(f'{text!r}: needs at least two answers')
+        if not all(isinstance(a, str) and a.strip() for a in answers):
+            raise ValueError(f'{text!r}: answers must be non-empty strings')
+        if len(answers) > 255:
+            raise ValueError(f'{text!r}: too many answers')
+        if not all(fits_record(a.strip()) for a in answers):
+            raise ValueError(f'{text!r}: an answer is too long')
+        correct = data.get('correct', 0)
+        if not isinstance(correct, int) or not 0 <= correct < len(answers):
+            raise ValueError(f'{text!r}: correct index out of range')
+        iq = data.get('iq')
+        if iq is not None and not isinstance(iq, int):
+            raise ValueError(f'{text!r}: iq must be an integer')
+        if iq is not None and not 0 <= iq <= MAX_IQ:
+            raise ValueError(f'{text!r}: iq out of range')
+        category = data.get('category')
+        if category is not None:
+            if not isinstance(category, str):
+                raise ValueError(f'{text!r}: category must be a string')
+            if not fits_record(category.strip()):
+                raise ValueError(f'{text!r}: category is too long')
+            category = sys.intern(category.strip()) or None
+        return cls(
+            sys.intern(text.strip()),
+            tuple(sys.intern(a.strip()) for a in answers),
+            correct,
+            iq,
+            category)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Question is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError('Question is read-only')
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __eq__(self, other):
+        if not isinstance(other, Question):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    def __hash__(self):
+        return hash((self.question, self.answers, self.correct))
+
+    def __repr__(self):
+        return f'Question({self.question!r}, {self.answers!r}, {self.correct})'
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return self.FIELDS
+
+    def correct_answer(self):
+        return self.answers[self.correct]
+
+    def for_round(self, wrong=ROUND_WRONG_ANSWERS, rng=random):
+        # The correct answer plus up to `wrong` others, shuffled.
+        incorrect = [a for i, a in enumerate(self.answers) if i != self.correct]
+        if len(incorrect) > wrong:
+            incorrect = rng.sample(incorrect, wrong)
+        answers = [self.correct_answer()] + incorrect
+        rng.shuffle(answers)
+        return Question(
+            self.question, tuple(answers),
+            answers.index(self.correct_answer()), self.iq, self.category)
+
+
+class QuestionBank:
+    # Parsed, validated questions held as Question records with interned
+    # strings, plus a text lookup for the question log and sampler.
+
+    def __init__(self, questions=()):
+        self.questions = []
+        self.by_text = {}  # text -> position
+        for question in questions:
+            self.add(question)
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, 'r') as f:
+            entries = json.load(f)['questions']
+        bank = cls()
+        for position, entry in enumerate(entries):
+            try:
+                bank.add(Question.from_dict(entry))
+            except ValueError as exc:
+                raise ValueError(f'{path}: question {position}: {exc}')
+        return bank
+
+    def add(self, question):
+        if question.question in self.by_text:
+            return False
+        self.by_text[question.question] = len(self.questions)
+        self.questions.append(question)
+        return True
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def __getitem__(self, position):
+        return self.questions[position]
+
+    def position(self, text):
+        return self.by_text.get(text)
+
+    def get(self, text):
+        position = self.by_text.get(text)
+        return None if position is None else self.questions[position]
+
+    def texts(self):
+        return (question.question for question in self.questions)
+
+    def rows(self):
+        return ((position, question.category, question.iq)
+                for position, question in enumerate(self.questions))
+
+    def write_index(self, path):
+        return write_index(self, path)
+
+
+def encode_record(question):
+    # The question, then its category ('' for none), then the answers, so
+    # text and category can be read without the answers.
+    iq = NO_IQ if question.iq is None else question.iq
+    parts = [RECORD_HEAD.pack(iq, len(question.answers))]
+    strings = (question.question, question.category or '') + question.answers
+    for text in strings:
+        raw = text.encode('utf-8')
+        parts.append(STRING_LENGTH.pack(len(raw)))
+        parts.append(raw)
+    return b''.join(parts)
+
+
+def slot_key(text):
+    return text_hash(text) or 1  # 0 marks an empty slot
+
+
+def little_endian(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class SlotTable:
+    # Open-addressing hash table of (text hash, position) in two flat
+    # arrays, 16 bytes a slot. The index file stores it as is, so lookups
+    # probe the mapped file the same way.
+
+    def __init__(self, capacity=1024):
+        self.keys = array('Q', bytes(OFFSET.size * capacity))
+        self.values = array('Q', bytes(OFFSET.size * capacity))
+        self.mask = capacity - 1
+        self.size = 0
+
+    def positions(self, key):
+        slot = key & self.mask
+        while self.keys[slot]:
+            if self.keys[slot] == key:
+                yield self.values[slot]
+            slot = (slot + 1) & self.mask
+
+    def insert(self, key, position):
+        if (self.size + 1) * 2 > len(self.keys):
+            self.grow()
+        slot = key & self.mask
+        while self.keys[slot]:
+            slot = (slot + 1) & self.mask
+        self.keys[slot] = key
+        self.values[slot] = position
+        self.size += 1
+
+    def grow(self):
+        keys, values = self.keys, self.values
+        self.__init__(len(keys) * 2)
+        for key, position in zip(keys, values):
+            if key:
+                self.insert(key, position)
+
+
+class IndexWriter:
+    # Streams questions into an index file. Records go to a temporary file
+    # as they arrive, so memory holds only the offsets, the slot table and
+    # each question's category number and iq, about 46 bytes a question.
+    # Duplicate question text is skipped.
+
+    def __init__(self, path):
+        self.path = path
+        self.records = tempfile.TemporaryFile(
+            dir=os.path.dirname(os.path.abspath(path)))
+        self.offsets = array('Q', [0])
+        self.slots = SlotTable()
+        self.categories = {'': 0}  # name -> number, in first-seen order
+        self.category_numbers = array('I')
+        self.iqs = array('h')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.records.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __contains__(self, text):
+        return self.find(text) is not None
+
+    def read_text(self, position):
+        at = self.offsets[position] + RECORD_HEAD.size
+        self.records.seek(at)
+        length, = STRING_LENGTH.unpack(self.records.read(STRING_LENGTH.size))
+        text = self.records.read(length).decode('utf-8')
+        self.records.seek(0, os.SEEK_END)
+        return text
+
+    def find(self, text, key=None):
+        for position in self.slots.positions(key or slot_key(text)):
+            if self.read_text(position) == text:
+                return position
+        return None
+
+    def add(self, question):
+        key = slot_key(question.question)
+        if self.find(question.question, key) is not None:
+            return False
+        if question.correct:
+            # Records keep the correct answer first
+            answers = list(question.answers)
+            answers.insert(0, answers.pop(question.correct))
+            question = Question(question.question, tuple(answers), 0,
+                                question.iq, question.category)
+        record = encode_record(question)
+        self.records.write(record)
+        self.slots.insert(key, len(self))
+        self.offsets.append(self.offsets[-1] + len(record))
+        category = question.category or ''
+        self.category_numbers.append(
+            self.categories.setdefault(category, len(self.categories)))
+        self.iqs.append(NO_IQ if question.iq is None else question.iq)
+        return True
+
+    def close(self):
+        # Layout: header, count + 1 record offsets, the slot table keys and
+        # positions, each question's category number and iq, the category
+        # names in number order, then the records. The columns let the
+        # sampler file every question without decoding a record.
+        names = b''.join(
+            STRING_LENGTH.pack(len(raw)) + raw
+            for raw in (name.encode('utf-8') for name in self.categories))
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, len(self), len(self.slots.keys),
+                                len(names)))
+            little_endian(self.offsets).tofile(f)
+            little_endian(self.slots.keys).tofile(f)
+            little_endian(self.slots.values).tofile(f)
+            little_endian(self.category_numbers).tofile(f)
+            little_endian(self.iqs).tofile(f)
+            f.write(names)
+            self.records.seek(0)
+            shutil.copyfileobj(self.records, f)
+        self.records.close()
+        os.replace(tmp_path, self.path)
+
+
+def write_index(questions, path):
+    with IndexWriter(path) as writer:
+        for question in questions:
+            writer.add(question)
+    return len(writer)
+
+
+class IndexedQuestionBank:
+    # A bank backed by a memory-mapped index file. Opening it reads only
+    # the header; records are decoded when asked for, so startup cost does
+    # not grow with the number of questions.
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.capacity, names_size = HEADER.unpack_from(
+            self.map, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f'{path}: not a question index')
+        self.offsets_at = HEADER.size
+        self.keys_at = self.offsets_at + OFFSET.size * (self.count + 1)
+        self.values_at = self.keys_at + OFFSET.size * self.capacity
+        self.categories_at = self.values_at + OFFSET.size * self.capacity
+        self.iqs_at = self.categories_at + CATEGORY_NUMBER.size * self.count
+        self.names_at = self.iqs_at + IQ.size * self.count
+        self.records_at = self.names_at + names_size
+        self.category_names = []
+        at = self.names_at
+        while at < self.records_at:
+            length, = STRING_LENGTH.unpack_from(self.map, at)
+            at += STRING_LENGTH.size
+            name = self.map[at:at + length].decode('utf-8')
+            self.category_names.append(sys.intern(name) or None)
+            at += length
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self[position]
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        start, = OFFSET.unpack_from(
+            self.map, self.offsets_at + OFFSET.size * position)
+        return self.decode(self.records_at + start)
+
+    def decode(self, at):
+        iq, answer_count = RECORD_HEAD.unpack_from(self.map, at)
+        at += RECORD_HEAD.size
+        strings = []
+        for _ in range(answer_count + 2):
+            length, = STRING_LENGTH.unpack_from(self.map, at)
+            at += STRING_LENGTH.size
+            strings.append(sys.intern(
+                self.map[at:at + length].decode('utf-8')))
+            at += length
+        return Question(
+            strings[0], tuple(strings[2:]), 0,
+            None if iq == NO_IQ else iq, strings[1] or None)
+
+    def read_text(self, position):
+        start, = OFFSET.unpack_from(
+            self.map, self.offsets_at + OFFSET.size * position)
+        at = self.records_at + start + RECORD_HEAD.size
+        length, = STRING_LENGTH.unpack_from(self.map, at)
+        at += STRING_LENGTH.size
+        return self.map[at:at + length].decode('utf-8')
+
+    def position(self, text):
+        key = slot_key(text)
+        mask = self.capacity - 1
+        slot = key & mask
+        while True:
+            found, = OFFSET.unpack_from(
+                self.map, self.keys_at + OFFSET.size * slot)
+            if not found:
+                return None
+            if found == key:
+                position, = OFFSET.unpack_from(
+                    self.map, self.values_at + OFFSET.size * slot)
+                if self.read_text(position) == text:
+                    return position
+            slot = (slot + 1) & mask
+
+    def get(self, text):
+        position = self.position(text)
+        return None if position is None else self[position]
+
+    def texts(self):
+        # Question text only, without decoding the answers.
+        return (self.read_text(position) for position in range(self.count))
+
+    def rows(self):
+        # (position, category, iq) for every question, from the columns.
+        numbers = little_endian(array(
+            'I', self.map[self.categories_at:self.iqs_at]))
+        iqs = little_endian(array('h', self.map[self.iqs_at:self.names_at]))
+        names = self.category_names
+        return ((position, names[number], None if iq == NO_IQ else iq)
+                for position, (number, iq) in enumerate(zip(numbers, iqs)))
+
+
+def load_bank(index_path, json_path):
+    # Prefer a bank built by question_import.py; fall back to parsing the
+    # bundled JSON file.
+    if index_path and os.path.exists(index_path):
+        try:
+            return IndexedQuestionBank(index_path)
+        except ValueError as e:
+            log.warning('%s; rebuild it with question_import.py', e)
+    return QuestionBank.from_json(json_path)
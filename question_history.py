@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+
+from log_writer import LogWriter
+
+
+class QuestionHistory:
+    # Keeps a question -> last asked index in memory so selection never has
+    # to rescan the log. The log is read once, then only appended to, and is
+    # rewritten with one line per question once it holds too many stale
+    # lines so that the next startup stays cheap. Appends go through a
+    # LogWriter, so record() never touches the disk; the index is updated
+    # first, so selection sees entries that are still queued.
+
+    def __init__(self, path, compact_ratio=4, compact_min_lines=10000,
+                 writer=None):
+        self.path = path
+        self.writer = writer or LogWriter(path)
+        self.writer.on_flush = self._after_flush
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+        self.last_asked = {}
+        self.line_count = 0
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        self.writer.flush()
+        with self.lock:
+            self._load()
+            if not self._should_compact():
+                return
+            entries = self._entries()
+        self._rewrite(entries)
+
+    def _load(self):
+        self.last_asked = {}
+        self.line_count = 0
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        last_asked = self.last_asked
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self.line_count += 1
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    question = entry.get('question')
+                    timestamp = entry.get('timestamp')
+                    if question and isinstance(timestamp, (int, float)):
+                        if timestamp > last_asked.get(question, 0):
+                            last_asked[question] = timestamp
+        except OSError:
+            pass
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def times(self):
+        self.ensure_loaded()
+        return self.last_asked
+
+    def record(self, question, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.ensure_loaded()
+        with self.lock:
+            if timestamp > self.last_asked.get(question, 0):
+                self.last_asked[question] = timestamp
+        self.writer.append(
+            json.dumps({'question': question, 'timestamp': timestamp}))
+        return timestamp
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def close(self):
+        self.writer.close()
+
+    def _after_flush(self, count):
+        # Runs on the writer task after each batch is written.
+        with self.lock:
+            self.line_count += count
+            if not self._should_compact():
+                return
+            entries = self._entries()
+        self._rewrite(entries)
+
+    def _should_compact(self):
+        if self.line_count < self.compact_min_lines:
+            return False
+        return self.line_count > self.compact_ratio * len(self.last_asked)
+
+    def _entries(self):
+        return sorted(self.last_asked.items(), key=lambda item: item[1])
+
+    def compact(self):
+        self.ensure_loaded()
+        self.writer.flush()
+        with self.lock:
+            entries = self._entries()
+        self._rewrite(entries)
+
+    def _rewrite(self, entries):
+        try:
+            self.writer.rewrite(
+                json.dumps({'question': question, 'timestamp': timestamp})
+                for question, timestamp in entries)
+        except OSError:
+            return
+        with self.lock:
+            self.line_count = len(entries)
@@ -0,0 +1,277 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+
+from question_bank import IndexWriter, Question
+
+READ_CHUNK = 1 << 16
+MAX_JSON_ITEM = 1 << 24
+MAX_REJECTS_SHOWN = 20
+IQ_RANGE = (1, 300)
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.rejects = []
+
+    def reject(self, source, row, reason):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECTS_SHOWN:
+            self.rejects.append((source, row, reason))
+
+    def as_dict(self):
+        seconds = max(self.seconds, 1e-9)
+        return {
+            'read': self.read,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.read / seconds),
+            'mb_per_second': round(self.bytes / 1e6 / seconds, 2),
+            'rejects': [
+                {'source': source, 'row': row, 'reason': reason}
+                for source, row, reason in self.rejects],
+        }
+
+
+def clean_text(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        return value
+    return ' '.join(value.split())
+
+
+def normalize_iq(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError('iq must be a number')
+    try:
+        iq = round(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f'iq {value!r} is not a number')
+    if not IQ_RANGE[0] <= iq <= IQ_RANGE[1]:
+        raise ValueError(f'iq {iq} out of range')
+    return iq
+
+
+def normalize_category(value):
+    value = clean_text(value)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError('category must be text')
+    return value
+
+
+def normalize(raw):
+    # Bring a row from any source format to what Question.from_dict
+    # accepts: tidy whitespace, drop blank and repeated answers (keeping
+    # the correct one where it lands), and coerce correct/iq to ints.
+    if not isinstance(raw, dict):
+        raise ValueError('row is not an object')
+    answers = raw.get('answers')
+    if isinstance(answers, str):
+        answers = answers.split('|')
+    if not isinstance(answers, list):
+        raise ValueError('answers missing')
+    correct = raw.get('correct', 0)
+    if correct in (None, ''):
+        correct = 0
+    try:
+        correct = int(correct)
+    except (TypeError, ValueError):
+        raise ValueError(f'correct {correct!r} is not an index')
+    if not 0 <= correct < len(answers):
+        raise ValueError('correct index out of range')
+    correct_text = clean_text(answers[correct])
+    if not isinstance(correct_text, str) or not correct_text:
+        raise ValueError('correct answer is blank')
+    kept = []
+    seen = set()
+    for answer in answers:
+        answer = clean_text(answer)
+        if not isinstance(answer, str):
+            raise ValueError('answers must be strings')
+        if not answer or answer.casefold() in seen:
+            continue
+        seen.add(answer.casefold())
+        kept.append(answer)
+    correct_key = correct_text.casefold()
+    return {
+        'question': clean_text(raw.get('question')),
+        'answers': kept,
+        'correct': next(
+            i for i, answer in enumerate(kept)
+            if answer.casefold() == correct_key),
+        'iq': normalize_iq(raw.get('iq')),
+        'category': normalize_category(raw.get('category')),
+    }
+
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as exc:
+            yield line_number, exc
+
+
+def read_csv(f):
+    # Answers come either as one 'answers' column separated by '|' or as
+    # answer1, answer2, ... columns.
+    reader = csv.DictReader(f)
+    answer_columns = sorted(
+        (name for name in reader.fieldnames or ()
+         if re.fullmatch(r'answer\d+', name)),
+        key=lambda name: int(name[6:]))
+    for row_number, row in enumerate(reader, 2):
+        if answer_columns and not row.get('answers'):
+            row['answers'] = [row[name] for name in answer_columns
+                              if row.get(name)]
+        yield row_number, row
+
+
+def read_json(f):
+    # The bundled {"questions": [...]} layout (or a bare array), decoded
+    # one element at a time so the whole file is never in memory.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    at = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, at, eof
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            eof = True
+        buffer = buffer[at:] + chunk
+        at = 0
+
+    def skip_to(token):
+        nonlocal at
+        while True:
+            found = buffer.find(token, at)
+            if found != -1:
+                at = found + len(token)
+                return True
+            if eof:
+                return False
+            at = max(at, len(buffer) - len(token))
+            fill()
+
+    while at >= len(buffer) and not eof:
+        fill()
+    if not buffer.lstrip().startswith('['):
+        if not skip_to('"questions"'):
+            return
+    if not skip_to('['):
+        return
+
+    item = 0
+    while True:
+        while True:
+            while at < len(buffer) and buffer[at] in ' \t\r\n,':
+                at += 1
+            if at < len(buffer) or eof:
+                break
+            fill()
+        if at >= len(buffer) or buffer[at] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, at)
+        except ValueError:
+            if eof or len(buffer) - at > MAX_JSON_ITEM:
+                raise ValueError(f'malformed JSON after element {item}')
+            fill()
+            continue
+        # raw_decode can stop early on a number cut off by the chunk
+        if end == len(buffer) and not eof:
+            fill()
+            continue
+        at = end
+        item += 1
+        yield item, value
+
+
+READERS = {
+    '.jsonl': read_jsonl,
+    '.ndjson': read_jsonl,
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def reader_for(path, fmt=None):
+    if fmt:
+        return READERS[f'.{fmt}']
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'{path}: unknown format, pass --format')
+    return READERS[extension]
+
+
+def import_questions(sources, index_path, fmt=None):
+    report = ImportReport()
+    started = time.perf_counter()
+    with IndexWriter(index_path) as writer:
+        for path in sources:
+            read = reader_for(path, fmt)
+            report.bytes += os.path.getsize(path)
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                for row, raw in read(f):
+                    report.read += 1
+                    if isinstance(raw, Exception):
+                        report.reject(path, row, str(raw))
+                        continue
+                    try:
+                        question = Question.from_dict(normalize(raw))
+                    except ValueError as exc:
+                        report.reject(path, row, str(exc))
+                        continue
+                    if writer.add(question):
+                        report.imported += 1
+                    else:
+                        report.duplicates += 1
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Import CSV, JSONL or JSON questions into an indexed bank.'
+    )
+    parser.add_argument('sources', nargs='+')
+    parser.add_argument('--out', default='questions.idx')
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'json'])
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = import_questions(args.sources, args.out, args.format).as_dict()
+    print(f"Imported {report['imported']} of {report['read']} rows into "
+          f"{args.out} in {report['seconds']}s "
+          f"({report['rows_per_second']} rows/s, "
+          f"{report['mb_per_second']} MB/s)")
+    print(f"Duplicates skipped: {report['duplicates']}, "
+          f"rejected: {report['rejected']}")
+    for reject in report['rejects']:
+        print(f"  {reject['source']}:{reject['row']}: {reject['reason']}")
+
+
+if __name__ == '__main__':
+    main()
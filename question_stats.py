@@ -0,0 +1,207 @@
+import collections
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from group_commit import GroupCommitWriter
+from metrics import LOG_WRITE_SECONDS
+
+BANDS = ('easy', 'medium', 'hard')
+UNRATED = 'unrated'
+
+log = logging.getLogger('quiz.questions')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS question_stats (
+    question TEXT PRIMARY KEY,
+    answers INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    latency_total REAL NOT NULL,
+    picks TEXT NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+class QuestionStat:
+    # picks counts wrong answers only, by answer text: rounds shuffle the
+    # answers, so an index means nothing once the round is over.
+    __slots__ = ('answers', 'correct', 'latency_total', 'picks', 'band')
+
+    def __init__(self, answers=0, correct=0, latency_total=0.0, picks=None):
+        self.answers = answers
+        self.correct = correct
+        self.latency_total = latency_total
+        self.picks = picks if picks is not None else {}
+        self.band = UNRATED
+
+    def accuracy(self):
+        return self.correct / self.answers if self.answers else None
+
+    def mean_latency(self):
+        return self.latency_total / self.answers if self.answers else None
+
+    def row(self, question):
+        return (question, self.answers, self.correct, self.latency_total,
+                dict(self.picks))
+
+
+class QuestionStats(GroupCommitWriter):
+    # Running totals per question from real rounds: answers, correct
+    # answers, summed latency and how often each wrong answer was picked.
+    # Each answer is an O(1) update and a question's band is re-derived
+    # from its own totals, so nothing is ever rescanned. A round queues
+    # its question, and the questions queued in the last `interval`
+    # seconds are upserted together; the row is the totals, so the write
+    # is the same size however many rounds are behind it.
+
+    def __init__(self, path, interval=10.0, min_answers=10, easy=0.7,
+                 hard=0.4, on_band_change=None, spawn=None, offload=None,
+                 clock=time.monotonic, latency_window=256):
+        super().__init__(
+            batch_size=4096, flush_interval=interval, max_pending=50000,
+            spawn=spawn, offload=offload,
+            write_seconds=LOG_WRITE_SECONDS.labels('question_stats'),
+            clock=clock, latency_window=latency_window)
+        self.path = path
+        self.min_answers = min_answers
+        self.easy = easy
+        self.hard = hard
+        self.on_band_change = on_band_change
+        self.lock = threading.Lock()
+        self.by_question = {}
+        self.conn = None
+        self.rounds = 0
+        self.rows_written = 0
+
+    def band_for(self, stat):
+        if stat.answers < self.min_answers:
+            return UNRATED
+        accuracy = stat.correct / stat.answers
+        if accuracy >= self.easy:
+            return 'easy'
+        if accuracy < self.hard:
+            return 'hard'
+        return 'medium'
+
+    def band(self, question):
+        stat = self.by_question.get(question)
+        return stat.band if stat is not None else UNRATED
+
+    def bands(self):
+        # question -> band for every question with results so far.
+        with self.lock:
+            return {question: stat.band
+                    for question, stat in self.by_question.items()}
+
+    def record_round(self, question, answers):
+        # answers: (player, chosen answer text, is_correct, latency, ...)
+        # as GameHistory.round_finished takes them.
+        if not answers:
+            return
+        with self.lock:
+            stat = self.by_question.get(question)
+            if stat is None:
+                stat = self.by_question[question] = QuestionStat()
+            for _player, chosen, correct, latency, *_rest in answers:
+                stat.answers += 1
+                stat.correct += bool(correct)
+                stat.latency_total += latency
+                if not correct and chosen is not None:
+                    stat.picks[chosen] = stat.picks.get(chosen, 0) + 1
+            self.rounds += 1
+            old_band, band = stat.band, self.band_for(stat)
+            stat.band = band
+        self.append(question)
+        if band != old_band and self.on_band_change is not None:
+            self.on_band_change(question, band)
+
+    def get(self, question, distractors=()):
+        # distractors: the question's wrong answers, so ones nobody has
+        # picked yet are listed too.
+        with self.lock:
+            stat = self.by_question.get(question) or QuestionStat()
+            picks = dict(stat.picks)
+            result = {
+                'question': question,
+                'answers': stat.answers,
+                'correct': stat.correct,
+                'accuracy': stat.accuracy(),
+                'mean_latency': stat.mean_latency(),
+                'band': stat.band,
+            }
+        for answer in distractors:
+            picks.setdefault(answer, 0)
+        result['distractors'] = [
+            {'answer': answer, 'picks': count,
+             'rate': count / stat.answers if stat.answers else None}
+            for answer, count in sorted(picks.items(), key=lambda p: -p[1])]
+        return result
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def load(self):
+        # Once at startup; bands come from the saved totals.
+        def read():
+            if self.conn is None:
+                self.conn = self._connect()
+            return self.conn.execute(
+                'SELECT question, answers, correct, latency_total, picks '
+                'FROM question_stats').fetchall()
+        try:
+            rows = self._blocking(read)
+        except sqlite3.Error as e:
+            log.warning('Could not load question stats from %s: %s',
+                        self.path, e)
+            return 0
+        with self.lock:
+            for question, answers, correct, latency_total, picks in rows:
+                stat = QuestionStat(answers, correct, latency_total,
+                                    json.loads(picks))
+                stat.band = self.band_for(stat)
+                self.by_question[question] = stat
+        return len(rows)
+
+    def write_batch(self, batch):
+        with self.lock:
+            rows = [self.by_question[question].row(question)
+                    for question in set(batch)]
+        self._blocking(self._write, rows)
+        self.rows_written += len(rows)
+
+    def stopped(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _write(self, rows):
+        if self.conn is None:
+            self.conn = self._connect()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO question_stats VALUES (?, ?, ?, ?, ?)',
+                [(*row[:4], json.dumps(row[4], separators=(',', ':')))
+                 for row in rows])
+
+    def stats(self):
+        with self.lock:
+            bands = collections.Counter(
+                stat.band for stat in self.by_question.values())
+        samples = sorted(self.latency)
+        return {
+            'questions': sum(bands.values()),
+            'bands': dict(bands),
+            'rounds': self.rounds,
+            'queued': self.queue_depth(),
+            'flushes': self.batches,
+            'rows_written': self.rows_written,
+            'errors': self.errors,
+            'write_p50_ms': samples[len(samples) // 2] * 1000 if samples else 0.0,
+            'write_max_ms': samples[-1] * 1000 if samples else 0.0,
+        }
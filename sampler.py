@@ -0,0 +1,289 @@
+import bisect
+import itertools
+import math
+import random
+import sys
+import threading
+
+# Rebuild against a newer base time before exp() gets anywhere near overflow.
+REBASE_AFTER_HALF_LIVES = 200
+
+
+def fenwick(values):
+    tree = [0.0] + list(values)
+    n = len(tree) - 1
+    for i in range(1, n + 1):
+        parent = i + (i & -i)
+        if parent <= n:
+            tree[parent] += tree[i]
+    return tree
+
+
+def fenwick_prefix(tree, i):
+    total = 0.0
+    while i > 0:
+        total += tree[i]
+        i -= i & -i
+    return total
+
+
+def fenwick_add(tree, slot, delta):
+    i = slot + 1
+    n = len(tree) - 1
+    while i <= n:
+        tree[i] += delta
+        i += i & -i
+
+
+NO_RANK = math.inf  # keys without a rank sort last and match no range
+ANY_BAND = object()  # the trees every key counts in, whatever its band
+
+
+class RankedBucket:
+    # One bucket's keys in rank order, with a count tree and a mass tree
+    # per band over the same slots. A key last asked at t weighs
+    #     1 - exp(-(now - base) / half_life) * exp((t - base) / half_life)
+    # at `now`, so a Fenwick tree over "slot is filled" and one over
+    # exp((t - base) / half_life) give the weight of any slot range for
+    # every `now` at once, and asking a question touches one slot. A key
+    # counts in its current band's trees and in the ANY_BAND pair, so a rank
+    # range is a slot range, a pick that does not care about bands reads one
+    # pair, and moving a key to another band touches two pairs.
+
+    def __init__(self, owner, entries):
+        # entries: (key, rank, band, last_time), any order
+        entries = sorted(entries, key=lambda entry: (
+            NO_RANK if entry[1] is None else entry[1], entry[0]))
+        self.owner = owner
+        self.keys = [entry[0] for entry in entries]
+        self.ranks = [NO_RANK if entry[1] is None else entry[1]
+                      for entry in entries]
+        self.bands = [entry[2] for entry in entries]
+        self.times = [entry[3] or 0 for entry in entries]
+        self.slots = {key: slot for slot, key in enumerate(self.keys)}
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rebuild(self):
+        n = len(self.keys)
+        counts = {ANY_BAND: [1.0] * n}
+        masses = {ANY_BAND: [self.owner.mass(t) for t in self.times]}
+        for slot, band in enumerate(self.bands):
+            if band not in counts:
+                counts[band] = [0.0] * n
+                masses[band] = [0.0] * n
+            counts[band][slot] = 1.0
+            masses[band][slot] = masses[ANY_BAND][slot]
+        self.trees = {band: (fenwick(counts[band]), fenwick(masses[band]))
+                      for band in counts}
+        self.totals = {band: [sum(counts[band]), sum(masses[band])]
+                       for band in counts}
+
+    def trees_for(self, band):
+        if band not in self.trees:
+            n = len(self.keys)
+            self.trees[band] = ([0.0] * (n + 1), [0.0] * (n + 1))
+            self.totals[band] = [0.0, 0.0]
+        return self.trees[band]
+
+    def span(self, ranks):
+        if ranks is None:
+            return 0, len(self.keys)
+        low, high = ranks
+        return (bisect.bisect_left(self.ranks, -math.inf if low is None else low),
+                bisect.bisect_right(self.ranks, sys.float_info.max
+                                    if high is None else high))
+
+    def count(self, band, start, stop):
+        if band not in self.trees:
+            return 0
+        if start == 0 and stop == len(self.keys):
+            return round(self.totals[band][0])
+        tree = self.trees[band][0]
+        return round(fenwick_prefix(tree, stop) - fenwick_prefix(tree, start))
+
+    def weight(self, band, start, stop, decay):
+        if band not in self.trees:
+            return 0.0
+        if start == 0 and stop == len(self.keys):
+            count, mass = self.totals[band]
+        else:
+            count_tree, mass_tree = self.trees[band]
+            count = (fenwick_prefix(count_tree, stop) -
+                     fenwick_prefix(count_tree, start))
+            mass = (fenwick_prefix(mass_tree, stop) -
+                    fenwick_prefix(mass_tree, start))
+        return max(0.0, count - decay * mass)
+
+    def sample(self, band, start, stop, decay, r):
+        # Walk down from the root to the slot where the weight from `start`
+        # passes r.
+        count_tree, mass_tree = self.trees[band]
+        r += (fenwick_prefix(count_tree, start) -
+              decay * fenwick_prefix(mass_tree, start))
+        n = len(self.keys)
+        pos = 0
+        step = 1 << (n.bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt <= n:
+                node_weight = count_tree[nxt] - decay * mass_tree[nxt]
+                if node_weight < r:
+                    pos = nxt
+                    r -= node_weight
+            step >>= 1
+        # Rounding can land just outside the span or on another band.
+        slot = min(max(pos, start), stop - 1)
+        if band is ANY_BAND:
+            return self.keys[slot]
+        for candidate in itertools.chain(range(slot, stop),
+                                         range(slot - 1, start - 1, -1)):
+            if self.bands[candidate] == band:
+                return self.keys[candidate]
+        return None
+
+    def touch(self, key, last_time):
+        slot = self.slots[key]
+        band = self.bands[slot]
+        delta = self.owner.mass(last_time) - self.owner.mass(self.times[slot])
+        self.times[slot] = last_time
+        for target in (band, ANY_BAND):
+            fenwick_add(self.trees[target][1], slot, delta)
+            self.totals[target][1] += delta
+
+    def move(self, key, band):
+        slot = self.slots[key]
+        old = self.bands[slot]
+        if old == band:
+            return
+        mass = self.owner.mass(self.times[slot])
+        for target, sign in ((old, -1.0), (band, 1.0)):
+            count_tree, mass_tree = self.trees_for(target)
+            fenwick_add(count_tree, slot, sign)
+            fenwick_add(mass_tree, slot, sign * mass)
+            self.totals[target][0] += sign
+            self.totals[target][1] += sign * mass
+        self.bands[slot] = band
+
+
+class BucketSampler:
+    # Keys filed by bucket (a category), ordered by rank (an iq) inside
+    # it, and tagged with a band (a difficulty) that can change. A pick
+    # takes any mix of buckets, bands and one rank range, and draws with
+    # weight 1 - exp(-age / half_life) over just the matching keys: each
+    # matching (bucket, band) pair costs O(log n) to weigh, then one
+    # O(log n) walk picks the key. With no filter it is the same
+    # distribution as scanning the whole bank.
+
+    def __init__(self, half_life, now=None):
+        self.half_life = float(half_life)
+        self.base = now if now is not None else 0.0
+        self.buckets = {}
+        self.bucket_of = {}
+        # Shared by every room, each holding only its own lock; a tree
+        # update is several non-atomic steps.
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, half_life, entries, now=None):
+        # entries: (key, bucket, rank, band, last_time)
+        sampler = cls(half_life, now=now)
+        grouped = {}
+        for key, bucket, rank, band, last_time in entries:
+            if key in sampler.bucket_of:
+                continue
+            sampler.bucket_of[key] = bucket
+            grouped.setdefault(bucket, []).append(
+                (key, rank, band, last_time))
+            sampler.base = max(sampler.base, last_time or 0)
+        for bucket, bucket_entries in grouped.items():
+            sampler.buckets[bucket] = RankedBucket(sampler, bucket_entries)
+        return sampler
+
+    def __len__(self):
+        return len(self.bucket_of)
+
+    def __contains__(self, key):
+        return key in self.bucket_of
+
+    def mass(self, last_time):
+        exponent = (last_time - self.base) / self.half_life
+        if exponent < -700:
+            return 0.0
+        return math.exp(exponent)
+
+    def band(self, key):
+        bucket = self.buckets[self.bucket_of[key]]
+        return bucket.bands[bucket.slots[key]]
+
+    def last_time(self, key):
+        bucket = self.buckets[self.bucket_of[key]]
+        return bucket.times[bucket.slots[key]]
+
+    def touch(self, key, last_time):
+        with self.lock:
+            if key not in self.bucket_of:
+                return
+            if (last_time - self.base) / self.half_life > REBASE_AFTER_HALF_LIVES:
+                self.base = last_time
+                for bucket in self.buckets.values():
+                    bucket.rebuild()
+            self.buckets[self.bucket_of[key]].touch(key, last_time)
+
+    def move(self, key, band):
+        with self.lock:
+            if key in self.bucket_of:
+                self.buckets[self.bucket_of[key]].move(key, band)
+
+    def matching(self, buckets=None, bands=None, ranks=None):
+        # (bucket, band, start, stop) for every pair the filter allows.
+        names = self.buckets if buckets is None else buckets
+        for name in names:
+            bucket = self.buckets.get(name)
+            if bucket is None:
+                continue
+            start, stop = bucket.span(ranks)
+            if start >= stop:
+                continue
+            for band in ((ANY_BAND,) if bands is None else bands):
+                yield bucket, band, start, stop
+
+    def count(self, buckets=None, bands=None, ranks=None):
+        with self.lock:
+            return sum(bucket.count(band, start, stop) for bucket, band, start, stop
+                       in self.matching(buckets, bands, ranks))
+
+    def sizes(self):
+        with self.lock:
+            sizes = {}
+            for name, bucket in self.buckets.items():
+                counts = {band: bucket.count(band, 0, len(bucket))
+                          for band in bucket.trees if band is not ANY_BAND}
+                sizes[name] = {band: n for band, n in counts.items() if n}
+            return sizes
+
+    def sample(self, now, buckets=None, bands=None, ranks=None, rng=random):
+        with self.lock:
+            decay = math.exp(-(now - self.base) / self.half_life)
+            candidates = []
+            total = 0.0
+            for bucket, band, start, stop in self.matching(buckets, bands, ranks):
+                weight = bucket.weight(band, start, stop, decay)
+                if weight > 0:
+                    candidates.append((bucket, band, start, stop, weight))
+                    total += weight
+            if not candidates:
+                # Everything that matches was asked just now, or nothing does.
+                for bucket, band, start, stop in self.matching(
+                        buckets, bands, ranks):
+                    if bucket.count(band, start, stop):
+                        return bucket.sample(band, start, stop, 0.0, 0.0)
+                return None
+            r = rng.uniform(0, total)
+            for bucket, band, start, stop, weight in candidates:
+                if r <= weight:
+                    break
+                r -= weight
+            return bucket.sample(band, start, stop, decay, min(r, weight))
@@ -0,0 +1,131 @@
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from metrics import TIMER_LATENESS
+
+log = logging.getLogger('quiz.scheduler')
+
+
+class TimerHandle:
+    __slots__ = ('deadline', 'callback', 'args', 'interval', 'cancelled')
+
+    def __init__(self, deadline, callback, args, interval=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    # One heap of deadlines served by a single background task, instead of a
+    # threading.Timer (and an OS thread) per question, intermission and ping.
+
+    def __init__(self, spawn=None, clock=time.monotonic, lateness_window=1024):
+        self.spawn = spawn
+        self.clock = clock
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        self.fired = 0
+        self.lateness = collections.deque(maxlen=lateness_window)
+        self.max_lateness = 0.0
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        if self.spawn is not None:
+            self.spawn(self.run)
+        else:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def _push(self, handle):
+        if not self.running:
+            self.start()
+        with self.condition:
+            heapq.heappush(
+                self.heap, (handle.deadline, next(self.counter), handle))
+            if self.heap[0][2] is handle:
+                self.condition.notify()
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        return self._push(
+            TimerHandle(self.clock() + max(0, delay), callback, args))
+
+    def call_at(self, wall_time, callback, *args):
+        return self.call_later(wall_time - time.time(), callback, *args)
+
+    def call_every(self, interval, callback, *args):
+        return self._push(
+            TimerHandle(self.clock() + interval, callback, args, interval))
+
+    def _next_due(self):
+        with self.condition:
+            while self.running:
+                while self.heap and self.heap[0][2].cancelled:
+                    heapq.heappop(self.heap)
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                delay = self.heap[0][0] - self.clock()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                return heapq.heappop(self.heap)[2]
+        return None
+
+    def run(self):
+        while True:
+            handle = self._next_due()
+            if handle is None:
+                return
+            late = max(0.0, self.clock() - handle.deadline)
+            self.lateness.append(late)
+            TIMER_LATENESS.observe(late)
+            if late > self.max_lateness:
+                self.max_lateness = late
+            self.fired += 1
+            try:
+                handle.callback(*handle.args)
+            except Exception:
+                log.exception('Timer callback %r failed', handle.callback)
+            if handle.interval and not handle.cancelled:
+                handle.deadline += handle.interval
+                if handle.deadline < self.clock():
+                    handle.deadline = self.clock() + handle.interval
+                self._push(handle)
+
+    def pending(self):
+        with self.condition:
+            return sum(1 for _, _, handle in self.heap if not handle.cancelled)
+
+    def stats(self):
+        samples = sorted(self.lateness)
+        stats = {
+            'fired': self.fired,
+            'pending': self.pending(),
+            'lateness_max_ms': self.max_lateness * 1000,
+            'lateness_p50_ms': 0.0,
+            'lateness_p99_ms': 0.0,
+        }
+        if samples:
+            stats['lateness_p50_ms'] = samples[len(samples) // 2] * 1000
+            stats['lateness_p99_ms'] = samples[
+                min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+        return stats
@@ -0,0 +1,448 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import socketio
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import payloads
+
+LATENCY_KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "exp": 1}
+
+
+def latency_spec(text):
+    # fixed:S, uniform:LO,HI, normal:MEAN,SD or exp:MEAN, in seconds.
+    kind, _, params = text.partition(":")
+    try:
+        values = tuple(float(value) for value in params.split(",") if value)
+    except ValueError:
+        values = ()
+    if LATENCY_KINDS.get(kind) != len(values) or min(values) < 0:
+        raise argparse.ArgumentTypeError(
+            f"{text!r}: use fixed:S, uniform:LO,HI, normal:MEAN,SD or exp:MEAN")
+    return kind, values
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Swarm of Socket.IO players: join storm, question fan-out, server CPU and RSS."
+    )
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--step", type=int, default=100,
+                        help="Players joining at once during the join storm.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=latency_spec, default=latency_spec("uniform:0.5,5"),
+                        help="Answer delay after a question arrives: fixed:S, "
+                             "uniform:LO,HI, normal:MEAN,SD or exp:MEAN.")
+    parser.add_argument("--silent", type=float, default=0.0,
+                        help="Fraction of players that never answer; rounds then "
+                             "run to the question timer.")
+    parser.add_argument("--room", default="swarm")
+    parser.add_argument("--url", help="Use a running server instead of starting one.")
+    parser.add_argument("--pid", type=int, help="Server pid to sample with --url.")
+    parser.add_argument("--mode", default="eventlet", help="ASYNC_MODE of the started server.")
+    parser.add_argument("--port", type=int, default=9400)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Also write the report to this file.")
+    return parser.parse_args()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def summary_ms(samples):
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 0.5) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def start_server(args, directory):
+    # Game history, snapshots and the question log go to a scratch
+    # directory so a swarm run leaves the real ones alone.
+    env = dict(os.environ, ASYNC_MODE=args.mode, PORT=str(args.port),
+               HOST="127.0.0.1", DEBUG="0", USE_RELOADER="0",
+               MAX_CONNECTIONS=str(args.players * 2 + 100),
+               QUESTION_LOG_FSYNC="never",
+               QUESTIONS_LOG=str(Path(directory) / "questions_asked.jsonl"),
+               GAME_HISTORY_PATH=str(Path(directory) / "game_history.sqlite3"),
+               SNAPSHOT_DIR=str(Path(directory) / "snapshots"))
+    server = subprocess.Popen(
+        [sys.executable, "app.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            presence(url)
+            return server, url
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(server):
+    # SIGTERM runs the server's atexit handlers, but under eventlet it can
+    # land in a background green thread and be lost.
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def presence(url):
+    with urllib.request.urlopen(f"{url}/api/presence", timeout=5) as response:
+        return json.load(response)
+
+
+class ProcessSampler:
+    # CPU time and resident memory of the server from /proc, so it needs
+    # nothing installed; elsewhere the report leaves them out.
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.tick = os.sysconf("SC_CLK_TCK")
+        self.samples = []
+        self.marks = {}
+
+    def read(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rpartition(")")[2].split()
+            with open(f"/proc/{self.pid}/status") as f:
+                rss = next(int(line.split()[1]) for line in f
+                           if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, IndexError, ValueError):
+            return None
+        cpu = (int(fields[11]) + int(fields[12])) / self.tick
+        return time.perf_counter(), cpu, rss * 1024
+
+    async def run(self):
+        while True:
+            sample = self.read()
+            if sample is not None:
+                self.samples.append(sample)
+            await asyncio.sleep(self.interval)
+
+    def mark(self, name):
+        sample = self.read()
+        if sample is not None:
+            self.samples.append(sample)
+        self.marks[name] = len(self.samples)
+
+    def phase(self, start, end):
+        if start not in self.marks or end not in self.marks:
+            return None
+        window = self.samples[self.marks[start] - 1:self.marks[end]]
+        (t0, cpu0, _), (t1, cpu1, _) = window[0], window[-1]
+        return {
+            "cpu_pct": (cpu1 - cpu0) / (t1 - t0) * 100 if t1 > t0 else 0.0,
+            "rss_peak_mb": max(rss for _, _, rss in window) / 2**20,
+            "rss_end_mb": window[-1][2] / 2**20,
+        }
+
+
+class Client:
+    def __init__(self, swarm, username):
+        self.swarm = swarm
+        self.username = username
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.waiters = {}
+        self.silent = False
+        self.answer_task = None
+        for event in ("batch", "host_session", "joined", "error", "question",
+                      "round_results", "game_over"):
+            self.sio.on(event, self.handler(event))
+        self.sio.on("clock_probe", self.on_probe)
+
+    def handler(self, event):
+        async def handle(data=None):
+            if event == "batch":
+                for name, payload in data:
+                    self.received(name, payloads.decode(name, payload))
+            else:
+                self.received(event, payloads.decode(event, data))
+        return handle
+
+    def received(self, event, payload):
+        now = time.perf_counter()
+        if event == "question" and self.username is not None:
+            self.swarm.question_arrived(self, payload, now)
+        elif event == "round_results" and self.username is not None:
+            self.swarm.results_arrived(now)
+        waiter = self.waiters.pop(event, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(payload)
+
+    def expect(self, event):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[event] = waiter
+        return waiter
+
+    async def on_probe(self, data):
+        if self.sio.connected:
+            await self.sio.emit("clock_reply", {
+                "id": data.get("id"), "client_ts": time.time() * 1000})
+
+    async def connect(self, url, timeout):
+        session = self.expect("host_session")
+        await self.sio.connect(url, transports=["websocket"], wait_timeout=timeout)
+        return (await asyncio.wait_for(session, timeout))["token"]
+
+    async def join(self, url, token, timeout):
+        # connect, then join with the host's token; done when 'joined'
+        # (or an 'error') comes back.
+        started = time.perf_counter()
+        try:
+            await self.connect(url, timeout)
+            joined, error = self.expect("joined"), self.expect("error")
+            await self.sio.emit("join", {"username": self.username, "host_token": token})
+            done, _ = await asyncio.wait((joined, error), timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        except Exception:
+            return None
+        if joined not in done:
+            return None
+        return time.perf_counter() - started
+
+    async def answer(self, delay, choices):
+        await asyncio.sleep(delay)
+        if not self.sio.connected:
+            return
+        self.swarm.last_answer_at = time.perf_counter()
+        await self.sio.emit("answer", {
+            "username": self.username,
+            "answer_index": self.swarm.rng.randrange(choices) if choices else 0,
+            "host_token": self.swarm.token,
+            "client_ts": time.time() * 1000})
+
+
+class Swarm:
+    def __init__(self, args, url):
+        self.args = args
+        self.url = f"{url}?room={args.room}"
+        self.rng = random.Random(args.seed)
+        self.token = None
+        self.sent_at = None
+        self.last_answer_at = None
+        self.fanout = []
+        self.results = []
+        self.answered = 0
+        self.delivered = 0
+        self.drained = None
+
+    def delay(self):
+        kind, params = self.args.latency
+        if kind == "fixed":
+            return params[0]
+        if kind == "uniform":
+            return self.rng.uniform(*params)
+        if kind == "normal":
+            return max(0.0, self.rng.gauss(*params))
+        return self.rng.expovariate(1 / params[0]) if params[0] else 0.0
+
+    def question_arrived(self, client, payload, now):
+        if self.sent_at is not None:
+            self.fanout.append(now - self.sent_at)
+        if client.silent:
+            return
+        self.answered += 1
+        client.answer_task = asyncio.ensure_future(client.answer(
+            self.delay(), len(payload.get("answers") or ())))
+
+    def results_arrived(self, now):
+        if self.last_answer_at is not None:
+            self.results.append(now - self.last_answer_at)
+        self.delivered += 1
+        if self.delivered >= len(self.fanout):
+            self.drained.set()
+
+    async def join_storm(self, players):
+        latencies, failed = [], 0
+        started = time.perf_counter()
+        for offset in range(0, len(players), self.args.step):
+            batch = players[offset:offset + self.args.step]
+            results = await asyncio.gather(*(
+                client.join(self.url, self.token, self.args.timeout) for client in batch))
+            latencies += [latency for latency in results if latency is not None]
+            failed += results.count(None)
+        elapsed = time.perf_counter() - started
+        return {
+            "joined": len(latencies),
+            "failed": failed,
+            "seconds": elapsed,
+            "joins_per_s": len(latencies) / elapsed if elapsed else 0.0,
+            "latency": summary_ms(latencies),
+        }
+
+    async def play(self, host):
+        # The host moves on as soon as a round's results are out, so each
+        # question's send time is known here and fan-out is measured on
+        # one clock.
+        rounds, fanout_by_round = [], []
+        question_timeout = 25 + self.args.timeout
+        for index in range(self.args.rounds):
+            self.fanout, self.results = [], []
+            self.answered, self.last_answer_at = 0, None
+            self.delivered, self.drained = 0, asyncio.Event()
+            results = host.expect("round_results")
+            question = host.expect("question")
+            self.sent_at = time.perf_counter()
+            if index == 0:
+                await host.sio.emit("start_game", {
+                    "host_token": self.token, "count": self.args.rounds})
+            else:
+                await host.sio.emit("next_question", {
+                    "index": index, "host_token": self.token})
+            try:
+                await asyncio.wait_for(question, self.args.timeout)
+                await asyncio.wait_for(results, question_timeout)
+            except asyncio.TimeoutError:
+                print(f"round {index + 1}: timed out")
+                break
+            # Every player has its results before the next question, or
+            # their backlog would count against the next fan-out.
+            try:
+                await asyncio.wait_for(self.drained.wait(), self.args.timeout)
+            except asyncio.TimeoutError:
+                pass
+            rounds.append({
+                "round": index + 1,
+                "received": len(self.fanout),
+                "answered": self.answered,
+                "seconds": time.perf_counter() - self.sent_at,
+                "fanout": summary_ms(self.fanout),
+                "results": summary_ms(self.results),
+            })
+            fanout_by_round += self.fanout
+        over = host.expect("game_over")
+        await host.sio.emit("next_question", {
+            "index": self.args.rounds, "host_token": self.token})
+        try:
+            await asyncio.wait_for(over, self.args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        return rounds, summary_ms(fanout_by_round)
+
+    async def run(self, sampler):
+        if sampler is not None:
+            sampling = asyncio.ensure_future(sampler.run())
+            sampler.mark("start")
+        host = Client(self, None)
+        self.token = await host.connect(self.url, self.args.timeout)
+        players = [Client(self, f"swarm-{i:05d}") for i in range(self.args.players)]
+        silent = set(self.rng.sample(range(len(players)),
+                                     int(len(players) * self.args.silent)))
+        for i in silent:
+            players[i].silent = True
+        joins = await self.join_storm(players)
+        if sampler is not None:
+            sampler.mark("joined")
+        await asyncio.sleep(1.0)
+        if sampler is not None:
+            sampler.mark("game")
+        rounds, fanout = await self.play(host)
+        if sampler is not None:
+            sampler.mark("end")
+            sampling.cancel()
+        await asyncio.gather(*(client.sio.disconnect() for client in players + [host]),
+                             return_exceptions=True)
+        return {
+            "players": self.args.players,
+            "latency": self.args.latency[0] + ":" + ",".join(
+                f"{value:g}" for value in self.args.latency[1]),
+            "join": joins,
+            "rounds": rounds,
+            "fanout": fanout,
+            "server": sampler and {
+                "join": sampler.phase("start", "joined"),
+                "game": sampler.phase("game", "end"),
+            },
+        }
+
+
+def ms(summary, key):
+    return f"{summary[key]:8.1f}" if summary.get("count") else f"{'-':>8}"
+
+
+def print_report(report):
+    join = report["join"]
+    print(f"players={report['players']} latency={report['latency']}")
+    print(f"join storm: {join['joined']} joined, {join['failed']} failed in "
+          f"{join['seconds']:.2f}s = {join['joins_per_s']:.0f} joins/s, "
+          f"p50 {ms(join['latency'], 'p50_ms').strip()} ms "
+          f"p99 {ms(join['latency'], 'p99_ms').strip()} ms")
+    print(f"{'round':>5} {'received':>9} {'answered':>9} {'secs':>6} "
+          f"{'fan p50':>8} {'fan p95':>8} {'fan p99':>8} {'fan max':>8} "
+          f"{'res p50':>8} {'res p99':>8}")
+    for row in report["rounds"]:
+        fanout, results = row["fanout"], row["results"]
+        print(f"{row['round']:>5} {row['received']:>9} {row['answered']:>9} "
+              f"{row['seconds']:6.1f} {ms(fanout, 'p50_ms')} {ms(fanout, 'p95_ms')} "
+              f"{ms(fanout, 'p99_ms')} {ms(fanout, 'max_ms')} "
+              f"{ms(results, 'p50_ms')} {ms(results, 'p99_ms')}")
+    fanout = report["fanout"]
+    print(f"{'all':>5} {fanout['count']:>9} {'':>9} {'':>6} {ms(fanout, 'p50_ms')} "
+          f"{ms(fanout, 'p95_ms')} {ms(fanout, 'p99_ms')} {ms(fanout, 'max_ms')}")
+    for phase, usage in (report["server"] or {}).items():
+        if usage is not None:
+            print(f"server {phase}: cpu {usage['cpu_pct']:.0f}% "
+                  f"rss peak {usage['rss_peak_mb']:.0f} MB "
+                  f"end {usage['rss_end_mb']:.0f} MB")
+
+
+def main():
+    args = parse_args()
+    raise_fd_limit()
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        url, pid = args.url, args.pid
+        if url is None:
+            server, url = start_server(args, directory)
+            pid = server.pid
+        sampler = ProcessSampler(pid) if pid and Path(f"/proc/{pid}").exists() else None
+        try:
+            report = asyncio.run(Swarm(args, url.rstrip("/")).run(sampler))
+        finally:
+            if server is not None:
+                stop_server(server)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+
+# threading is Werkzeug's development server, one OS thread per socket.
+# eventlet and gevent serve every socket from green threads in one process;
+# they need the standard library patched before anything creates a lock,
+# thread or socket, which is why app.py calls patch() before its imports.
+ASYNC_MODE = os.getenv('ASYNC_MODE', 'threading')
+if ASYNC_MODE not in ASYNC_MODES:
+    raise ValueError(f'ASYNC_MODE must be one of {ASYNC_MODES}')
+
+# Most sockets one green server accepts at once (eventlet defaults to 1024).
+MAX_CONNECTIONS = int(os.getenv('MAX_CONNECTIONS', '10000'))
+
+
+def patch():
+    if ASYNC_MODE == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def run_blocking(fn, *args):
+    # Disk writes and fsync stall every green thread while they run, so
+    # under eventlet or gevent they go to the hub's pool of OS threads.
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+    if ASYNC_MODE == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+def raise_fd_limit():
+    # Every socket is a file descriptor; the usual soft limit is 1024.
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > MAX_CONNECTIONS * 2:
+        target = MAX_CONNECTIONS * 2
+    else:
+        target = hard
+    if soft != resource.RLIM_INFINITY and soft < target:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+def server_options():
+    if ASYNC_MODE == 'eventlet':
+        return {'max_size': MAX_CONNECTIONS, 'log_output': False}
+    if ASYNC_MODE == 'gevent':
+        from gevent.pool import Pool
+        return {'spawn': Pool(MAX_CONNECTIONS), 'log_output': False}
+    return {}
@@ -0,0 +1,163 @@
+import collections
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+SNAPSHOT_FORMAT = 1
+SUFFIX = '.json.gz'
+
+log = logging.getLogger('quiz.snapshots')
+
+
+def encode_section(entries):
+    # Values are already JSON text from the state store; splice them in
+    # rather than parse and re-serialise every player.
+    return '{' + ','.join(
+        f'{json.dumps(name)}:{value}' for name, value in entries.items()) + '}'
+
+
+def encode_snapshot(name, parts, saved_at, level=1):
+    text = (
+        f'{{"format":{SNAPSHOT_FORMAT},"room":{json.dumps(name)},'
+        f'"saved_at":{saved_at},"round":{parts["round"]},'
+        f'"players":{encode_section(parts["players"])},'
+        f'"answers":{encode_section(parts["answers"])}}}')
+    return gzip.compress(text.encode('utf-8'), compresslevel=level)
+
+
+def decode_snapshot(data):
+    saved = json.loads(gzip.decompress(data))
+    if saved.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f'unknown snapshot format {saved.get("format")!r}')
+    return saved
+
+
+class Snapshotter:
+    # Writes every room whose state changed to one gzipped JSON file per
+    # room. The room lock is held only to copy the store's already
+    # serialised strings; encoding, compression and the write happen on a
+    # background task, through offload under a green server.
+
+    def __init__(self, directory, rooms, interval=5.0, max_age=3600.0,
+                 level=1, spawn=None, offload=None, clock=time.monotonic,
+                 latency_window=256):
+        self.directory = directory
+        self.rooms = rooms
+        self.interval = interval
+        self.max_age = max_age
+        self.level = level
+        self.spawn = spawn
+        self.offload = offload
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.running = False
+        self.saved_versions = {}
+        self.snapshots = 0
+        self.errors = 0
+        self.last_bytes = 0
+        self.copy_latency = collections.deque(maxlen=latency_window)
+        self.write_latency = collections.deque(maxlen=latency_window)
+
+    def path(self, name):
+        return os.path.join(self.directory, name + SUFFIX)
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        if self.spawn is not None:
+            self.spawn(self.run)
+        else:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait(self.interval)
+                if not self.running:
+                    return
+            self.snapshot_all()
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.snapshot_all()
+
+    def snapshot_all(self):
+        for room in list(self.rooms.rooms.values()):
+            try:
+                self.snapshot(room)
+            except Exception:
+                self.errors += 1
+                log.exception('Could not snapshot room %s', room.name)
+
+    def snapshot(self, room):
+        if not room.owner:
+            return False  # the timer owner snapshots a shared room
+        started = self.clock()
+        parts = room.snapshot(since=self.saved_versions.get(room.name))
+        self.copy_latency.append(self.clock() - started)
+        if parts is None:
+            return False
+        started = self.clock()
+        if self.offload is None:
+            self.write(room.name, parts)
+        else:
+            self.offload(self.write, room.name, parts)
+        self.write_latency.append(self.clock() - started)
+        self.saved_versions[room.name] = parts['versions']
+        self.snapshots += 1
+        return True
+
+    def write(self, name, parts):
+        data = encode_snapshot(name, parts, time.time(), self.level)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.last_bytes = len(data)
+
+    def restore(self):
+        # Recreate each room from its file unless the store already has it.
+        restored = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*' + SUFFIX))):
+            try:
+                with open(path, 'rb') as f:
+                    saved = decode_snapshot(f.read())
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                log.warning('Skipping snapshot %s: %s', path, e)
+                continue
+            if time.time() - saved['saved_at'] > self.max_age:
+                continue
+            room = self.rooms.get_or_create(saved['room'], saved=saved)
+            if room is None:
+                log.warning('Skipping snapshot %s: room limit reached', path)
+                continue
+            self.saved_versions[room.name] = None
+            restored.append(room.name)
+        return restored
+
+    def stats(self):
+        stats = {
+            'snapshots': self.snapshots,
+            'errors': self.errors,
+            'last_bytes': self.last_bytes,
+        }
+        for name, samples in (('copy', self.copy_latency),
+                              ('write', self.write_latency)):
+            samples = sorted(samples)
+            stats[f'{name}_p50_ms'] = (
+                samples[len(samples) // 2] * 1000 if samples else 0.0)
+            stats[f'{name}_max_ms'] = samples[-1] * 1000 if samples else 0.0
+        return stats
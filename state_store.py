@@ -0,0 +1,304 @@
+import contextlib
+import secrets
+import socket
+import threading
+import time
+import urllib.parse
+
+LOCK_TTL = 5.0
+LOCK_TIMEOUT = 10.0
+
+
+# Compare-and-delete and compare-and-extend, each one atomic step on the
+# server, so a lease that expired and passed to another owner in between
+# is never released or extended by the old one.
+RELEASE_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                  "return redis.call('del', KEYS[1]) end return 0")
+RENEW_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                "return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0")
+
+
+class StoreError(Exception):
+    pass
+
+
+class NoLock(contextlib.nullcontext):
+    def hold(self):
+        pass
+
+
+class MemoryStore:
+    # Strings, hashes and expiring leases kept in this process. The room
+    # lock already serialises a single process, so locked() is free here.
+    shared = False
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.values = {}
+        self.hashes = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= self.clock():
+            self.values.pop(key, None)
+            del self.expires[key]
+        return key in self.values
+
+    def get(self, key):
+        with self.lock:
+            return self.values.get(key) if self._live(key) else None
+
+    def set(self, key, value):
+        with self.lock:
+            self.values[key] = value
+            self.expires.pop(key, None)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.values.pop(key, None)
+                self.hashes.pop(key, None)
+                self.expires.pop(key, None)
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self.hashes.get(key, {}))
+
+    def hset(self, key, mapping):
+        if mapping:
+            with self.lock:
+                self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel(self, key, fields):
+        with self.lock:
+            fields_by_key = self.hashes.get(key, {})
+            for field in fields:
+                fields_by_key.pop(field, None)
+
+    def hincrby(self, key, field, amount=1):
+        with self.lock:
+            fields = self.hashes.setdefault(key, {})
+            value = int(fields.get(field, 0)) + amount
+            fields[field] = str(value)
+            return value
+
+    def acquire(self, key, owner, ttl):
+        with self.lock:
+            if self._live(key):
+                return False
+            self.values[key] = owner
+            self.expires[key] = self.clock() + ttl
+            return True
+
+    def renew(self, key, owner, ttl):
+        with self.lock:
+            if not self._live(key) or self.values[key] != owner:
+                return False
+            self.expires[key] = self.clock() + ttl
+            return True
+
+    def release(self, key, owner):
+        with self.lock:
+            if not self._live(key) or self.values[key] != owner:
+                return False
+            del self.values[key]
+            del self.expires[key]
+            return True
+
+    def locked(self, key):
+        return NoLock()
+
+
+class RespConnection:
+    # Just enough of the Redis wire protocol (RESP2) for RedisStore.
+
+    def __init__(self, host, port, db=0, password=None, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        self.sock = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if self.password:
+            self._call(('AUTH', self.password))
+        if self.db:
+            self._call(('SELECT', self.db))
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.reader.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+
+    def command(self, *args):
+        with self.lock:
+            for attempt in (0, 1):
+                try:
+                    if self.sock is None:
+                        self.connect()
+                    return self._call(args)
+                except (OSError, EOFError):
+                    self.close()
+                    if attempt:
+                        raise
+
+    def _call(self, args):
+        self.sock.sendall(encode_command(args))
+        return self._read()
+
+    def _read(self):
+        line = self.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise EOFError('connection closed')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise StoreError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode()
+        if kind == b'*':
+            count = int(rest)
+            if count < 0:
+                return None
+            return [self._read() for _ in range(count)]
+        raise StoreError(f'unexpected reply {line!r}')
+
+
+def encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+class RedisStore:
+    # The same operations against a Redis server, so every process behind
+    # the load balancer reads and writes one copy of each room.
+    shared = True
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0, password=None,
+                 lock_ttl=LOCK_TTL, lock_timeout=LOCK_TIMEOUT):
+        self.conn = RespConnection(host, port, db, password)
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        parts = urllib.parse.urlparse(url)
+        db = parts.path.strip('/')
+        return cls(
+            parts.hostname or '127.0.0.1', parts.port or 6379,
+            int(db) if db else 0, parts.password, **kwargs)
+
+    def get(self, key):
+        return self.conn.command('GET', key)
+
+    def set(self, key, value):
+        self.conn.command('SET', key, value)
+
+    def delete(self, *keys):
+        if keys:
+            self.conn.command('DEL', *keys)
+
+    def hgetall(self, key):
+        flat = self.conn.command('HGETALL', key) or []
+        return dict(zip(flat[::2], flat[1::2]))
+
+    def hset(self, key, mapping):
+        if mapping:
+            args = [item for pair in mapping.items() for item in pair]
+            self.conn.command('HSET', key, *args)
+
+    def hdel(self, key, fields):
+        fields = list(fields)
+        if fields:
+            self.conn.command('HDEL', key, *fields)
+
+    def hincrby(self, key, field, amount=1):
+        return self.conn.command('HINCRBY', key, field, amount)
+
+    def acquire(self, key, owner, ttl):
+        return self.conn.command(
+            'SET', key, owner, 'NX', 'PX', int(ttl * 1000)) == 'OK'
+
+    def renew(self, key, owner, ttl):
+        return self.conn.command(
+            'EVAL', RENEW_SCRIPT, 1, key, owner, int(ttl * 1000)) == 1
+
+    def release(self, key, owner):
+        return self.conn.command('EVAL', RELEASE_SCRIPT, 1, key, owner) == 1
+
+    def locked(self, key):
+        return RedisLock(self, key, self.lock_ttl, self.lock_timeout)
+
+
+class RedisLock:
+    # The store-wide room lock. It expires after ttl so a crashed process
+    # cannot hold a room forever; hold() extends it for a caller that is
+    # still working, and losing it raises rather than letting two
+    # processes write the room at once.
+
+    def __init__(self, store, key, ttl, timeout, clock=time.monotonic):
+        self.store = store
+        self.key = key
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.token = secrets.token_hex(8)
+        self.renewed = None
+
+    def __enter__(self):
+        deadline = self.clock() + self.timeout
+        delay = 0.001
+        while not self.store.acquire(self.key, self.token, self.ttl):
+            if self.clock() > deadline:
+                raise StoreError(f'timed out waiting for {self.key}')
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        self.renewed = self.clock()
+        return self
+
+    def hold(self):
+        # Cheap while the lock is young; past half its ttl, extend it.
+        if self.clock() - self.renewed < self.ttl / 2:
+            return
+        if not self.store.renew(self.key, self.token, self.ttl):
+            raise StoreError(f'lost {self.key} after its {self.ttl}s ttl')
+        self.renewed = self.clock()
+
+    def __exit__(self, exc_type, exc, tb):
+        released = self.store.release(self.key, self.token)
+        if not released and exc_type is None:
+            raise StoreError(f'lost {self.key} after its {self.ttl}s ttl')
+        return False
+
+
+def open_store(url):
+    if not url or url == 'memory':
+        return MemoryStore()
+    if url.startswith('redis://'):
+        return RedisStore.from_url(url)
+    raise ValueError(f'unknown state store {url!r}')
@@ -1,4 +1,53 @@
-const socket = io();
+const roomName = new URLSearchParams(window.location.search).get('room');
+// Reconnect quickly: a restarted server restores the game from a snapshot
+// with the same host token, so a returning phone just re-joins.
+const socket = io({
+  ...(roomName ? { query: { room: roomName } } : {}),
+  reconnectionDelay: 250,
+  reconnectionDelayMax: 1000,
+});
+
+// Keeps this socket counted as live (HEARTBEAT_INTERVAL in presence.py);
+// the server never polls idle clients for it.
+const HEARTBEAT_MS = 15000;
+setInterval(() => {
+  if (socket.connected) socket.emit('heartbeat');
+}, HEARTBEAT_MS);
+
+// Mirrors SCHEMAS in payloads.py: these events arrive as arrays of field
+// values in this order.
+const PAYLOAD_SCHEMAS = {
+  question: ['index', 'question', 'answers', 'iq', 'category', 'total'],
+  timer: ['end_time', 'duration'],
+  gamestate: ['state'],
+  host_session: ['token'],
+  player_presence: ['username', 'online', 'last_seen'],
+  player_rank: ['username', 'rank', 'score'],
+  round_results: ['next_question_time', 'intermission_duration', 'question', 'answers', 'correct_index', 'player_answers'],
+  player_list: ['seq', 'snapshot', 'players', 'removed', 'added', 'scores', 'order', 'winning_players', 'total_players'],
+};
+
+const PAYLOAD_DECODERS = {
+  player_answers: (rows) => Object.fromEntries(
+    rows.map(([name, chosen, correct]) => [name, { chosen_index: chosen, is_correct: !!correct }])
+  ),
+};
+
+const decodePayload = (event, data) => {
+  const fields = PAYLOAD_SCHEMAS[event];
+  if (!fields || !Array.isArray(data)) return data;
+  const decoded = {};
+  fields.forEach((field, idx) => {
+    if (idx >= data.length || data[idx] === null) return;
+    const decode = PAYLOAD_DECODERS[field];
+    decoded[field] = decode ? decode(data[idx]) : data[idx];
+  });
+  return decoded;
+};
+
+const onPayload = (event, handler) => {
+  socket.on(event, (data) => handler(decodePayload(event, data)));
+};
 
     function formatChallengeLabel(iqValue) {
       if (iqValue === undefined || iqValue === null) return null;
@@ -8,6 +57,17 @@ const socket = io();
       if (iq >= 130) return "Tough";
       return null;
     }
+
+    // "Geography · 2 / 5": the category and, in a fixed-length game,
+    // which question this is.
+    function showQuestionMeta(elementId, data) {
+      const element = document.getElementById(elementId);
+      if (!element) return;
+      const progress = data.total ? `${data.index + 1} / ${data.total}` : null;
+      const meta = [data.category, progress].filter(Boolean).join(' · ');
+      element.textContent = meta;
+      element.classList.toggle('hidden', !meta);
+    }
     
     // Confetti
     function fireConfetti() {
@@ -56,7 +116,6 @@ const socket = io();
     let lastRoundByPlayer = {};
     let playerAnswered = false;
     let hostToken = null;
-    let lastHostPingAt = 0;
     let serverTimeOffsetMs = 0;
     let hasTimeSync = false;
     let lastTimeSyncAt = 0;
@@ -114,6 +173,7 @@ const socket = io();
     };
 
     let pendingJoinName = null;
+    let lostHostToken = null;
 
     // Add test confetti button logic if it exists (we will add it to DOM in a moment if not present, but for now let's just expose function)
 
@@ -158,124 +218,182 @@ const socket = io();
       }
     };
 
-    socket.on('host_session', (data) => {
+    onPayload('host_session', (data) => {
       hostToken = data.token || null;
-      lastHostPingAt = Date.now();
+      if (hostToken && hostToken === lostHostToken && isPlayer && myUsername) {
+        socket.emit('join', { username: myUsername, host_token: hostToken });
+      }
+      lostHostToken = null;
       if (hostToken) setJoinStatus('', false);
       tryPendingJoin();
       requestTimeSync();
     });
 
-    socket.on('host_ping', (data) => {
-      if (!hostToken || data.token === hostToken) {
-        hostToken = data.token || hostToken;
-        lastHostPingAt = Date.now();
-        if (hostToken) setJoinStatus('', false);
-        tryPendingJoin();
-        requestTimeSync();
-      }
+    // The host token only changes on reset; a reconnect gets it again in
+    // host_session, so there is nothing to poll while we stay connected.
+    socket.on('disconnect', () => {
+      lostHostToken = hostToken;
+      hostToken = null;
+      sentTyping = '';
+      setJoinStatus('Waiting for host session...', false);
     });
 
-    setInterval(() => {
-      if (!hostToken) return;
-      if (Date.now() - lastHostPingAt > 180000) {
-        hostToken = null;
-        setJoinStatus('Waiting for host session...', false);
-      }
-    }, 3000);
-
     // --- REAL-TIME TYPING ---
-    inputUsername.oninput = (e) => {
-      socket.emit('typing_username', { username: e.target.value });
+    // Sent once typing pauses, and only when the name changed; the server
+    // sends the host its joining list on its own fixed tick anyway.
+    const TYPING_DEBOUNCE_MS = 400;
+    let typingTimer = null;
+    let sentTyping = '';
+    inputUsername.oninput = () => {
+      clearTimeout(typingTimer);
+      typingTimer = setTimeout(() => {
+        const username = inputUsername.value.trim();
+        if (username === sentTyping || !hostToken) return;
+        sentTyping = username;
+        socket.emit('typing_username', { username, host_token: hostToken });
+      }, TYPING_DEBOUNCE_MS);
     };
 
 
     // --- SOCKET HANDLERS ---
 
     // 1. Player List & Leaderboard
-    socket.on('player_list', (data) => {
+    let lastWinningPlayers = [];
+    let myRankInfo = null;
+
+    const renderMyStatus = () => {
+      if (!isPlayer || !myRankInfo) return;
+      const myScore = myRankInfo.score;
+      const myRank = myRankInfo.rank;
+      const rankLabel = Number.isFinite(myRank) ? `#${myRank}` : '';
+      const hasScore = myScore > 0;
+      const isWinning = hasScore && lastWinningPlayers.includes(myUsername);
+
+      const scoreEl = document.getElementById('my-player-score');
+      const startScore = myScoreDisplayed;
+      const endScore = myScore;
+
+      const animateScore = (from, to, durationMs) => {
+        const start = performance.now();
+        const step = (now) => {
+          const progress = Math.min(1, (now - start) / durationMs);
+          const value = Math.round(from + (to - from) * progress);
+          const rankHtml = rankLabel ? `${rankLabel}${isWinning ? ' 👑' : ''}` : '';
+          scoreEl.innerHTML = `${value}`;
+          const nameEl = document.getElementById('my-player-name');
+          if (nameEl) {
+            nameEl.innerHTML = rankLabel ? `${rankHtml}<br>${myUsername}` : myUsername;
+          }
+          if (progress < 1) requestAnimationFrame(step);
+        };
+        requestAnimationFrame(step);
+      };
+
+      if (endScore !== startScore) {
+        const delta = Math.abs(endScore - startScore);
+        const duration = Math.min(1200, Math.max(300, delta * 30));
+        animateScore(startScore, endScore, duration);
+        myScoreDisplayed = endScore;
+      } else {
+        const rankHtml = rankLabel ? `${rankLabel}${isWinning ? ' 👑' : ''}` : '';
+        scoreEl.innerHTML = `${endScore}`;
+        const nameEl = document.getElementById('my-player-name');
+        if (nameEl) {
+          nameEl.innerHTML = rankLabel ? `${rankHtml}<br>${myUsername}` : myUsername;
+        }
+      }
+
+      if (!rankLabel) {
+        const nameEl = document.getElementById('my-player-name');
+        if (nameEl) {
+          nameEl.textContent = myUsername;
+        }
+      }
+    };
+
+    let playerBoard = [];
+    let playerListSeq = null;
+    let totalPlayers = 0;
+    const offlinePlayers = new Set();
+
+    const renderPlayerList = () => {
       const list = document.getElementById('player-list');
       list.innerHTML = '';
 
-      const entries = Object.entries(data.players);
-      const rankMap = {};
-      let lastScore = null;
-      let lastRank = 0;
-      entries.forEach(([name, stats], index) => {
-        if (lastScore === stats.score) {
-          rankMap[name] = lastRank;
-        } else {
-          lastRank = index + 1;
-          rankMap[name] = lastRank;
-          lastScore = stats.score;
-        }
-      });
-      
       // Update Spectator Board
-      for (const [name, stats] of entries) {
+      for (const [name, score] of playerBoard) {
         const li = document.createElement('li');
         let nameHtml = `<span class="player-name">${name}</span>`;
-        if (data.winning_players && data.winning_players.includes(name) && stats.score > 0) nameHtml += ' 👑';
+        if (lastWinningPlayers.includes(name) && score > 0) nameHtml += ' 👑';
         if (lastRoundByPlayer[name] === true) nameHtml += ' ✅';
         if (lastRoundByPlayer[name] === false) nameHtml += ' ❌';
-        
-        li.innerHTML = `${nameHtml} <span class="player-score">${stats.score}</span>`;
+        if (offlinePlayers.has(name)) li.classList.add('offline');
+
+        li.innerHTML = `${nameHtml} <span class="player-score">${score}</span>`;
+        list.appendChild(li);
+      }
+      const hidden = totalPlayers - playerBoard.length;
+      if (hidden > 0) {
+        const li = document.createElement('li');
+        li.textContent = `…and ${hidden} more`;
         list.appendChild(li);
       }
 
-      // Update Player Status (if playing)
-      if (isPlayer) {
-        const myStats = data.players[myUsername];
-        const myScore = myStats ? myStats.score : 0;
-        const myRank = rankMap[myUsername];
-        const rankLabel = Number.isFinite(myRank) ? `#${myRank}` : '';
-        const hasScore = myScore > 0;
-        const isWinning = hasScore && data.winning_players && data.winning_players.includes(myUsername);
-
-            const scoreEl = document.getElementById('my-player-score');
-        const startScore = myScoreDisplayed;
-        const endScore = myScore;
-
-        const animateScore = (from, to, durationMs) => {
-          const start = performance.now();
-          const step = (now) => {
-            const progress = Math.min(1, (now - start) / durationMs);
-            const value = Math.round(from + (to - from) * progress);
-            const rankHtml = rankLabel ? `${rankLabel}${isWinning ? ' 👑' : ''}` : '';
-            scoreEl.innerHTML = `${value}`;
-            const nameEl = document.getElementById('my-player-name');
-            if (nameEl) {
-              nameEl.innerHTML = rankLabel ? `${rankHtml}<br>${myUsername}` : myUsername;
-            }
-            if (progress < 1) requestAnimationFrame(step);
-          };
-          requestAnimationFrame(step);
-        };
+      renderMyStatus();
+    };
 
-        if (endScore !== startScore) {
-          const delta = Math.abs(endScore - startScore);
-          const duration = Math.min(1200, Math.max(300, delta * 30));
-          animateScore(startScore, endScore, duration);
-          myScoreDisplayed = endScore;
+    // player_list is versioned: a snapshot, then deltas numbered by seq.
+    // Only the top N arrive here; our own rank comes via player_rank.
+    const applyPlayerList = (data) => {
+      if (data.snapshot) {
+        if (playerListSeq !== null && data.seq < playerListSeq) return;
+        playerBoard = data.players.map(([name, score]) => [name, score]);
+      } else {
+        if (playerListSeq !== null && data.seq <= playerListSeq) return;
+        if (playerListSeq === null || data.seq !== playerListSeq + 1) {
+          socket.emit('player_list_sync', { host_token: hostToken });
+          return;
+        }
+        const scores = new Map(playerBoard);
+        const removed = new Set(data.removed || []);
+        let names = playerBoard.map(([name]) => name).filter((name) => !removed.has(name));
+        (data.added || []).forEach(([name, score]) => {
+          names.push(name);
+          scores.set(name, score);
+        });
+        (data.scores || []).forEach(([name, score]) => scores.set(name, score));
+        if (data.order) {
+          names = data.order.slice();
         } else {
-          const rankHtml = rankLabel ? `${rankLabel}${isWinning ? ' 👑' : ''}` : '';
-          scoreEl.innerHTML = `${endScore}`;
-          const nameEl = document.getElementById('my-player-name');
-          if (nameEl) {
-            nameEl.innerHTML = rankLabel ? `${rankHtml}<br>${myUsername}` : myUsername;
-          }
+          names.sort((a, b) => scores.get(b) - scores.get(a));
         }
+        playerBoard = names.map((name) => [name, scores.get(name)]);
+      }
+      playerListSeq = data.seq;
+      if (data.winning_players) lastWinningPlayers = data.winning_players;
+      if (Number.isFinite(data.total_players)) totalPlayers = data.total_players;
+      renderPlayerList();
+    };
 
-        if (!rankLabel) {
-          const nameEl = document.getElementById('my-player-name');
-          if (nameEl) {
-            nameEl.textContent = myUsername;
-          }
-        }
+    onPayload('player_list', applyPlayerList);
+
+    onPayload('player_presence', (data) => {
+      if (data.online) {
+        offlinePlayers.delete(data.username);
+      } else {
+        offlinePlayers.add(data.username);
       }
+      renderPlayerList();
+    });
+
+    onPayload('player_rank', (data) => {
+      if (data.username !== myUsername) return;
+      myRankInfo = data;
+      renderMyStatus();
     });
 
     socket.on('update_joining_players', (names) => {
+        if (!Array.isArray(names)) return;
         const container = document.getElementById('joining-players-container');
         // Filter out self
         const others = names.filter(n => n !== inputUsername.value);
@@ -348,7 +466,7 @@ const socket = io();
     };
 
     // 2. Game Flow: Timer
-    socket.on('timer', (payload) => {
+    onPayload('timer', (payload) => {
       lastTimerEventAt = Date.now();
       const endTime = payload.end_time;
       const durationSeconds = payload.duration;
@@ -360,12 +478,13 @@ const socket = io();
 
 
     // 3. Game Flow: Question
-    socket.on('question', (data) => {
+    onPayload('question', (data) => {
       if (intermissionInterval) clearInterval(intermissionInterval);
       playerAnswered = false;
       current_question_index = data.index;
       document.getElementById('scoreboard').classList.add('hidden');
       document.getElementById('btn-start').classList.add('hidden');
+      document.getElementById('game-setup').classList.add('hidden');
       document.getElementById('btn-next').classList.add('hidden');
 
       const questionReceivedAt = Date.now();
@@ -378,6 +497,7 @@ const socket = io();
       
       // Spectator View
       document.getElementById('spectator-question').innerHTML = data.question;
+      showQuestionMeta('spectator-meta', data);
       const spectatorIq = document.getElementById('spectator-iq');
       if (spectatorIq) {
         const label = formatChallengeLabel(data.iq);
@@ -408,6 +528,7 @@ const socket = io();
       // Player View
       if (isPlayer) {
         document.getElementById('player-question-text').innerHTML = data.question;
+        showQuestionMeta('player-meta', data);
         const playerIq = document.getElementById('player-iq');
         if (playerIq) {
           const label = formatChallengeLabel(data.iq);
@@ -429,7 +550,12 @@ const socket = io();
           btn.appendChild(span);
           btn.onclick = () => {
             if (playerAnswered) return;
-            socket.emit('answer', { username: myUsername, answer_index: idx });
+            socket.emit('answer', {
+              username: myUsername,
+              answer_index: idx,
+              host_token: hostToken,
+              client_ts: Date.now(),
+            });
             document.querySelectorAll('.answer-btn').forEach(b => {
               b.disabled = true;
               b.classList.add('dimmed');
@@ -445,7 +571,7 @@ const socket = io();
 
 
     // 4. Game Flow: Results
-    socket.on('round_results', (data) => {
+    onPayload('round_results', (data) => {
       document.getElementById('scoreboard').classList.remove('hidden');
       if (timerInterval) clearInterval(timerInterval);
       if (intermissionInterval) clearInterval(intermissionInterval);
@@ -463,7 +589,7 @@ const socket = io();
       // Show next button when results are displayed
       const btnNext = document.getElementById('btn-next');
       btnNext.classList.remove('hidden');
-      btnNext.onclick = () => socket.emit('next_question', current_question_index + 1);
+      btnNext.onclick = () => socket.emit('next_question', { index: current_question_index + 1, host_token: hostToken });
       const playerCountdown = document.getElementById('player-next-countdown');
       if (playerCountdown) playerCountdown.classList.remove('hidden');
       
@@ -537,10 +663,12 @@ const socket = io();
       for (const [name, result] of Object.entries(data.player_answers || {})) {
         lastRoundByPlayer[name] = !!result.is_correct;
       }
+      renderPlayerList();
     });
 
     socket.on('game_started', () => {
       document.getElementById('btn-start').classList.add('hidden');
+      document.getElementById('game-setup').classList.add('hidden');
       document.getElementById('btn-next').classList.add('hidden');
       lastRoundByPlayer = {};
       document.getElementById('scoreboard').classList.add('hidden');
@@ -555,6 +683,7 @@ const socket = io();
        if (timerInterval) clearInterval(timerInterval);
        document.getElementById('btn-next').classList.add('hidden');
        document.getElementById('btn-start').classList.remove('hidden');
+       document.getElementById('game-setup').classList.remove('hidden');
        setTimerDisplay(0);
        setRingProgress('spectator-ring', specRingLength, 0);
        setRingProgress('player-ring', playerRingLength, 0);
@@ -585,11 +714,13 @@ const socket = io();
       document.getElementById('spectator-question').textContent = "Waiting for game to start...";
       const spectatorIq = document.getElementById('spectator-iq');
       if (spectatorIq) spectatorIq.classList.add('hidden');
+      document.getElementById('spectator-meta').classList.add('hidden');
       document.getElementById('spectator-answers').innerHTML = "";
       setTimerDisplay(0);
       document.getElementById('player-question-text').textContent = "Waiting for game to start...";
       const playerIq = document.getElementById('player-iq');
       if (playerIq) playerIq.classList.add('hidden');
+      document.getElementById('player-meta').classList.add('hidden');
       document.getElementById('player-buttons').innerHTML = "";
       setTimerDisplay(0);
       setRingProgress('spectator-ring', specRingLength, 0);
@@ -603,10 +734,21 @@ const socket = io();
     });
 
     socket.on('connect', () => {
+      playerListSeq = null;
+      offlinePlayers.clear();
       requestTimeSync();
     });
 
-    socket.on('gamestate', (data) => {
+    // The server sends a round transition as one frame of [event, payload]
+    // pairs; replay them through the normal handlers in order.
+    socket.on('batch', (events) => {
+      if (!Array.isArray(events)) return;
+      events.forEach(([name, payload]) => {
+        socket.listeners(name).forEach((handler) => handler(payload));
+      });
+    });
+
+    onPayload('gamestate', (data) => {
       const state = data && data.state;
       if (!state) return;
       document.body.dataset.gamestate = state;
@@ -633,7 +775,15 @@ const socket = io();
       }
     });
 
-    socket.on('error', (err) => setJoinStatus(err.message || 'Connection error', true));
+    // Answer straight away: the server times the round trip itself.
+    socket.on('clock_probe', (data) => {
+      socket.emit('clock_reply', { id: data && data.id, client_ts: Date.now() });
+    });
+
+    socket.on('error', (err) => {
+      setJoinStatus(err.message || 'Connection error', true);
+      document.getElementById('game-setup-status').textContent = err.message || '';
+    });
 
     // --- QR Toggle ---
     const qrContainer = document.getElementById('qr-container');
@@ -653,10 +803,38 @@ const socket = io();
 
 
     // --- Spectator BUTTONS ---
-    document.getElementById('btn-start').onclick = () => socket.emit('start_game');
-    document.getElementById('btn-next').onclick = () => socket.emit('next_question', current_question_index + 1);
+    const numberInput = (id) => {
+      const value = parseInt(document.getElementById(id).value, 10);
+      return Number.isFinite(value) ? value : null;
+    };
+    document.getElementById('btn-start').onclick = () => {
+      const category = document.getElementById('game-category').value;
+      document.getElementById('game-setup-status').textContent = '';
+      socket.emit('start_game', {
+        host_token: hostToken,
+        categories: category ? [category] : null,
+        difficulty: document.getElementById('game-difficulty').value || null,
+        iq_min: numberInput('game-iq-min'),
+        iq_max: numberInput('game-iq-max'),
+        count: numberInput('game-count'),
+      });
+    };
+    fetch('/api/questions/categories')
+      .then((response) => response.json())
+      .then((categories) => {
+        const select = document.getElementById('game-category');
+        categories.forEach(({ category, questions }) => {
+          if (!category) return;
+          const option = document.createElement('option');
+          option.value = category;
+          option.textContent = `${category} (${questions})`;
+          select.appendChild(option);
+        });
+      })
+      .catch(() => {});
+    document.getElementById('btn-next').onclick = () => socket.emit('next_question', { index: current_question_index + 1, host_token: hostToken });
     document.getElementById('btn-restart').onclick = () => {
-      socket.emit('reset_all');
+      socket.emit('reset_all', { host_token: hostToken });
     };
     const btnConfetti = document.getElementById('btn-confetti');
     if (btnConfetti) {
@@ -671,7 +849,7 @@ const socket = io();
       });
     });
     if (btnNewGame) {
-      btnNewGame.onclick = () => socket.emit('reset_all');
+      btnNewGame.onclick = () => socket.emit('reset_all', { host_token: hostToken });
     }
 
     const setRingProgress = (ringId, length, ratio) => {
@@ -0,0 +1,168 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# app opens its game history, question stats and logs when it is imported,
+# which happens while test modules are collected and before any fixture
+# runs, so point them at a scratch directory here rather than in a fixture.
+SCRATCH = tempfile.mkdtemp(prefix="quiz-tests-")
+os.environ["GAME_HISTORY_PATH"] = os.path.join(SCRATCH, "game_history.sqlite3")
+os.environ["QUESTIONS_LOG"] = os.path.join(SCRATCH, "questions_asked.jsonl")
+os.environ["SNAPSHOT_DIR"] = os.path.join(SCRATCH, "snapshots")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _scratch_files():
+    yield SCRATCH
+    app = sys.modules.get("app")
+    if app is not None:
+        # Write out what is queued now rather than at exit, after the
+        # directory is gone.
+        for writer in (app.question_stats, app.game_history, app.question_history):
+            writer.close()
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+class DummyTimer:
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.started = False
+        self.canceled = False
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.canceled = True
+
+
+class DummyScheduler:
+    def call_later(self, delay, callback, *args):
+        timer = DummyTimer(delay, callback, *args)
+        timer.start()
+        return timer
+
+    call_every = call_later
+
+
+class RecordingScheduler(DummyScheduler):
+    def __init__(self):
+        self.timers = []
+
+    def call_later(self, delay, callback, *args):
+        timer = super().call_later(delay, callback, *args)
+        self.timers.append(timer)
+        return timer
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, event, payload=None, to=None):
+        self.sent.append((event, payload, to))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler():
+    return DummyScheduler()
+
+
+@pytest.fixture
+def dummy_timer():
+    return DummyTimer
+
+
+@pytest.fixture
+def recording_scheduler():
+    return RecordingScheduler
+
+
+@pytest.fixture
+def recording_socketio():
+    return RecordingSocketIO
+
+
+@pytest.fixture
+def dummy_scheduler(monkeypatch, scheduler):
+    # Timers the app starts never fire.
+    import app
+    monkeypatch.setattr(app.scheduler, "call_later", scheduler.call_later)
+    monkeypatch.setattr(app.scheduler, "call_every", scheduler.call_every)
+    return scheduler
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    # The dummy scheduler never runs deferred flushes.
+    import app
+    monkeypatch.setattr(app, "BROADCAST_MIN_INTERVAL", 0)
+    for room in list(app.rooms.rooms.values()):
+        monkeypatch.setattr(room.broadcaster, "min_interval", 0)
+
+
+@pytest.fixture
+def unbatch():
+    import payloads
+
+    def unbatch(event, payload):
+        if event == "batch":
+            return [(name, payloads.decode(name, data)) for name, data in payload]
+        return [(event, payloads.decode(event, payload))]
+    return unbatch
+
+
+@pytest.fixture
+def reset_room():
+    import app
+
+    def reset_room():
+        room = app.rooms.get_or_create(app.DEFAULT_ROOM)
+        room.broadcaster.min_interval = 0
+        room.reset_all()
+        return room
+    return reset_room
+
+
+@pytest.fixture
+def connect():
+    import app
+
+    def connect(room_name):
+        return app.socketio.test_client(app.app, query_string=f"room={room_name}")
+    return connect
+
+
+@pytest.fixture
+def received(unbatch):
+    def received(client):
+        return [
+            (name, data)
+            for msg in client.get_received()
+            for name, data in unbatch(msg["name"], msg["args"][0] if msg["args"] else None)
+        ]
+    return received
+
+
+@pytest.fixture
+def events(received):
+    def events(client, name):
+        return [data for event, data in received(client) if event == name]
+    return events
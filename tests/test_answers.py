@@ -0,0 +1,124 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+
+PLAYERS = 500
+CLIENTS = 8
+
+
+def _open_round(room, players=PLAYERS):
+    room.state["players"] = {
+        f"p{i}": {"score": 0, "sid": f"sid{i}", "ip": "127.0.0.1"}
+        for i in range(players)
+    }
+    room.state["current_question_index"] = 0
+    room.state["current_question"] = {
+        "question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
+    room.state["end_time"] = time.time() + 60
+
+
+@pytest.fixture
+def room_with_open_round(monkeypatch, dummy_scheduler, reset_room, unbatch):
+    results = []
+
+    def fake_emit(event, payload=None, **_kwargs):
+        for name, data in unbatch(event, payload):
+            if name == "round_results":
+                results.append(data)
+
+    monkeypatch.setattr(app_module.socketio, "emit", fake_emit)
+    room = reset_room()
+    _open_round(room, players=2)
+    return room, results
+
+
+def test_duplicate_answers_count_once(room_with_open_round):
+    room, results = room_with_open_round
+
+    assert room.record_answer("sid0", "p0", 0) is True
+    assert room.record_answer("sid0-other-tab", "p0", 1) is False
+
+    assert room.state["answered_count"] == 1
+    assert room.state["current_answers"]["p0"]["answer_index"] == 0
+    assert results == []
+
+
+def test_answers_after_round_closed_are_ignored(room_with_open_round):
+    room, results = room_with_open_round
+    room.process_answers()
+
+    assert room.record_answer("sid0", "p0", 0) is False
+    assert room.state["current_answers"] == {}
+    assert len(results) == 1
+
+
+def test_concurrent_answer_burst_scores_each_player_once(monkeypatch, capsys, dummy_scheduler,
+                                                         no_rate_limit, reset_room, connect,
+                                                         events):
+    room = reset_room()
+    clients = [connect(room.name) for _ in range(CLIENTS)]
+    _open_round(room)
+    token = room.state["host_token"]
+    for client in clients:
+        client.get_received()
+    counted = []
+    record_answer = room.record_answer
+
+    def counting(sid, username, *args, **kwargs):
+        accepted = record_answer(sid, username, *args, **kwargs)
+        if accepted:
+            counted.append(username)
+        return accepted
+
+    monkeypatch.setattr(room, "record_answer", counting)
+    start = threading.Barrier(CLIENTS + 1)
+
+    def answer_all(n):
+        start.wait()
+        # Every client answers for every player, so each answer is raced
+        # by seven duplicates plus the question deadline below.
+        for i in range(PLAYERS):
+            i = (i + n) % PLAYERS
+            clients[n].emit("answer", {"host_token": token, "username": f"p{i}",
+                                       "answer_index": i % 2})
+
+    def deadline():
+        # Close the round once the burst is under way, not before it.
+        start.wait()
+        give_up = time.monotonic() + 10
+        while room.state["answered_count"] < PLAYERS // 4 and time.monotonic() < give_up:
+            time.sleep(0.0005)
+        room.on_question_deadline(0)
+
+    workers = [threading.Thread(target=answer_all, args=(n,)) for n in range(CLIENTS)]
+    workers.append(threading.Thread(target=deadline))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    capsys.readouterr()
+
+    # The round ended once, for every client.
+    results = [events(client, "round_results") for client in clients]
+    assert all(len(received) == 1 for received in results)
+    answered = results[0][0]["player_answers"]
+    assert all(received[0]["player_answers"] == answered for received in results)
+    assert len(answered) >= PLAYERS // 4
+    assert sorted(counted) == sorted(answered)
+    for name, player in room.state["players"].items():
+        if name in answered and answered[name]["is_correct"]:
+            # One scoring is 100 plus a speed bonus; two would be 200+.
+            assert 100 <= player["score"] <= 160
+        else:
+            assert player["score"] == 0
+    for client in clients:
+        client.disconnect()
@@ -1,3 +1,4 @@
+import random
 import sys
 from pathlib import Path
 
@@ -6,71 +7,58 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import app as app_module
+import payloads
 
 
-class DummyTimer:
-    def __init__(self, *args, **kwargs):
-        self.args = args
-        self.kwargs = kwargs
-        self.started = False
-        self.canceled = False
+def test_reset_all_initializes_game_state_and_questions(monkeypatch, reset_room):
+    monkeypatch.setattr(random, "shuffle", lambda seq: None)
 
-    def start(self):
-        self.started = True
+    room = reset_room()
 
-    def cancel(self):
-        self.canceled = True
-
-
-def test_reset_all_initializes_game_state_and_questions(monkeypatch):
-    monkeypatch.setattr(app_module.random, "shuffle", lambda seq: None)
-
-    app_module.reset_all()
-
-    game_state = app_module.game_state
+    game_state = room.state
     assert game_state["players"] == {}
     assert game_state["current_question_index"] == -1
     assert game_state["current_answers"] == {}
-    assert len(app_module.questions) == 5
+    assert len(room.questions) == 5
 
-    for question in app_module.questions:
+    for question in room.questions:
         assert 0 <= question["correct"] < len(question["answers"])
 
 
-def test_is_game_started_false_when_no_current_question(monkeypatch):
-    monkeypatch.setattr(app_module.random, "shuffle", lambda seq: None)
-    app_module.reset_all()
+def test_is_game_started_false_when_no_current_question(monkeypatch, reset_room):
+    monkeypatch.setattr(random, "shuffle", lambda seq: None)
+    room = reset_room()
 
-    assert app_module.is_game_started() is False
+    assert room.is_game_started() is False
 
 
-def test_is_game_started_true_when_index_in_range(monkeypatch):
-    monkeypatch.setattr(app_module.random, "shuffle", lambda seq: None)
-    app_module.reset_all()
+def test_is_game_started_true_when_index_in_range(monkeypatch, reset_room):
+    monkeypatch.setattr(random, "shuffle", lambda seq: None)
+    room = reset_room()
 
-    app_module.game_state["current_question_index"] = 0
-    assert app_module.is_game_started() is True
+    room.state["current_question_index"] = 0
+    assert room.is_game_started() is True
 
 
-def test_stop_timer_thread_cancels_existing_timer(monkeypatch):
-    app_module.reset_all()
-    timer = DummyTimer()
-    app_module.game_state["timer_thread"] = timer
+def test_stop_timer_thread_cancels_existing_timer(monkeypatch, reset_room, dummy_timer):
+    room = reset_room()
+    timer = dummy_timer()
+    room.state["timer_thread"] = timer
 
-    app_module.stop_timer_thread()
+    room.stop_timer_thread()
 
     assert timer.canceled is True
-    assert app_module.game_state["timer_thread"] is None
+    assert room.state["timer_thread"] is None
 
 
-def test_add_scores_for_correct_answers_sets_intermission_and_scores(monkeypatch):
+def test_add_scores_for_correct_answers_sets_intermission_and_scores(monkeypatch, reset_room):
     monkeypatch.setattr(app_module.time, "time", lambda: 1000.0)
 
-    app_module.reset_all()
-    app_module.questions = [
+    room = reset_room()
+    room.questions = [
         {"question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
     ]
-    game_state = app_module.game_state
+    game_state = room.state
     game_state["current_question_index"] = 0
     game_state["end_time"] = 1030.0
     game_state["players"] = {
@@ -80,21 +68,21 @@ def test_add_scores_for_correct_answers_sets_intermission_and_scores(monkeypatch
         "sid1": {"username": "p1", "answer_index": 0, "time": 1000.0}
     }
 
-    app_module.add_scores_for_correct_answers()
+    room.add_scores_for_correct_answers()
 
     assert game_state["players"]["p1"]["score"] == 130
     assert game_state["intermission_duration"] == 5
 
 
-def test_process_answers_marks_processed_and_starts_intermission(monkeypatch):
-    monkeypatch.setattr(app_module.threading, "Timer", DummyTimer)
+def test_process_answers_marks_processed_and_starts_intermission(monkeypatch, dummy_scheduler,
+                                                                 reset_room, dummy_timer):
     monkeypatch.setattr(app_module.time, "time", lambda: 1000.0)
 
-    app_module.reset_all()
-    app_module.questions = [
+    room = reset_room()
+    room.questions = [
         {"question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
     ]
-    game_state = app_module.game_state
+    game_state = room.state
     game_state["current_question_index"] = 0
     game_state["end_time"] = 1030.0
     game_state["players"] = {
@@ -105,73 +93,75 @@ def test_process_answers_marks_processed_and_starts_intermission(monkeypatch):
         "sid1": {"username": "p1", "answer_index": 0, "time": 1000.0},
         "sid2": {"username": "p2", "answer_index": 1, "time": 1000.0},
     }
-    game_state["timer_thread"] = DummyTimer()
+    game_state["timer_thread"] = dummy_timer()
 
-    app_module.process_answers()
+    room.process_answers()
 
     assert game_state["answers_processed"] is True
     assert game_state["current_answers"] == {}
     assert game_state["intermission_active"] is True
-    assert isinstance(game_state["intermission_timer_thread"], DummyTimer)
+    assert isinstance(game_state["intermission_timer_thread"], dummy_timer)
     assert game_state["intermission_timer_thread"].started is True
 
 
-def test_resolve_scores_orders_and_returns_winners(monkeypatch):
-    app_module.reset_all()
-    app_module.game_state["players"] = {
+def test_resolve_scores_orders_and_returns_winners(monkeypatch, reset_room):
+    room = reset_room()
+    room.state["players"] = {
         "p1": {"score": 50, "sid": "sid1", "ip": "127.0.0.1"},
         "p2": {"score": 100, "sid": "sid2", "ip": "127.0.0.1"},
         "p3": {"score": 100, "sid": "sid3", "ip": "127.0.0.1"},
     }
 
-    sorted_players, winners = app_module.resolve_scores()
+    sorted_players, winners = room.resolve_scores()
 
     assert [name for name, _ in sorted_players][:2] == ["p2", "p3"]
     assert set(winners) == {"p2", "p3"}
 
 
-def test_send_player_details_emits_sorted_scores(monkeypatch):
+def test_send_player_details_emits_sorted_scores(monkeypatch, reset_room):
     emitted = {}
 
     def fake_emit(event, payload=None, **_kwargs):
-        emitted["event"] = event
-        emitted["payload"] = payload
+        if event == "player_list":
+            emitted["event"] = event
+            emitted["payload"] = payloads.decode(event, payload)
 
     monkeypatch.setattr(app_module.socketio, "emit", fake_emit)
 
-    app_module.reset_all()
-    app_module.game_state["players"] = {
+    room = reset_room()
+    room.state["players"] = {
         "p1": {"score": 10, "sid": "sid1", "ip": "127.0.0.1"},
         "p2": {"score": 20, "sid": "sid2", "ip": "127.0.0.1"},
     }
 
-    app_module.send_player_details()
+    room.send_player_details()
 
     assert emitted["event"] == "player_list"
-    assert list(emitted["payload"]["players"].keys()) == ["p2", "p1"]
+    assert [name for name, _ in emitted["payload"]["added"]] == ["p2", "p1"]
 
 
-def test_reset_game_zeroes_scores_and_sets_questions(monkeypatch):
-    monkeypatch.setattr(app_module.random, "shuffle", lambda seq: None)
+def test_reset_game_zeroes_scores_and_sets_questions(monkeypatch, reset_room):
+    monkeypatch.setattr(random, "shuffle", lambda seq: None)
 
-    app_module.reset_all()
-    app_module.game_state["players"] = {
+    room = reset_room()
+    room.state["players"] = {
         "p1": {"score": 10, "sid": "sid1", "ip": "127.0.0.1"},
         "p2": {"score": 5, "sid": "sid2", "ip": "127.0.0.1"},
     }
 
-    app_module.reset_game()
+    room.reset_game()
 
-    assert app_module.game_state["current_question_index"] == -1
-    assert app_module.game_state["current_answers"] == {}
-    assert app_module.game_state["players"]["p1"]["score"] == 0
-    assert app_module.game_state["players"]["p2"]["score"] == 0
-    assert len(app_module.questions) == 5
+    assert room.state["current_question_index"] == -1
+    assert room.state["current_answers"] == {}
+    assert room.state["players"]["p1"]["score"] == 0
+    assert room.state["players"]["p2"]["score"] == 0
+    assert len(room.questions) == 5
 
-def test_join_adds_player_and_registers_player(monkeypatch):
-    monkeypatch.setattr(app_module.random, "shuffle", lambda seq: None)
 
-    app_module.reset_all()
+def test_join_adds_player_and_registers_player(monkeypatch, reset_room):
+    monkeypatch.setattr(random, "shuffle", lambda seq: None)
+
+    room = reset_room()
 
     class DummyRequest:
         remote_addr = "127.0.0.1"
@@ -181,16 +171,16 @@ def test_join_adds_player_and_registers_player(monkeypatch):
     monkeypatch.setattr(app_module, "join_room", lambda _room: None)
     monkeypatch.setattr(app_module, "emit", lambda _event, _payload=None: None)
 
-    app_module.game_state["host_token"] = "testtoken"
-    app_module.handle_join({"username": "alice", "host_token": "testtoken"})
-    assert "alice" in app_module.game_state["players"]
+    app_module.handle_join(
+        {"username": "alice", "host_token": room.state["host_token"]})
+    assert "alice" in room.state["players"]
 
 
-def test_answer_scores_points_for_correct_answer(monkeypatch):
+def test_answer_scores_points_for_correct_answer(monkeypatch, reset_room):
     monkeypatch.setattr(app_module.time, "time", lambda: 1000.0)
 
-    app_module.reset_all()
-    app_module.questions = [
+    room = reset_room()
+    room.questions = [
         {
             "question": "Q",
             "answers": ["A", "B", "C", "D"],
@@ -198,7 +188,7 @@ def test_answer_scores_points_for_correct_answer(monkeypatch):
         }
     ]
 
-    game_state = app_module.game_state
+    game_state = room.state
     game_state["current_question_index"] = 0
     game_state["end_time"] = 1030.0
     game_state["players"] = {
@@ -208,17 +198,17 @@ def test_answer_scores_points_for_correct_answer(monkeypatch):
         "sid1": {"username": "alice", "answer_index": 0, "time": 1000.0}
     }
 
-    app_module.add_scores_for_correct_answers()
+    room.add_scores_for_correct_answers()
 
     assert game_state["players"]["alice"]["score"] == 130
 
 
-def test_incorrect_answers_do_not_gain_points_with_three_players(monkeypatch):
+def test_incorrect_answers_do_not_gain_points_with_three_players(monkeypatch, reset_room):
     monkeypatch.setattr(app_module.time, "time", lambda: 1000.0)
 
-    app_module.reset_all()
+    room = reset_room()
 
-    app_module.questions = [
+    room.questions = [
         {
             "question": "Q",
             "answers": ["A", "B", "C", "D"],
@@ -226,7 +216,7 @@ def test_incorrect_answers_do_not_gain_points_with_three_players(monkeypatch):
         }
     ]
 
-    game_state = app_module.game_state
+    game_state = room.state
     game_state["current_question_index"] = 0
     game_state["end_time"] = 1030.0
 
@@ -241,8 +231,35 @@ def test_incorrect_answers_do_not_gain_points_with_three_players(monkeypatch):
         "sid3": {"username": "p3", "answer_index": 2, "time": 1000.0},
     }
 
-    app_module.add_scores_for_correct_answers()
+    room.add_scores_for_correct_answers()
 
     assert game_state["players"]["p1"]["score"] == 130
     assert game_state["players"]["p2"]["score"] == 0
     assert game_state["players"]["p3"]["score"] == 0
+
+
+def test_stale_question_deadline_does_not_end_next_round(dummy_scheduler, reset_room):
+    room = reset_room()
+    room.state["current_question_index"] = 2
+    room.state["current_question"] = {
+        "question": "Q", "answers": ["A", "B"], "correct": 0}
+    room.state["answers_processed"] = False
+
+    room.on_question_deadline(1)
+
+    assert room.state["answers_processed"] is False
+
+
+def test_next_question_does_not_shrink_the_shared_bank(monkeypatch, dummy_scheduler, reset_room):
+    room = reset_room()
+    bank_entry = app_module.question_bank[0]
+    answers = bank_entry.answers
+    monkeypatch.setattr(room, "select_question", lambda: bank_entry)
+    monkeypatch.setattr(room, "log_question", lambda _text: None)
+
+    room.next_question(0)
+    room.next_question(1)
+
+    assert len(room.state["current_question"]["answers"]) == 4
+    assert bank_entry.answers == answers
+    assert len(answers) == 5
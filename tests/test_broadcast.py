@@ -0,0 +1,85 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+from broadcast import Broadcaster
+
+
+def test_batch_sends_one_frame_and_drops_superseded_gamestate(recording_socketio):
+    socketio = recording_socketio()
+    broadcaster = Broadcaster(socketio)
+
+    with broadcaster.batch():
+        broadcaster.emit("gamestate", {"state": "answer"}, "room")
+        broadcaster.emit("round_results", {"a": 1}, "room")
+        broadcaster.emit("gamestate", {"state": "intermission"}, "room")
+        broadcaster.emit("joined", {"username": "p1"}, "sid1")
+
+    assert sorted(to for _, _, to in socketio.sent) == ["room", "sid1"]
+    batch = next(payload for event, payload, to in socketio.sent if to == "room")
+    assert batch == [
+        ["round_results", {"a": 1}],
+        ["gamestate", {"state": "intermission"}],
+    ]
+    assert ("joined", {"username": "p1"}, "sid1") in socketio.sent
+    assert broadcaster.stats() == {"events": 4, "frames": 2, "dropped": 1}
+
+
+def test_flushes_closer_than_min_interval_are_deferred_and_merged(clock, recording_socketio,
+                                                                  recording_scheduler):
+    socketio = recording_socketio()
+    scheduler = recording_scheduler()
+    broadcaster = Broadcaster(socketio, scheduler, min_interval=0.1, clock=clock)
+
+    broadcaster.emit("player_joined", {"username": "p1"}, "room")
+    clock.now += 0.01
+    broadcaster.emit("player_joined", {"username": "p2"}, "room")
+    broadcaster.emit("player_joined", {"username": "p3"}, "room")
+
+    assert len(socketio.sent) == 1
+    assert len(scheduler.timers) == 1
+    delay, callback, target = scheduler.timers[0].args
+    assert abs(delay - 0.09) < 1e-9
+
+    clock.now += 0.09
+    callback(target)
+
+    assert socketio.sent[1] == ("batch", [
+        ["player_joined", {"username": "p2"}],
+        ["player_joined", {"username": "p3"}],
+    ], "room")
+
+
+def test_process_answers_reaches_the_room_as_a_single_frame(monkeypatch, dummy_scheduler,
+                                                            reset_room):
+    sent = []
+    monkeypatch.setattr(
+        app_module.socketio, "emit",
+        lambda event, payload=None, **kwargs: sent.append((event, payload, kwargs.get("to"))))
+    room = reset_room()
+    room.state["players"] = {
+        "p1": {"score": 0, "sid": "sid1", "ip": "127.0.0.1"},
+        "p2": {"score": 0, "sid": "sid2", "ip": "127.0.0.1"},
+    }
+    room.state["current_question_index"] = 0
+    room.state["current_question"] = {
+        "question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
+    room.state["end_time"] = time.time() + 60
+    room.record_answer("sid1", "p1", 0)
+    sent.clear()
+
+    room.record_answer("sid2", "p2", 1)
+
+    to_room = [(event, payload) for event, payload, to in sent if to == room.name]
+    assert len(to_room) == 1
+    event, payload = to_room[0]
+    assert event == "batch"
+    names = [name for name, _ in payload]
+    assert "round_results" in names
+    assert "player_list" in names
+    assert names.count("gamestate") == 1
@@ -0,0 +1,167 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+from clock_sync import MAX_ANSWER_CREDIT, ClockSync
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.probes = []
+
+    def emit(self, event, payload=None, to=None):
+        if event == "clock_probe":
+            self.probes.append((to, payload))
+
+
+def _exchange(sync, socketio, clock, sid, rtt, client_behind):
+    # The client clock runs `client_behind` seconds behind the server.
+    to, probe = socketio.probes[-1]
+    assert to == sid
+    clock.now += rtt / 2
+    client_ts = (clock.now - client_behind) * 1000
+    clock.now += rtt / 2
+    return sync.reply(sid, probe["id"], client_ts)
+
+
+def _synced(clock, rtts, client_behind=5.0):
+    socketio = FakeSocketIO()
+    sync = ClockSync(socketio, wall_clock=clock)
+    sync.add("sid1")
+    for rtt in rtts:
+        # Replies during warm-up trigger the next probe themselves.
+        _exchange(sync, socketio, clock, "sid1", rtt, client_behind)
+    return sync
+
+
+def test_offset_and_rtt_are_measured_per_client(clock):
+    sync = _synced(clock, [0.1, 0.1, 0.1, 0.1])
+
+    info = sync.get("sid1")
+    assert abs(info["offset_ms"] - 5000) < 1e-6
+    assert abs(info["rtt_ms"] - 100) < 1e-6
+    assert info["samples"] == 4
+    assert sync.get("unknown") is None
+
+
+def test_offset_comes_from_the_fastest_recent_exchange(clock):
+    socketio = FakeSocketIO()
+    sync = ClockSync(socketio, wall_clock=clock)
+    sync.add("sid1")
+    _exchange(sync, socketio, clock, "sid1", 0.02, 5.0)
+    # A slow, lopsided exchange: the reply sat in a queue for 0.5s.
+    sync.probe("sid1")
+    to, probe = socketio.probes[-1]
+    clock.now += 0.01
+    client_ts = (clock.now - 5.0) * 1000
+    clock.now += 0.5
+    sync.reply("sid1", probe["id"], client_ts)
+
+    assert abs(sync.get("sid1")["offset_ms"] - 5000) < 1e-6
+    assert sync.get("sid1")["rtt_ms"] > 20
+
+
+def test_stale_and_unknown_probes_are_ignored(clock):
+    socketio = FakeSocketIO()
+    sync = ClockSync(socketio, wall_clock=clock)
+    sync.add("sid1")
+    _, probe = socketio.probes[-1]
+
+    assert sync.reply("sid1", 999, 1.0) is None
+    assert sync.reply("sid1", probe["id"], "soon") is None
+    assert sync.reply("sid2", probe["id"], 1.0) is None
+    assert sync.get("sid1") is None
+
+
+def test_answer_time_corrects_and_bounds_client_timestamps(clock):
+    sync = _synced(clock, [0.2, 0.2, 0.2, 0.2])
+    received = clock.now
+    client_now_ms = (received - 5.0) * 1000
+
+    # Sent 0.1s before it arrived (half the round trip).
+    answered = sync.answer_time("sid1", client_now_ms - 100, received)
+    assert abs(answered - (received - 0.1)) < 1e-6
+    # A clock claiming a much earlier answer only gets the link's credit.
+    early = sync.answer_time("sid1", client_now_ms - 60_000, received)
+    assert received - MAX_ANSWER_CREDIT <= early < received
+    # Answers from the future count from when they arrived.
+    assert sync.answer_time("sid1", client_now_ms + 60_000, received) == received
+    # Unsynced sockets fall back to the receive time.
+    assert sync.answer_time("other", client_now_ms, received) == received
+    stats = sync.stats()
+    assert stats["answers_clamped"] == 2
+    assert stats["synced"] == 1
+    assert abs(stats["rtt_p50_ms"] - 200) < 1e-6
+
+
+def test_slow_link_answer_keeps_its_speed_bonus(dummy_scheduler, reset_room):
+    room = reset_room()
+    room.state["players"] = {
+        "slow": {"score": 0, "sid": "sid1", "ip": "127.0.0.1"},
+        "other": {"score": 0, "sid": "sid2", "ip": "127.0.0.1"},
+    }
+    room.state["current_question_index"] = 0
+    room.state["current_question"] = {
+        "question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
+    room.state["duration"] = 25
+    room.state["end_time"] = time.time() + 20
+
+    answered_at = room.state["end_time"] - 10.4
+    assert room.record_answer("sid1", "slow", 0, answered_at=answered_at)
+    room.process_answers()
+
+    assert room.state["players"]["slow"]["score"] == 110
+
+
+def test_clocks_are_probed_on_join_and_again_only_while_a_question_is_live(clock, scheduler):
+    socketio = FakeSocketIO()
+    live = [False]
+    sync = ClockSync(socketio, scheduler, wall_clock=clock, live=lambda: live[0])
+
+    sync.add("sid1")
+    assert len(socketio.probes) == 1 and sync.probe_timer is None
+
+    live[0] = True
+    sync.wake()
+    timer = sync.probe_timer
+    sync.wake()
+    assert sync.probe_timer is timer
+    sync.probe_all()
+    assert len(socketio.probes) == 2
+
+    live[0] = False
+    sync.probe_all()
+    assert len(socketio.probes) == 2
+    assert timer.canceled and sync.probe_timer is None
+
+
+def test_clients_answer_probes_over_the_socket(dummy_scheduler, no_rate_limit, connect, events):
+    host = connect("clocks")
+    token = events(host, "host_session")[-1]["token"]
+    client = connect("clocks")
+    assert events(client, "clock_probe") == []
+
+    client.emit("join", {"username": "alice", "host_token": token})
+    probes = events(client, "clock_probe")
+    assert probes
+    client.emit("clock_reply", {"id": probes[-1]["id"], "client_ts": time.time() * 1000})
+
+    assert app_module.clock_sync.stats()["synced"] >= 1
+    client.disconnect()
+    host.disconnect()
+
+
+def test_a_question_going_live_restarts_the_probes(monkeypatch, dummy_scheduler, reset_room):
+    monkeypatch.setattr(app_module.clock_sync, "probe_timer", None)
+    room = reset_room()
+    assert not room.question_live()
+
+    room.start_game()
+
+    assert room.question_live() and app_module.clock_sync.live()
+    assert app_module.clock_sync.probe_timer is not None
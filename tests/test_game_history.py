@@ -0,0 +1,197 @@
+import contextlib
+import datetime
+import io
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_history import (DAY, EPOCH, RANGE_TOTALS, SCHEMA, GameHistory,
+                          covering_period, range_leaders, range_periods)
+from game_room import GameRoom
+from question_bank import Question
+
+
+@pytest.fixture
+def make_room(recording_socketio, recording_scheduler):
+    def make_room(history, questions):
+        remaining = iter(questions)
+        return GameRoom(
+            "main", recording_socketio(), recording_scheduler(),
+            select_question=lambda: next(remaining, None),
+            log_question=lambda _text: None,
+            question_pool=list(questions),
+            history=history)
+    return make_room
+
+
+def _play(room):
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.load_or_reset()
+        for name in ("alice", "bob"):
+            room.join(name, f"sid-{name}", "10.0.0.1")
+        room.start_game()
+        for index in range(2):
+            correct = room.state["current_question"]["correct"]
+            room.record_answer("sid-alice", "alice", correct)
+            room.record_answer("sid-bob", "bob", (correct + index) % 4)
+            room.next_question(index + 1)
+
+
+def test_a_played_game_is_queryable_by_player_question_and_day(tmp_path, make_room):
+    history = GameHistory(str(tmp_path / "history.sqlite3"))
+    questions = [Question("Largest planet?", ("Jupiter", "Mars", "Venus", "Earth"), 0),
+                 Question("Smallest planet?", ("Mercury", "Mars", "Venus", "Earth"), 0)]
+    room = make_room(history, questions)
+    _play(room)
+    assert history.flush(timeout=5)
+
+    alice = history.player_history("alice")
+    assert alice["answers"] == 2 and alice["correct"] == 2
+    assert alice["games"][0]["rank"] == 1
+    assert alice["games"][0]["score"] == room.state["players"]["alice"]["score"]
+    bob = history.player_history("bob")
+    assert bob["answers"] == 2 and bob["correct"] == 1
+    assert bob["games"][0]["rank"] == 2
+
+    largest = history.question_stats("Largest planet?")
+    assert largest["answers"] == 2 and largest["accuracy"] == 1.0
+    assert history.question_stats("Smallest planet?")["accuracy"] == 0.5
+    assert history.question_stats("Unasked?")["answers"] == 0
+
+    board = history.leaderboard()
+    assert [row["player"] for row in board] == ["alice", "bob"]
+    for period in ("day", "week", "month", "year"):
+        assert history.leaderboard(period=period) == board
+    ended_at = alice["games"][0]["ended_at"]
+    assert history.leaderboard(since=ended_at - DAY, until=ended_at) == board
+    assert history.leaderboard(since=ended_at + DAY) == []
+    assert history.stats()["written"] == history.stats()["enqueued"]
+    history.close()
+
+
+def test_a_restart_or_reset_mid_game_records_one_game_once(tmp_path, make_room):
+    history = GameHistory(str(tmp_path / "history.sqlite3"))
+    room = make_room(history, [Question("Q?", ("A", "B", "C", "D"), 0)] * 3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.load_or_reset()
+        room.join("alice", "sid-alice", "10.0.0.1")
+        room.start_game()
+        room.start_game()
+        room.reset_game()
+        room.reset_game()
+    history.close()
+
+    conn = sqlite3.connect(tmp_path / "history.sqlite3")
+    assert conn.execute("SELECT COUNT(*) FROM games").fetchone() == (1,)
+    assert conn.execute("SELECT COUNT(*) FROM games WHERE ended_at IS NOT NULL").fetchone() == (1,)
+    assert conn.execute("SELECT games FROM period_scores WHERE player = 'alice' AND period = 'all'").fetchone() == (1,)
+
+
+def test_history_queries_use_covering_indexes(tmp_path):
+    history = GameHistory(str(tmp_path / "history.sqlite3"))
+    history.player_history("alice")
+    conn = sqlite3.connect(tmp_path / "history.sqlite3")
+
+    def plan(sql, *args):
+        return " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, args))
+
+    assert "COVERING INDEX answers_by_player" in plan(
+        "SELECT COUNT(*), SUM(correct), AVG(latency), SUM(points) FROM answers WHERE player = ?",
+        "alice")
+    assert "COVERING INDEX answers_by_question" in plan(
+        "SELECT COUNT(*), SUM(a.correct), AVG(a.latency) FROM questions q "
+        "JOIN answers a ON a.question_id = q.id WHERE q.text = ?", "Q?")
+    assert "COVERING INDEX period_scores_by_score" in plan(
+        "SELECT player, score, games FROM period_scores WHERE period = ? "
+        "ORDER BY score DESC, player LIMIT 20", "all")
+
+
+def test_a_date_range_reads_whole_months_and_weeks_where_it_can():
+    def day(*date):
+        return (datetime.date(*date) - EPOCH).days
+
+    assert range_periods(day(2025, 1, 30), day(2025, 3, 11)) == [
+        "day:020118", "day:020119", "month:2025-02",
+        "day:020148", "day:020149", "week:02879", "day:020157", "day:020158"]
+    assert range_periods(day(2025, 3, 3), day(2025, 3, 9)) == ["week:02879"]
+    assert range_periods(day(2025, 3, 9), day(2025, 3, 8)) == []
+    assert range_periods(day(2023, 12, 30), day(2025, 2, 3)) == [
+        "day:019721", "day:019722", "year:2024", "month:2025-01",
+        "day:020120", "day:020121", "day:020122"]
+    assert covering_period(day(2025, 3, 3), day(2025, 3, 9)) == "week:02879"
+    assert covering_period(day(2025, 3, 3), day(2025, 3, 10)) == "month:2025-03"
+    assert covering_period(day(2025, 1, 3), day(2025, 3, 10)) == "year:2025"
+    assert covering_period(day(2024, 12, 3), day(2025, 3, 10)) == "all"
+
+
+def test_year_totals_are_built_for_a_history_written_before_them(tmp_path, make_room):
+    path = tmp_path / "history.sqlite3"
+    history = GameHistory(str(path))
+    _play(make_room(history, [Question("Q?", ("A", "B", "C", "D"), 0)] * 2))
+    history.close()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DELETE FROM period_scores WHERE period LIKE 'year:%'")
+        conn.execute("PRAGMA user_version = 0")
+    conn.close()
+
+    history = GameHistory(str(path))
+    assert history.leaderboard(period="year") == history.leaderboard(period="all") != []
+    history = GameHistory(str(path))
+    assert history.leaderboard(period="year") == history.leaderboard(period="all")
+
+
+def test_a_range_leaderboard_only_sums_players_who_can_reach_the_top():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    rng = random.Random(3)
+    keys = ["day:020000", "day:020001", "week:02858", "month:2024-09"]
+    totals = {}
+    for key in keys:
+        for player in rng.sample(range(3000), 1500):
+            score = rng.randrange(0, 5000, 25)
+            totals[player] = totals.get(player, 0) + score
+            conn.execute("INSERT INTO period_scores VALUES (?, ?, ?, ?)",
+                         (key, f"p{player:04d}", score, 1))
+    # Periods holding the range and other games: a few, a few plus players
+    # who lead it without playing in the range at all, and many.
+    for player, total in totals.items():
+        for cover, outside in (("tight", 500), ("leaders", 500), ("loose", 20000)):
+            conn.execute("INSERT INTO period_scores VALUES (?, ?, ?, 1)",
+                         (cover, f"p{player:04d}", total + rng.randrange(outside)))
+    for player in range(3000, 3010):
+        conn.execute("INSERT INTO period_scores VALUES ('leaders', ?, 1000000, 1)",
+                     (f"p{player:04d}",))
+    for count in range(1, len(keys) + 1):
+        for limit in (1, 5, 20, 200):
+            everyone = conn.execute(
+                RANGE_TOTALS % (",".join("?" * count), ""), (*keys[:count], limit)).fetchall()
+            for cover in ("tight", "leaders", "loose"):
+                assert range_leaders(conn, keys[:count], limit, cover) == everyone
+
+
+def test_leaderboard_ranges_are_clamped_and_nan_is_rejected():
+    import app as app_module
+
+    client = app_module.app.test_client()
+    assert client.get("/api/history/leaderboard?since=nan").status_code == 400
+    assert client.get("/api/history/leaderboard?until=inf").status_code == 400
+    for query in ("since=-1e300", "until=-1e300", "since=1e300&until=1e300"):
+        response = client.get(f"/api/history/leaderboard?{query}")
+        assert response.status_code == 200
+        assert isinstance(response.get_json(), list)
+
+
+def test_the_app_under_test_never_writes_the_repo_history():
+    import app as app_module
+
+    for path in (app_module.game_history.path, app_module.question_stats.path,
+                 app_module.QUESTIONS_LOG_PATH):
+        assert Path(path).resolve().parent != ROOT
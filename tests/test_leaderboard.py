@@ -0,0 +1,192 @@
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+import payloads
+from leaderboard import Leaderboard, VersionedView
+
+
+def test_matches_full_sort_after_random_updates():
+    rng = random.Random(5)
+    board = Leaderboard()
+    scores = {}
+    for i in range(200):
+        scores[f"p{i}"] = 0
+        board.add(f"p{i}", 0)
+    for _ in range(1000):
+        name = f"p{rng.randrange(200)}"
+        scores[name] += rng.choice([100, 110, 125])
+        board.set_score(name, scores[name])
+
+    expected = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    assert board.page() == expected
+    for name, score in expected:
+        first_with_score = next(
+            i for i, (_, s) in enumerate(expected) if s == score)
+        assert board.rank(name) == first_with_score + 1
+
+
+def test_ties_share_rank_and_winners():
+    board = Leaderboard()
+    board.add("a", 50)
+    board.add("b", 100)
+    board.add("c", 100)
+    board.add("d", 10)
+
+    assert board.rank("b") == board.rank("c") == 1
+    assert board.rank("a") == 3
+    assert board.winners() == ["b", "c"]
+    board.remove("b")
+    assert board.winners() == ["c"]
+    assert board.top(2) == [("c", 100), ("a", 50)]
+
+
+def test_all_zero_scores_have_no_winners():
+    board = Leaderboard()
+    board.add("a", 0)
+    board.add("b", 0)
+
+    assert board.winners() == []
+
+
+def test_broadcast_sends_top_n_and_each_players_own_rank(monkeypatch, reset_room):
+    sent = []
+    monkeypatch.setattr(
+        app_module.socketio, "emit",
+        lambda event, payload=None, **kwargs: sent.append(
+            (event, payloads.decode(event, payload), kwargs.get("to"))))
+    room = reset_room()
+    room.top_n = 2
+    room.state["players"] = {
+        f"p{i}": {"score": i * 10, "sid": f"sid{i}", "ip": "127.0.0.1"}
+        for i in range(5)
+    }
+    sent.clear()
+
+    room.send_player_details()
+
+    player_list = [payload for event, payload, _ in sent if event == "player_list"]
+    assert len(player_list) == 1
+    assert player_list[0]["added"] == [["p4", 40], ["p3", 30]]
+    assert player_list[0]["winning_players"] == ["p4"]
+    assert player_list[0]["total_players"] == 5
+    ranks = {to: payload["rank"] for event, payload, to in sent if event == "player_rank"}
+    assert ranks == {"sid4": 1, "sid3": 2, "sid2": 3, "sid1": 4, "sid0": 5}
+
+    sent.clear()
+    room.send_player_details()
+    assert sent == []
+
+
+def test_a_join_wave_sends_each_player_their_rank_once(monkeypatch, reset_room, unbatch):
+    sent = []
+    monkeypatch.setattr(
+        app_module.socketio, "emit",
+        lambda event, payload=None, **kwargs: sent.extend(
+            (name, kwargs.get("to")) for name, _ in unbatch(event, payload)))
+    room = reset_room()
+    lookups = []
+    rank = room.leaderboard.rank
+    monkeypatch.setattr(room.leaderboard, "rank", lambda name: lookups.append(name) or rank(name))
+    sids = [f"sid{i}" for i in range(200)]
+
+    for i, sid in enumerate(sids):
+        room.join(f"p{i}", sid, "127.0.0.1")
+
+    assert sorted(to for event, to in sent if event == "player_rank") == sorted(sids)
+    assert len(lookups) == len(sids)
+
+    sent.clear()
+    lookups.clear()
+    room.state["current_question"] = {"question": "Q", "answers": ["A", "B", "C", "D"], "correct": 0}
+    room.state["end_time"] = 10
+    room.state["current_answers"] = {
+        f"sid{i}": {"username": f"p{i}", "answer_index": 0, "time": 0} for i in range(10)}
+    room.add_scores_for_correct_answers()
+
+    ranked = [to for event, to in sent if event == "player_rank"]
+    assert len(ranked) == len(set(ranked)) and set(sids[:10]) <= set(ranked)
+    assert len(lookups) == len(sids)
+
+
+def test_leaderboard_api_pages_through_players(reset_room):
+    room = reset_room()
+    room.state["players"] = {
+        f"p{i}": {"score": i, "sid": None, "ip": "127.0.0.1"} for i in range(10)
+    }
+    client = app_module.app.test_client()
+
+    response = client.get(
+        f"/api/leaderboard?room={room.name}&offset=2&limit=3")
+
+    data = response.get_json()
+    assert data["total"] == 10
+    assert data["players"] == [
+        {"rank": 3, "name": "p7", "score": 7},
+        {"rank": 4, "name": "p6", "score": 6},
+        {"rank": 5, "name": "p5", "score": 5},
+    ]
+    assert client.get("/api/leaderboard?room=nope").status_code == 404
+
+
+def _apply_delta(view, delta):
+    # Python port of applyPlayerList() in static/app.js.
+    scores = dict(view)
+    removed = set(delta.get("removed", []))
+    names = [name for name, _ in view if name not in removed]
+    for name, score in delta.get("added", []):
+        names.append(name)
+        scores[name] = score
+    for name, score in delta.get("scores", []):
+        scores[name] = score
+    if "order" in delta:
+        names = list(delta["order"])
+    else:
+        names.sort(key=lambda name: -scores[name])
+    return [(name, scores[name]) for name in names]
+
+
+def test_deltas_rebuild_the_same_view_as_snapshots():
+    rng = random.Random(11)
+    board = Leaderboard()
+    view = VersionedView()
+    client = []
+    last_seq = 0
+    for step in range(600):
+        action = rng.random()
+        if action < 0.4 or len(board) < 3:
+            board.add(f"p{step}", 0)
+        elif action < 0.5:
+            board.remove(rng.choice(board.names()))
+        else:
+            name = rng.choice(board.names())
+            board.set_score(name, board.score(name) + rng.choice([100, 120]))
+        delta = view.diff(board.top(10), board.winners(limit=10), len(board))
+        if delta is None:
+            continue
+        assert delta["seq"] == last_seq + 1
+        last_seq = delta["seq"]
+        client = _apply_delta(client, delta)
+        assert client == board.top(10)
+
+    snapshot = view.snapshot()
+    assert snapshot["seq"] == last_seq
+    assert [tuple(entry) for entry in snapshot["players"]] == board.top(10)
+
+
+def test_lobby_join_delta_only_carries_the_new_player():
+    view = VersionedView()
+    board = Leaderboard()
+    for i in range(5):
+        board.add(f"p{i}", 0)
+    view.diff(board.top(50), board.winners(limit=50), len(board))
+
+    board.add("late", 0)
+    delta = view.diff(board.top(50), board.winners(limit=50), len(board))
+
+    assert delta == {"added": [["late", 0]], "total_players": 6, "seq": 2}
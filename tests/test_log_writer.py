@@ -0,0 +1,104 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from log_writer import LogWriter
+from question_history import QuestionHistory
+
+
+def _lines(path):
+    if not path.exists():
+        return []
+    return path.read_text().splitlines()
+
+
+def test_lines_are_committed_in_batches(tmp_path):
+    log_path = tmp_path / "log.jsonl"
+    writer = LogWriter(str(log_path), batch_size=100, flush_interval=60, fsync="always")
+
+    for i in range(1000):
+        writer.append(str(i))
+    assert writer.flush(timeout=5)
+
+    assert _lines(log_path) == [str(i) for i in range(1000)]
+    stats = writer.stats()
+    assert stats["written"] == 1000
+    assert stats["queue_depth"] == 0
+    # Group commit: one write and one fsync per batch, not per line.
+    assert stats["batches"] <= 20
+    assert stats["fsyncs"] <= stats["batches"] + 1
+    writer.close()
+
+
+def test_partial_batch_is_written_after_flush_interval(tmp_path):
+    log_path = tmp_path / "log.jsonl"
+    writer = LogWriter(str(log_path), batch_size=1000, flush_interval=0.05, fsync="never")
+
+    writer.append("only")
+    deadline = time.monotonic() + 5
+    while not _lines(log_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert _lines(log_path) == ["only"]
+    writer.close()
+
+
+def test_close_drains_the_queue(tmp_path):
+    log_path = tmp_path / "log.jsonl"
+    writer = LogWriter(str(log_path), batch_size=1000, flush_interval=60)
+
+    for i in range(10):
+        writer.append(str(i))
+    writer.close()
+
+    assert len(_lines(log_path)) == 10
+    assert writer.running is False
+
+
+def test_blocking_file_calls_go_through_offload(tmp_path):
+    log_path = tmp_path / "log.jsonl"
+    offloaded = []
+
+    def offload(fn, *args):
+        offloaded.append(fn.__name__)
+        return fn(*args)
+
+    writer = LogWriter(str(log_path), fsync="always", offload=offload)
+    writer.append("a")
+    assert writer.flush(timeout=5)
+    writer.rewrite(["b"])
+    writer.close()
+
+    assert _lines(log_path) == ["b"]
+    assert offloaded[:2] == ["_append", "fsync"]
+    assert "_write_file" in offloaded
+
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        LogWriter(str(tmp_path / "log.jsonl"), fsync="sometimes")
+
+
+def test_history_sees_entries_that_are_still_queued(tmp_path):
+    log_path = tmp_path / "asked.jsonl"
+    history = QuestionHistory(
+        str(log_path),
+        writer=LogWriter(str(log_path), batch_size=1000, flush_interval=60))
+    history.load()
+
+    history.record("Q1", 100.0)
+
+    assert history.times() == {"Q1": 100.0}
+    assert history.writer.stats()["queue_depth"] == 1
+    assert _lines(log_path) == []
+
+    history.flush()
+    assert [json.loads(line)["question"] for line in _lines(log_path)] == ["Q1"]
+    history.close()
@@ -0,0 +1,56 @@
+import io
+import json
+import logging
+import queue
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import logs
+
+
+def _setup(monkeypatch, **kwargs):
+    monkeypatch.setattr(logs, "sampler", logs.Sampler())
+    monkeypatch.setattr(logs, "queue_handler", None)
+    root = logging.getLogger("quiz")
+    monkeypatch.setattr(root, "handlers", list(root.handlers))
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.setattr(root, "propagate", root.propagate)
+    stream = io.StringIO()
+    return logs.setup(stream=stream, **kwargs), stream
+
+
+def test_sampler_keeps_one_in_n_per_event_type():
+    sampler = logs.Sampler(logs.parse_rates("answer=0.25,typing=0"))
+    kept = [sampler.keep("answer") for _ in range(8)]
+    assert kept == [False, False, False, True] * 2
+    assert not any(sampler.keep("typing") for _ in range(5))
+    assert sampler.keep("connect")
+    assert sampler.dropped == 11
+
+
+def test_events_reach_the_stream_through_the_writer_thread(monkeypatch):
+    setup, stream = _setup(monkeypatch, level="INFO", fmt="json", sample="answer=0.5")
+    log = logging.getLogger("quiz.test")
+    logs.event(log, "typing", "Typing %r", "al", level=logging.DEBUG, sid="s1")
+    for index in range(4):
+        logs.event(log, "answer", "%s answered %s", "alice", index, room="main")
+    logs.event(log, "connect", "Client connected", sid="s1")
+    setup.close()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["event"] for line in lines] == ["answer", "answer", "connect"]
+    assert lines[0]["msg"] == "alice answered 1" and lines[0]["room"] == "main"
+    assert lines[2]["sid"] == "s1" and lines[2]["level"] == "INFO"
+    assert setup.stats()["dropped_sampled"] == 2
+
+
+def test_a_full_queue_drops_instead_of_blocking():
+    handler = logs.DroppingQueueHandler(queue.Queue(1))
+    record = logging.LogRecord("quiz", logging.INFO, __file__, 1, "hi", None, None)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
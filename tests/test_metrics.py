@@ -0,0 +1,76 @@
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+import metrics
+from question_history import QuestionHistory
+
+
+def _sample(text, name, **labels):
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = "^" + re.escape(name + (f"{{{wanted}}}" if wanted else "")) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    answers = metrics.Counter("answers_total", "Answers.", ("outcome",), registry=registry)
+    answers.labels("counted").inc()
+    answers.labels("counted").inc(2)
+    answers.labels('odd "one"').inc()
+    metrics.Gauge("players", "Players per room.", ("room",), registry=registry,
+                  function=lambda: {"main": 3})
+    latency = metrics.Histogram("took_seconds", "Latency.", registry=registry,
+                                buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE answers_total counter" in text
+    assert 'answers_total{outcome="counted"} 3' in text
+    assert 'answers_total{outcome="odd \\"one\\""} 1' in text
+    assert 'players{room="main"} 3' in text
+    assert 'took_seconds_bucket{le="0.1"} 2' in text
+    assert 'took_seconds_bucket{le="1"} 3' in text
+    assert 'took_seconds_bucket{le="+Inf"} 4' in text
+    assert "took_seconds_count 4" in text
+    assert _sample(text, "took_seconds_sum") == 5.65
+
+
+def test_metrics_route_reports_a_played_round(monkeypatch, tmp_path, dummy_scheduler,
+                                              no_rate_limit, connect, events):
+    monkeypatch.setattr(
+        app_module, "question_history",
+        QuestionHistory(str(tmp_path / "asked.jsonl")))
+    monkeypatch.setattr(app_module, "question_sampler", None)
+    http = app_module.app.test_client()
+    before = http.get("/metrics").get_data(as_text=True)
+
+    client = connect("metered")
+    token = events(client, "host_session")[-1]["token"]
+    client.emit("join", {"username": "alice", "host_token": token})
+    client.emit("start_game", {"host_token": token})
+    client.emit("answer", {"username": "alice", "answer_index": 0, "host_token": token})
+    client.emit("answer", {"username": "alice", "answer_index": 1, "host_token": token})
+
+    response = http.get("/metrics")
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+
+    def grew(name, **labels):
+        return (_sample(text, name, **labels) or 0) - (_sample(before, name, **labels) or 0)
+
+    assert grew("quiz_answers_total", outcome="counted") == 1
+    assert grew("quiz_answers_total", outcome="rejected") == 1
+    assert grew("quiz_section_seconds_count", section="next_question") == 1
+    assert grew("quiz_section_seconds_count", section="process_answers") == 1
+    assert grew("quiz_emit_seconds_count") > 0
+    assert _sample(text, "quiz_room_players", room="metered") == 1
+    assert _sample(text, "quiz_connected_sockets") >= 1
+    client.disconnect()
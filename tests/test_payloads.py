@@ -0,0 +1,75 @@
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+import payloads
+
+
+def test_client_schemas_match_server_schemas():
+    source = (ROOT / "static" / "app.js").read_text()
+    block = re.search(r"const PAYLOAD_SCHEMAS = (\{.*?\n\});", source, re.S).group(1)
+    as_json = re.sub(r"^(\s*)(\w+):", r'\1"\2":', block, flags=re.M)
+    as_json = re.sub(r",(\s*\})", r"\1", as_json.replace("'", '"'))
+
+    client = {event: tuple(fields) for event, fields in json.loads(as_json).items()}
+
+    assert client == payloads.SCHEMAS
+
+
+def test_round_results_round_trip():
+    results = {
+        "next_question_time": 1700000000.123456,
+        "intermission_duration": 10,
+        "question": "Q",
+        "answers": ["A", "B", "C", "D"],
+        "correct_index": 2,
+        "player_answers": {
+            "p1": {"chosen_index": 2, "is_correct": True},
+            "p2": {"chosen_index": 0, "is_correct": False},
+        },
+    }
+
+    encoded = payloads.encode("round_results", results)
+
+    assert payloads.decode("round_results", encoded) == {
+        **results, "next_question_time": 1700000000.123}
+    assert len(json.dumps(encoded)) < len(json.dumps(results))
+
+
+def test_optional_fields_are_dropped_and_unknown_events_pass_through():
+    delta = {"seq": 3, "scores": [["p1", 100]]}
+
+    encoded = payloads.encode("player_list", delta)
+
+    assert encoded == [3, None, None, None, None, [["p1", 100]]]
+    assert payloads.decode("player_list", encoded) == delta
+    assert payloads.encode("joined", {"username": "p1"}) == {"username": "p1"}
+    assert payloads.encode("game_reset", None) is None
+
+
+def test_question_payload_never_carries_the_correct_index(monkeypatch, dummy_scheduler, reset_room,
+                                                          unbatch):
+    sent = []
+    monkeypatch.setattr(
+        app_module.socketio, "emit",
+        lambda event, payload=None, **kwargs: sent.extend(unbatch(event, payload)))
+    room = reset_room()
+    monkeypatch.setattr(room, "log_question", lambda _text: None)
+
+    room.next_question(0)
+    room.send_current_round("sid1")
+
+    questions = [data for event, data in sent if event == "question"]
+    assert len(questions) == 2
+    for question in questions:
+        assert set(question) <= {"index", "question", "answers", "iq", "category", "total"}
+        assert "correct" not in question
+        assert len(question["answers"]) == 4
+    assert room.state["end_time"] > time.time()
@@ -0,0 +1,127 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+from presence import LIVE_WINDOW, Presence, Typing
+
+
+def test_stats_count_connected_and_live_sockets(clock):
+    presence = Presence(live_window=30, clock=clock)
+    presence.connect("a")
+    presence.connect("b")
+    clock.now += 40
+    presence.seen("b")
+    presence.seen("unknown")
+
+    assert presence.stats() == {"connected": 2, "live": 1, "stale": 1}
+    assert presence.is_live("b") and not presence.is_live("a")
+
+    presence.disconnect("b")
+    assert presence.stats() == {"connected": 1, "live": 0, "stale": 1}
+
+
+def test_disconnect_marks_player_offline_and_rejoin_restores(dummy_scheduler, no_rate_limit,
+                                                             connect, events):
+    host = connect("presence")
+    token = events(host, "host_session")[-1]["token"]
+    player = connect("presence")
+    player.emit("join", {"username": "alice", "host_token": token})
+    room = app_module.rooms.get("presence")
+    assert room.state["players"]["alice"]["online"] is True
+    host.get_received()
+
+    player.disconnect()
+
+    alice = room.state["players"]["alice"]
+    assert alice["online"] is False
+    assert alice["sid"] is None
+    assert events(host, "player_presence") == [
+        {"username": "alice", "online": False,
+         "last_seen": round(alice["last_seen"], 3)}]
+    assert room.presence() == {"players": 1, "online": 0}
+
+    late = connect("presence")
+    offline = events(late, "player_presence")
+    assert [(p["username"], p["online"]) for p in offline] == [("alice", False)]
+
+    late.emit("join", {"username": "alice", "host_token": token})
+    assert room.state["players"]["alice"]["online"] is True
+    assert events(host, "player_presence")[-1]["online"] is True
+
+    host.disconnect()
+    late.disconnect()
+
+
+def test_presence_endpoint_reports_live_clients(dummy_scheduler, no_rate_limit, connect):
+    client = connect("presence-api")
+    stats = app_module.app.test_client().get("/api/presence").get_json()
+
+    assert stats["connected"] >= 1
+    assert stats["live"] >= 1
+    assert stats["rooms"]["presence-api"] == {"players": 0, "online": 0}
+    client.disconnect()
+
+
+def test_heartbeats_keep_an_idle_socket_live(monkeypatch, dummy_scheduler, no_rate_limit, clock,
+                                             connect):
+    monkeypatch.setattr(app_module.presence, "clock", clock)
+    client = connect("heartbeat")
+    sid = app_module.socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+
+    clock.now += LIVE_WINDOW + 1
+    assert not app_module.presence.is_live(sid)
+    client.emit("heartbeat")
+    assert app_module.presence.is_live(sid)
+    client.disconnect()
+
+
+def test_typing_keeps_one_name_per_socket_until_it_expires(clock):
+    typing = Typing(ttl=5, clock=clock)
+    typing.note("a", "al")
+    typing.note("a", "alice")
+    typing.note("b", "bob")
+    clock.now += 3
+    typing.note("b", "bobby")
+
+    assert typing.names() == ["alice", "bobby"]
+    clock.now += 3
+    assert typing.names() == ["bobby"]
+    typing.note("b", "")
+    assert typing.names() == [] and len(typing) == 0
+
+
+def test_joining_players_are_sent_on_the_tick_not_per_keystroke(monkeypatch, no_rate_limit,
+                                                                connect, events):
+    timers = []
+    monkeypatch.setattr(app_module.scheduler, "call_later",
+                        lambda delay, callback, *args: timers.append(callback) or object())
+
+    host = connect("typing")
+    token = events(host, "host_session")[-1]["token"]
+    alice = connect("typing")
+    bob = connect("typing")
+    host.get_received()
+    for prefix in ("a", "al", "ali", "alice"):
+        alice.emit("typing_username", {"username": prefix, "host_token": token})
+    bob.emit("typing_username", {"username": "bob", "host_token": token})
+
+    assert events(host, "update_joining_players") == []
+    assert len(timers) == 1
+    timers.pop()()
+    assert events(host, "update_joining_players") == [["alice", "bob"]]
+
+    timers.pop()()
+    assert events(host, "update_joining_players") == []
+
+    alice.emit("join", {"username": "alice", "host_token": token})
+    bob.disconnect()
+    timers.pop()()
+    assert events(host, "update_joining_players") == [[]]
+    assert timers == []
+
+    host.disconnect()
+    alice.disconnect()
@@ -0,0 +1,93 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from question_bank import IndexedQuestionBank, Question, QuestionBank
+
+
+def _write_bank(path, entries):
+    path.write_text(json.dumps({"questions": entries}))
+    return str(path)
+
+
+def test_bundled_questions_load_and_validate():
+    bank = QuestionBank.from_json(str(ROOT / "questions.json"))
+
+    assert len(bank) > 0
+    for question in bank:
+        assert 0 <= question["correct"] < len(question["answers"])
+        assert bank.get(question.question) is question
+
+
+def test_invalid_entries_are_rejected(tmp_path):
+    bad = [
+        {"question": "", "answers": ["A", "B"]},
+        {"question": "Q", "answers": ["A"]},
+        {"question": "Q", "answers": ["A", ""]},
+        {"question": "Q", "answers": ["A", "B"], "correct": 2},
+        {"question": "Q", "answers": ["A", "B"], "iq": "high"},
+    ]
+    for entry in bad:
+        with pytest.raises(ValueError):
+            QuestionBank.from_json(_write_bank(tmp_path / "bank.json", [entry]))
+
+
+def test_answer_strings_are_shared_between_questions(tmp_path):
+    bank = QuestionBank.from_json(_write_bank(tmp_path / "bank.json", [
+        {"question": "Capital of France?", "answers": ["Paris", "Rome"]},
+        {"question": "City of light?", "answers": ["Pa" + "ris", "Oslo"]},
+    ]))
+
+    assert bank[0].answers[0] is bank[1].answers[0]
+
+
+def test_round_copy_leaves_bank_entry_untouched():
+    question = Question("Q", ("A", "B", "C", "D", "E", "F"), 2, 90)
+
+    for seed in range(50):
+        round_question = question.for_round(rng=random.Random(seed))
+        assert len(round_question.answers) == 4
+        assert round_question.correct_answer() == "C"
+
+    assert question.answers == ("A", "B", "C", "D", "E", "F")
+    assert question.correct == 2
+    with pytest.raises(AttributeError):
+        question.answers = ("A",)
+    assert dict(question) == {
+        "question": "Q", "answers": ("A", "B", "C", "D", "E", "F"),
+        "correct": 2, "iq": 90, "category": None}
+
+
+def test_index_round_trip_is_lazy_and_searchable(tmp_path):
+    source = QuestionBank([
+        Question(f"Question {i}?", (f"right {i}", "wrong", "also wrong"),
+                 i % 3, None if i % 5 else 100 + i, None if i % 7 else "Maths")
+        for i in range(200)
+    ])
+    index_path = str(tmp_path / "bank.idx")
+    source.write_index(index_path)
+
+    bank = IndexedQuestionBank(index_path)
+    try:
+        assert len(bank) == 200
+        assert list(bank.texts()) == list(source.texts())
+        for original in source:
+            loaded = bank.get(original.question)
+            assert loaded.correct_answer() == original.correct_answer()
+            assert sorted(loaded.answers) == sorted(original.answers)
+            assert loaded.iq == original.iq
+            assert loaded.category == original.category
+        assert list(bank.rows()) == list(source.rows())
+        assert bank.position("Question 42?") == source.position("Question 42?") == 42
+        assert bank.position("Not in the bank") is None
+        assert bank[-1].question == "Question 199?"
+        assert bank.get("Not in the bank") is None
+    finally:
+        bank.close()
@@ -0,0 +1,52 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from question_history import QuestionHistory
+
+
+def _write_log(path, entries):
+    with open(path, "w") as f:
+        for question, timestamp in entries:
+            f.write(json.dumps({"question": question, "timestamp": timestamp}) + "\n")
+
+
+def test_load_keeps_latest_timestamp_and_skips_bad_lines(tmp_path):
+    log_path = tmp_path / "asked.jsonl"
+    _write_log(log_path, [("Q1", 10.0), ("Q2", 20.0), ("Q1", 30.0), ("Q1", 5.0)])
+    with open(log_path, "a") as f:
+        f.write("not json\n\n")
+
+    history = QuestionHistory(str(log_path))
+
+    assert history.times() == {"Q1": 30.0, "Q2": 20.0}
+
+
+def test_record_updates_index_without_rescanning(tmp_path):
+    log_path = tmp_path / "asked.jsonl"
+    history = QuestionHistory(str(log_path))
+    history.load()
+
+    history.record("Q1", 100.0)
+    log_path.write_text("")  # a rescan would now lose Q1
+    history.record("Q2", 200.0)
+
+    assert history.times() == {"Q1": 100.0, "Q2": 200.0}
+
+
+def test_record_compacts_log_once_it_holds_mostly_stale_lines(tmp_path):
+    log_path = tmp_path / "asked.jsonl"
+    history = QuestionHistory(str(log_path), compact_ratio=2, compact_min_lines=6)
+
+    for i in range(6):
+        history.record("Q1" if i % 2 else "Q2", float(i))
+    history.flush()
+
+    lines = log_path.read_text().splitlines()
+    assert len(lines) <= 4
+    reloaded = QuestionHistory(str(log_path))
+    assert reloaded.times() == {"Q1": 5.0, "Q2": 4.0}
@@ -0,0 +1,129 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import question_import
+from question_bank import IndexedQuestionBank, Question, QuestionBank, load_bank
+
+
+def _import(tmp_path, *sources):
+    index_path = str(tmp_path / "bank.idx")
+    report = question_import.import_questions([str(s) for s in sources], index_path)
+    return report.as_dict(), IndexedQuestionBank(index_path)
+
+
+def test_imports_csv_jsonl_and_json_and_dedupes_on_text(tmp_path):
+    csv_path = tmp_path / "a.csv"
+    csv_path.write_text(
+        "question,answer1,answer2,answer3,correct,iq\n"
+        "Capital of France?,Paris,Rome,Oslo,0,90\n"
+        "Red planet?, Venus ,Mars,Earth,1,85.6\n"
+    )
+    jsonl_path = tmp_path / "b.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"question": "Capital  of France?", "answers": ["Paris", "Lyon"]}) + "\n"
+        + json.dumps({"question": "2 + 2?", "answers": "4|3|5", "iq": "70"}) + "\n"
+    )
+    json_path = tmp_path / "c.json"
+    json_path.write_text(json.dumps({"questions": [
+        {"question": "Largest ocean?", "answers": ["Pacific", "Atlantic"], "iq": 100,
+         "category": " Geography "},
+    ]}))
+
+    report, bank = _import(tmp_path, csv_path, jsonl_path, json_path)
+    try:
+        assert report["read"] == 5
+        assert report["imported"] == 4
+        assert report["duplicates"] == 1
+        assert report["rejected"] == 0
+        mars = bank.get("Red planet?")
+        assert mars.correct_answer() == "Mars"
+        assert sorted(mars.answers) == ["Earth", "Mars", "Venus"]
+        assert mars.iq == 86
+        assert bank.get("2 + 2?").correct_answer() == "4"
+        assert bank.get("Capital of France?").iq == 90
+        assert bank.get("Largest ocean?").iq == 100
+        assert bank.get("Largest ocean?").category == "Geography"
+        assert bank.get("Red planet?").category is None
+    finally:
+        bank.close()
+
+
+def test_bad_rows_are_reported_and_skipped(tmp_path):
+    jsonl_path = tmp_path / "bad.jsonl"
+    jsonl_path.write_text("\n".join([
+        json.dumps({"question": "Ok?", "answers": ["Yes", "No"]}),
+        "{not json",
+        json.dumps({"question": "One answer?", "answers": ["Only"]}),
+        json.dumps({"question": "Bad iq?", "answers": ["A", "B"], "iq": "clever"}),
+        json.dumps({"question": "Bad correct?", "answers": ["A", "B"], "correct": 5}),
+        json.dumps({"question": "Dupes?", "answers": ["A", "a", " A "]}),
+    ]) + "\n")
+
+    report, bank = _import(tmp_path, jsonl_path)
+    try:
+        assert report["imported"] == 1
+        assert report["rejected"] == 5
+        assert [r["row"] for r in report["rejects"]] == [2, 3, 4, 5, 6]
+        assert len(bank) == 1
+    finally:
+        bank.close()
+
+
+def test_rows_too_big_for_the_index_are_rejected_not_fatal(tmp_path):
+    jsonl_path = tmp_path / "big.jsonl"
+    jsonl_path.write_text("\n".join([
+        json.dumps({"question": "Q" * 70_000, "answers": ["A", "B"]}),
+        json.dumps({"question": "Long answer?", "answers": ["\u00e9" * 40_000, "B"]}),
+        json.dumps({"question": "Ok?", "answers": ["Yes", "No"]}),
+    ]) + "\n")
+
+    report, bank = _import(tmp_path, jsonl_path)
+    try:
+        assert report["imported"] == 1
+        assert [r["row"] for r in report["rejects"]] == [1, 2]
+    finally:
+        bank.close()
+
+    for iq in (-5, 40_000):
+        with pytest.raises(ValueError, match="iq out of range"):
+            Question.from_dict({"question": "Iq?", "answers": ["A", "B"], "iq": iq})
+
+
+def test_json_reader_handles_elements_split_across_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(question_import, "READ_CHUNK", 7)
+    json_path = tmp_path / "bank.json"
+    json_path.write_text(json.dumps({"title": "[x]", "questions": [
+        {"question": f"Question {i}?", "answers": [f"right {i}", "wrong"], "iq": 80 + i}
+        for i in range(50)
+    ]}, indent=2))
+
+    report, bank = _import(tmp_path, json_path)
+    try:
+        assert report["imported"] == 50
+        assert [q.iq for q in bank] == list(range(80, 130))
+    finally:
+        bank.close()
+
+
+def test_bundled_questions_import_matches_json_bank(tmp_path):
+    expected = QuestionBank.from_json(str(ROOT / "questions.json"))
+    report, bank = _import(tmp_path, ROOT / "questions.json")
+    try:
+        assert report["imported"] == len(expected)
+        for question in expected:
+            assert bank.get(question.question).correct_answer() == question.correct_answer()
+    finally:
+        bank.close()
+
+    loaded = load_bank(str(tmp_path / "bank.idx"), str(ROOT / "questions.json"))
+    assert isinstance(loaded, IndexedQuestionBank)
+    loaded.close()
+    fallback = load_bank(str(tmp_path / "missing.idx"), str(ROOT / "questions.json"))
+    assert isinstance(fallback, QuestionBank)
@@ -0,0 +1,151 @@
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+from game_room import GameRoom
+from question_bank import IndexedQuestionBank, Question, QuestionBank
+from question_history import QuestionHistory
+from question_stats import UNRATED, QuestionStats
+from sampler import BucketSampler
+
+
+def _answers(correct, wrong, latency=4.0):
+    return ([(f"right-{i}", "Paris", True, latency) for i in range(correct)] +
+            [(f"wrong-{i}", answer, False, latency * 2) for i, answer in enumerate(wrong)])
+
+
+def test_running_totals_bands_and_distractor_rates(tmp_path):
+    moves = []
+    stats = QuestionStats(str(tmp_path / "stats.sqlite3"), min_answers=4,
+                          on_band_change=lambda text, band: moves.append((text, band)))
+
+    stats.record_round("Capital of France?", _answers(1, ["Lyon"]))
+    assert stats.band("Capital of France?") == UNRATED
+    stats.record_round("Capital of France?", _answers(0, ["Lyon", "Nice", "Lyon"]))
+
+    detail = stats.get("Capital of France?", ["Lyon", "Nice", "Marseille"])
+    assert detail["answers"] == 5 and detail["correct"] == 1
+    assert detail["accuracy"] == 0.2 and detail["band"] == "hard"
+    assert detail["mean_latency"] == (4.0 + 8.0 * 4) / 5
+    assert [(d["answer"], d["picks"], d["rate"]) for d in detail["distractors"]] == [
+        ("Lyon", 3, 0.6), ("Nice", 1, 0.2), ("Marseille", 0, 0.0)]
+    assert moves == [("Capital of France?", "hard")]
+
+    stats.record_round("Capital of France?", _answers(5, []))
+    assert stats.band("Capital of France?") == "medium"
+    assert moves[-1] == ("Capital of France?", "medium")
+
+
+def test_only_changed_questions_are_written_and_load_restores_bands(tmp_path):
+    path = str(tmp_path / "stats.sqlite3")
+    stats = QuestionStats(path, min_answers=2)
+    stats.record_round("Q1?", _answers(2, []))
+    stats.record_round("Q2?", _answers(0, ["B", "C"]))
+    stats.record_round("Q1?", _answers(1, []))
+    assert stats.flush(timeout=5)
+    assert stats.rows_written == 2
+    assert stats.flush(timeout=5)
+    assert stats.rows_written == 2
+    stats.record_round("Q1?", _answers(1, []))
+    assert stats.flush(timeout=5)
+    assert stats.rows_written == 3
+    stats.close()
+
+    loaded = QuestionStats(path, min_answers=2)
+    assert loaded.load() == 2
+    assert loaded.get("Q1?")["answers"] == 4
+    assert (loaded.band("Q1?"), loaded.band("Q2?")) == ("easy", "hard")
+    assert loaded.get("Q2?")["distractors"][0]["picks"] == 1
+
+
+def test_a_resolved_round_updates_the_stats_with_answer_text(tmp_path, recording_socketio,
+                                                             recording_scheduler):
+    stats = QuestionStats(str(tmp_path / "stats.sqlite3"), min_answers=1)
+    question = Question("Largest planet?", ("Jupiter", "Mars", "Venus", "Earth"), 0)
+    room = GameRoom(
+        "main", recording_socketio(), recording_scheduler(),
+        select_question=lambda: question,
+        log_question=lambda _text: None,
+        question_pool=[question],
+        question_stats=stats)
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.load_or_reset()
+        room.join("alice", "sid-alice", "10.0.0.1")
+        room.join("bob", "sid-bob", "10.0.0.1")
+        room.start_game()
+        answers = room.state["current_question"]["answers"]
+        room.record_answer("sid-alice", "alice", answers.index("Jupiter"))
+        room.record_answer("sid-bob", "bob", answers.index("Mars"))
+
+    detail = stats.get("Largest planet?")
+    assert detail["answers"] == 2 and detail["correct"] == 1
+    assert detail["distractors"] == [{"answer": "Mars", "picks": 1, "rate": 0.5}]
+
+
+def test_host_difficulty_picks_from_that_band(monkeypatch, tmp_path, dummy_scheduler):
+    bank = QuestionBank([Question(f"Q{i}?", ("A", "B"), 0) for i in range(6)])
+    stats = QuestionStats(str(tmp_path / "stats.sqlite3"), min_answers=1)
+    for i in range(6):
+        stats.record_round(f"Q{i}?", _answers(i % 2, [] if i % 2 else ["B"]))
+    monkeypatch.setattr(app_module, "question_bank", bank)
+    monkeypatch.setattr(app_module, "question_stats", stats)
+    monkeypatch.setattr(app_module, "question_sampler", None)
+    monkeypatch.setattr(
+        app_module, "question_history",
+        QuestionHistory(str(tmp_path / "asked.jsonl")))
+
+    sampler = app_module.get_question_sampler()
+    assert isinstance(sampler, BucketSampler)
+    assert sampler.sizes() == {None: {"easy": 3, "hard": 3}}
+    hard = {"difficulty": "hard"}
+    picks = {app_module.select_single_question(hard).question for _ in range(50)}
+    assert picks <= {"Q0?", "Q2?", "Q4?"}
+    # An empty band falls back to the rest of the filter.
+    assert app_module.select_single_question({"difficulty": "medium"}) is not None
+
+    room = app_module.rooms.get_or_create("difficulty-test")
+    with contextlib.redirect_stdout(io.StringIO()):
+        room.start_game(hard)
+    assert room.state["question_filter"] == hard
+    assert room.state["current_question"]["question"] in {"Q0?", "Q2?", "Q4?"}
+
+
+def test_sampler_reads_an_indexed_bank_without_decoding_it(monkeypatch, tmp_path):
+    source = QuestionBank([Question(f"Q{i}?", ("A", "B"), 0, 80 + i, f"c{i % 3}")
+                           for i in range(60)])
+    index_path = str(tmp_path / "bank.idx")
+    source.write_index(index_path)
+    bank = IndexedQuestionBank(index_path)
+    stats = QuestionStats(str(tmp_path / "stats.sqlite3"), min_answers=1,
+                          on_band_change=app_module.question_stats.on_band_change)
+    stats.record_round("Q7?", _answers(0, ["B"]))
+    history = QuestionHistory(str(tmp_path / "asked.jsonl"))
+    history.record("Q8?")
+    monkeypatch.setattr(app_module, "question_bank", bank)
+    monkeypatch.setattr(app_module, "question_stats", stats)
+    monkeypatch.setattr(app_module, "question_history", history)
+    monkeypatch.setattr(app_module, "question_sampler", None)
+    reads = []
+    monkeypatch.setattr(IndexedQuestionBank, "decode",
+                        lambda self, at: reads.append(at))
+    real_read_text = IndexedQuestionBank.read_text
+    monkeypatch.setattr(IndexedQuestionBank, "read_text",
+                        lambda self, position: reads.append(position)
+                        or real_read_text(self, position))
+
+    sampler = app_module.get_question_sampler()
+
+    # Only the asked and the rated question were looked up by text.
+    assert sorted(reads) == [7, 8]
+    assert sampler.sizes() == {"c0": {UNRATED: 20}, "c1": {UNRATED: 19, "hard": 1},
+                               "c2": {UNRATED: 20}}
+    assert sampler.last_time(8) > 0 and sampler.last_time(9) == 0
+    stats.record_round("Q9?", _answers(1, []))
+    assert sampler.band(9) == "easy"
+    bank.close()
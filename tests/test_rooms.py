@@ -0,0 +1,147 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import app as app_module
+from game_room import RoomRegistry
+from question_history import QuestionHistory
+
+ROOM_COUNT = 200
+
+
+def test_connect_binds_client_to_requested_room(dummy_scheduler, no_rate_limit, connect, events):
+    client = connect("table-1")
+    session = events(client, "host_session")
+
+    room = app_module.rooms.get("table-1")
+    assert room is not None
+    assert session[-1]["token"] == room.state["host_token"]
+    assert app_module.rooms.by_token(session[-1]["token"]) is room
+    client.disconnect()
+
+
+def test_invalid_room_name_falls_back_to_default(dummy_scheduler, no_rate_limit, connect, events):
+    client = connect("../etc")
+    session = events(client, "host_session")
+
+    default_room = app_module.rooms.get(app_module.DEFAULT_ROOM)
+    assert session[-1]["token"] == default_room.state["host_token"]
+    client.disconnect()
+
+
+def test_many_rooms_run_concurrently_without_cross_talk(monkeypatch, tmp_path, dummy_scheduler,
+                                                        no_rate_limit, connect, events, received):
+    monkeypatch.setattr(
+        app_module, "question_history",
+        QuestionHistory(str(tmp_path / "asked.jsonl")))
+    monkeypatch.setattr(app_module, "question_sampler", None)
+
+    clients = {}
+    tokens = {}
+    for i in range(ROOM_COUNT):
+        name = f"load-{i}"
+        client = connect(name)
+        tokens[name] = events(client, "host_session")[-1]["token"]
+        clients[name] = client
+
+    for name, client in clients.items():
+        client.emit("join", {"username": f"player-{name}", "host_token": tokens[name]})
+    for name, client in clients.items():
+        client.emit("start_game", {"host_token": tokens[name]})
+    for name, client in clients.items():
+        client.get_received()
+        room = app_module.rooms.get(name)
+        correct = room.state["current_question"]["correct"]
+        client.emit("answer", {
+            "username": f"player-{name}",
+            "answer_index": correct,
+            "host_token": tokens[name],
+        })
+
+    for name, client in clients.items():
+        frames = received(client)
+        results = [data for event, data in frames if event == "round_results"]
+        player_lists = [data for event, data in frames if event == "player_list"]
+        assert len(results) == 1
+        assert list(results[0]["player_answers"]) == [f"player-{name}"]
+        assert results[0]["player_answers"][f"player-{name}"]["is_correct"] is True
+        for payload in player_lists:
+            names = {n for n, _ in payload.get("added", []) + payload.get("scores", [])}
+            assert names <= {f"player-{name}"}
+        room = app_module.rooms.get(name)
+        assert room.state["players"][f"player-{name}"]["score"] > 3
+
+    for client in clients.values():
+        client.disconnect()
+
+
+def test_host_settings_run_a_filtered_game_of_fixed_length(monkeypatch, tmp_path, dummy_scheduler,
+                                                           no_rate_limit, connect, events):
+    monkeypatch.setattr(
+        app_module, "question_history",
+        QuestionHistory(str(tmp_path / "asked.jsonl")))
+    monkeypatch.setattr(app_module, "question_sampler", None)
+
+    client = connect("filtered")
+    token = events(client, "host_session")[-1]["token"]
+    client.emit("start_game", {"host_token": token, "categories": ["Atlantis"]})
+    assert "Unknown category" in events(client, "error")[-1]["message"]
+    client.emit("start_game", {"host_token": token, "iq_min": 300, "iq_max": 200})
+    assert events(client, "error")[-1]["message"] == "The IQ range is empty."
+
+    client.emit("join", {"username": "alice", "host_token": token})
+    client.emit("start_game", {
+        "host_token": token, "categories": ["geography"],
+        "iq_min": 70, "iq_max": 100, "count": 2})
+    room = app_module.rooms.get("filtered")
+    assert room.state["question_filter"] == {
+        "categories": ["Geography"], "iq": [70, 100], "count": 2}
+    asked = []
+    for index in (1, 2):
+        question = events(client, "question")[-1]
+        assert question["category"] == "Geography" and question["total"] == 2
+        asked.append(app_module.question_bank.get(question["question"]))
+        client.emit("next_question", {"index": index, "host_token": token})
+
+    assert all(q.category == "Geography" and 70 <= q.iq <= 100 for q in asked)
+    assert len(events(client, "game_over")) == 1
+    client.disconnect()
+
+
+def test_registry_caps_rooms_and_drops_idle_ones(clock):
+    class FakeRoom:
+        def __init__(self, name):
+            self.name = name
+            self.closed = False
+
+        def load_or_reset(self, saved=None):
+            pass
+
+        def start_lease(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    registry = RoomRegistry(lambda name, _registry: FakeRoom(name), max_rooms=2,
+                            idle_after=60, keep={"main"}, clock=clock)
+    main = registry.get_or_create("main")
+    busy = registry.get_or_create("busy")
+    registry.bind_sid("s1", busy)
+    registry.bind_sid("s2", main)
+    assert registry.get_or_create("third") is None
+
+    registry.unbind_sid("s1")
+    clock.now += 10
+    third = registry.get_or_create("third")
+    assert busy.closed and registry.get("busy") is None
+    assert third is registry.get("third")
+
+    registry.unbind_sid("s2")
+    clock.now += 61
+    assert registry.evict_idle() == ["third"]
+    assert third.closed and not main.closed
+    assert set(registry.rooms) == {"main"}
@@ -0,0 +1,114 @@
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sampler import BucketSampler
+
+HALF_LIFE = 3600.0
+NOW = 1_700_000_000.0
+
+
+def _legacy_weight(last_time, now):
+    age = max(0, now - last_time)
+    return 1.0 - pow(2.718281828, -age / HALF_LIFE)
+
+
+def _entries(count):
+    entries = []
+    for i in range(count):
+        # Mix of never asked, asked long ago and asked minutes ago.
+        if i % 3 == 0:
+            last_time = 0
+        elif i % 3 == 1:
+            last_time = NOW - 86400 * (i + 1)
+        else:
+            last_time = NOW - 60 * (i + 1)
+        entries.append((f"q{i}", last_time))
+    return entries
+
+
+def _bucketed(entries):
+    # Three categories, iq rising with the key, bands easy/hard alternating.
+    return BucketSampler.build(HALF_LIFE, [
+        (key, f"c{i % 3}", 80 + i, "easy" if i % 2 else "hard", t)
+        for i, (key, t) in enumerate(entries)], now=NOW)
+
+
+def _chi_square(counts, weights, draws):
+    total = sum(weights.values())
+    return sum((counts[key] - draws * w / total) ** 2 / (draws * w / total)
+               for key, w in weights.items())
+
+
+def test_bucket_sampler_without_a_filter_matches_recency_weights():
+    entries = _entries(20)
+    sampler = _bucketed(entries)
+    rng = random.Random(99)
+    draws = 40000
+
+    counts = Counter(sampler.sample(NOW, rng=rng) for _ in range(draws))
+
+    weights = {key: _legacy_weight(t, NOW) for key, t in entries}
+    assert _chi_square(counts, weights, draws) < 43.82
+
+
+def test_bucket_sampler_filters_keep_recency_weights_inside_the_match():
+    entries = _entries(60)
+    sampler = _bucketed(entries)
+    rng = random.Random(4)
+    draws = 20000
+
+    counts = Counter(
+        sampler.sample(NOW, ["c0", "c1"], ["hard"], (90, 120), rng=rng)
+        for _ in range(draws))
+
+    matching = {key: _legacy_weight(t, NOW) for i, (key, t) in enumerate(entries)
+                if i % 3 in (0, 1) and i % 2 == 0 and 90 <= 80 + i <= 120}
+    assert set(counts) == set(matching)
+    assert sampler.count(["c0", "c1"], ["hard"], (90, 120)) == len(matching)
+    # 14 matching keys: 13 degrees of freedom at p = 0.001.
+    assert _chi_square(counts, matching, draws) < 34.53
+
+
+def test_bucket_sampler_band_moves_keep_last_time_and_rank_order():
+    sampler = BucketSampler.build(HALF_LIFE, [
+        ("a", "maths", 100, "easy", 0), ("b", "maths", 90, "easy", NOW),
+        ("c", "maths", None, "hard", 0)], now=NOW)
+
+    sampler.move("b", "hard")
+    sampler.touch("a", NOW)
+
+    assert sampler.sizes() == {"maths": {"easy": 1, "hard": 2}}
+    assert sampler.band("b") == "hard" and sampler.last_time("b") == NOW
+    rng = random.Random(5)
+    assert {sampler.sample(NOW + 1, bands=["hard"], rng=rng) for _ in range(200)} == {"c"}
+    # No iq never matches a range.
+    assert sampler.sample(NOW + 1, ranks=(None, 200)) in {"a", "b"}
+    assert sampler.count(ranks=(95, None)) == 1
+    assert sampler.sample(NOW, ["history"]) is None
+
+
+def test_bucket_sampler_touch_makes_a_question_unlikely_until_it_decays():
+    sampler = _bucketed([("a", 0), ("b", 0)])
+
+    sampler.touch("a", NOW)
+
+    rng = random.Random(7)
+    picks = Counter(sampler.sample(NOW + 1, rng=rng) for _ in range(1000))
+    assert picks["a"] <= 2
+    assert sampler.last_time("a") == NOW
+
+
+def test_bucket_sampler_touch_far_in_future_rebases_without_overflow():
+    sampler = _bucketed([("a", 0), ("b", 0)])
+
+    later = NOW + HALF_LIFE * 1000
+    sampler.touch("a", later)
+
+    assert sampler.base == later
+    assert sampler.sample(later, rng=random.Random(1)) == "b"
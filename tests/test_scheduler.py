@@ -0,0 +1,88 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scheduler import Scheduler
+
+
+def _wait_for(predicate, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_callbacks_fire_in_deadline_order():
+    scheduler = Scheduler()
+    fired = []
+    scheduler.call_later(0.06, fired.append, "late")
+    scheduler.call_later(0.02, fired.append, "early")
+    scheduler.call_later(0.04, fired.append, "middle")
+
+    assert _wait_for(lambda: len(fired) == 3)
+    assert fired == ["early", "middle", "late"]
+    scheduler.stop()
+
+
+def test_cancelled_handle_never_fires():
+    scheduler = Scheduler()
+    fired = threading.Event()
+    handle = scheduler.call_later(0.02, fired.set)
+    handle.cancel()
+    marker = []
+    scheduler.call_later(0.04, marker.append, True)
+
+    assert _wait_for(lambda: marker)
+    assert not fired.is_set()
+    assert scheduler.pending() == 0
+    scheduler.stop()
+
+
+def test_call_every_repeats_until_cancelled():
+    scheduler = Scheduler()
+    ticks = []
+    handle = scheduler.call_every(0.01, ticks.append, 1)
+
+    assert _wait_for(lambda: len(ticks) >= 3)
+    handle.cancel()
+    count = len(ticks)
+    time.sleep(0.05)
+    assert len(ticks) <= count + 1
+    scheduler.stop()
+
+
+def test_failing_callback_does_not_stop_the_loop(caplog):
+    scheduler = Scheduler()
+    fired = []
+
+    def boom():
+        raise RuntimeError("boom")
+
+    scheduler.call_later(0.01, boom)
+    scheduler.call_later(0.02, fired.append, True)
+
+    assert _wait_for(lambda: fired)
+    [record] = [r for r in caplog.records if r.name == "quiz.scheduler"]
+    assert record.exc_info[1].args == ("boom",)
+    scheduler.stop()
+
+
+def test_stats_report_lateness():
+    scheduler = Scheduler()
+    fired = []
+    for _ in range(5):
+        scheduler.call_later(0.01, fired.append, True)
+
+    assert _wait_for(lambda: len(fired) == 5)
+    stats = scheduler.stats()
+    assert stats["fired"] == 5
+    assert stats["pending"] == 0
+    assert 0 <= stats["lateness_p50_ms"] <= stats["lateness_max_ms"]
+    scheduler.stop()
@@ -0,0 +1,110 @@
+import contextlib
+import gzip
+import io
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_room import GameRoom, RoomRegistry
+from question_bank import Question
+from snapshots import Snapshotter, decode_snapshot
+
+
+@pytest.fixture
+def make_registry(recording_socketio, recording_scheduler):
+    def make_registry():
+        scheduler = recording_scheduler()
+
+        def factory(name, registry):
+            return GameRoom(
+                name, recording_socketio(), scheduler,
+                select_question=lambda: Question("Q?", ("A", "B", "C", "D"), 0),
+                log_question=lambda _text: None,
+                question_pool=[Question("Q?", ("A", "B", "C", "D"), 0)],
+                registry=registry)
+        return RoomRegistry(factory), scheduler
+    return make_registry
+
+
+def _game_in_progress(tmp_path, make_registry):
+    rooms, _ = make_registry()
+    snapshotter = Snapshotter(str(tmp_path), rooms)
+    with contextlib.redirect_stdout(io.StringIO()):
+        room = rooms.get_or_create("main")
+        for i in range(3):
+            room.join(f"p{i}", f"sid-{i}", "10.0.0.1")
+        room.start_game()
+        room.record_answer("sid-0", "p0", room.state["current_question"]["correct"])
+    return rooms, room, snapshotter
+
+
+def test_restore_keeps_token_scores_and_question_deadline(tmp_path, make_registry):
+    _, room, snapshotter = _game_in_progress(tmp_path, make_registry)
+    assert snapshotter.snapshot(room) is True
+    assert snapshotter.snapshot(room) is False  # unchanged since
+
+    rooms, scheduler = make_registry()
+    restorer = Snapshotter(str(tmp_path), rooms)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert restorer.restore() == ["main"]
+    restored = rooms.get("main")
+
+    assert rooms.by_token(room.state["host_token"]) is restored
+    assert restored.state["current_question_index"] == 0
+    assert restored.state["current_answers"].keys() == {"p0"}
+    assert {name: p["score"] for name, p in restored.state["players"].items()} == {
+        name: p["score"] for name, p in room.state["players"].items()}
+    assert all(p["sid"] is None and p["online"] is False
+               for p in restored.state["players"].values())
+    timer = restored.state["timer_thread"]
+    assert timer.args[1:] == (restored.on_question_deadline, 0)
+    assert abs(timer.args[0] - (room.state["end_time"] - time.time())) < 1
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert restored.join("p1", "new-sid", "10.0.0.1")
+    assert restored.state["players"]["p1"]["online"] is True
+
+
+def test_deadline_that_passed_while_down_fires_at_once(tmp_path, make_registry):
+    _, room, snapshotter = _game_in_progress(tmp_path, make_registry)
+    room.state["question_deadline"][0] = time.time() - 5
+    room.state["end_time"] = time.time() - 5
+    snapshotter.snapshot(room)
+
+    rooms, _ = make_registry()
+    with contextlib.redirect_stdout(io.StringIO()):
+        Snapshotter(str(tmp_path), rooms).restore()
+
+    assert rooms.get("main").state["timer_thread"].args[0] == 0
+
+
+def test_snapshot_file_is_compact_gzip_json_without_timers(tmp_path, make_registry):
+    _, room, snapshotter = _game_in_progress(tmp_path, make_registry)
+    snapshotter.snapshot(room)
+
+    data = (tmp_path / "main.json.gz").read_bytes()
+    saved = decode_snapshot(data)
+    assert saved["room"] == "main"
+    assert "timer_thread" not in saved["round"]
+    assert saved["round"]["question_deadline"][1] == 0
+    assert set(saved["players"]) == {"p0", "p1", "p2"}
+    assert len(data) < len(gzip.decompress(data))
+
+
+def test_stale_and_corrupt_snapshots_are_skipped(tmp_path, make_registry):
+    _, room, snapshotter = _game_in_progress(tmp_path, make_registry)
+    snapshotter.snapshot(room)
+    (tmp_path / "broken.json.gz").write_bytes(b"not gzip")
+
+    rooms, _ = make_registry()
+    restorer = Snapshotter(str(tmp_path), rooms, max_age=-1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert restorer.restore() == []
+    assert restorer.errors == 1
+    assert len(rooms) == 0
@@ -0,0 +1,274 @@
+import contextlib
+import io
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from game_room import GameRoom
+from question_bank import Question
+from state_store import (
+    RELEASE_SCRIPT, RENEW_SCRIPT, MemoryStore, RedisStore, StoreError)
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    # A stand-in Redis speaking RESP2, with the commands RedisStore uses.
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.values = {}
+        self.hashes = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    def live(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.values.pop(key, None)
+            del self.expires[key]
+        return key in self.values
+
+    def run(self, args):
+        name, args = args[0].upper(), args[1:]
+        self.commands += 1
+        if name == "PING":
+            return "+PONG"
+        if name == "GET":
+            return self.values.get(args[0]) if self.live(args[0]) else None
+        if name == "SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if "NX" in options and self.live(key):
+                return None
+            self.values[key] = value
+            self.expires.pop(key, None)
+            if "PX" in options:
+                ttl = int(args[2 + options.index("PX") + 1]) / 1000
+                self.expires[key] = time.monotonic() + ttl
+            return "+OK"
+        if name == "PEXPIRE":
+            if not self.live(args[0]):
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        if name == "EVAL":
+            script, key, owner = args[0], args[2], args[3]
+            if not self.live(key) or self.values[key] != owner:
+                return 0
+            if script == RELEASE_SCRIPT:
+                del self.values[key]
+                self.expires.pop(key, None)
+                return 1
+            if script == RENEW_SCRIPT:
+                self.expires[key] = time.monotonic() + int(args[4]) / 1000
+                return 1
+        if name == "DEL":
+            removed = 0
+            for key in args:
+                removed += (self.values.pop(key, None) is not None or
+                            self.hashes.pop(key, None) is not None)
+                self.expires.pop(key, None)
+            return removed
+        if name == "HSET":
+            fields = self.hashes.setdefault(args[0], {})
+            pairs = dict(zip(args[1::2], args[2::2]))
+            added = len(set(pairs) - set(fields))
+            fields.update(pairs)
+            return added
+        if name == "HGETALL":
+            return [item for pair in self.hashes.get(args[0], {}).items()
+                    for item in pair]
+        if name == "HDEL":
+            fields = self.hashes.get(args[0], {})
+            return sum(fields.pop(f, None) is not None for f in args[1:])
+        if name == "HINCRBY":
+            fields = self.hashes.setdefault(args[0], {})
+            value = int(fields.get(args[1], 0)) + int(args[2])
+            fields[args[1]] = str(value)
+            return value
+        return StoreError(f"ERR unknown command '{name}'")
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+            with self.server.lock:
+                reply = self.server.run(args)
+            self.wfile.write(self.encode(reply))
+
+    def encode(self, reply):
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, StoreError):
+            return f"-{reply}\r\n".encode()
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode()
+        if isinstance(reply, list):
+            return f"*{len(reply)}\r\n".encode() + b"".join(
+                self.encode(item) for item in reply)
+        if reply.startswith("+"):
+            return f"{reply}\r\n".encode()
+        data = reply.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedis()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _store(server):
+    return RedisStore(*server.server_address)
+
+
+@pytest.fixture
+def make_node(recording_socketio, recording_scheduler):
+    def make_node(store, node_id):
+        socketio = recording_socketio()
+        scheduler = recording_scheduler()
+        room = GameRoom(
+            "shared", socketio, scheduler,
+            select_question=lambda: Question("Q?", ("A", "B", "C", "D"), 0),
+            log_question=lambda _text: None,
+            question_pool=[Question("Q?", ("A", "B", "C", "D"), 0)],
+            store=store, node_id=node_id)
+        return room, socketio, scheduler
+    return make_node
+
+
+def test_redis_store_speaks_resp(redis_server):
+    store = _store(redis_server)
+
+    assert store.get("missing") is None
+    store.set("k", "v é")
+    assert store.get("k") == "v é"
+    store.hset("h", {"a": "1", "b": "2"})
+    store.hdel("h", ["b"])
+    assert store.hgetall("h") == {"a": "1"}
+    assert store.hincrby("h", "a") == 2
+    store.delete("k", "h")
+    assert store.get("k") is None and store.hgetall("h") == {}
+
+    assert store.acquire("lease", "n1", 5)
+    assert not store.acquire("lease", "n2", 5)
+    assert store.renew("lease", "n1", 5)
+    assert not store.renew("lease", "n2", 5)
+    store.release("lease", "n2")
+    assert store.get("lease") == "n1"
+    store.release("lease", "n1")
+    assert store.acquire("lease", "n2", 5)
+
+    with store.locked("room-lock"):
+        assert store.get("room-lock") is not None
+    assert store.get("room-lock") is None
+
+
+def test_memory_store_leases_expire(clock):
+    store = MemoryStore(clock=clock)
+
+    assert store.acquire("lease", "n1", 5)
+    assert not store.acquire("lease", "n2", 5)
+    clock.now += 6
+    assert not store.renew("lease", "n1", 5)
+    assert store.acquire("lease", "n2", 5)
+
+
+def test_two_nodes_share_one_room_and_one_timer_owner(redis_server, make_node):
+    node_a, _, _ = make_node(_store(redis_server), "a")
+    node_b, _, timers_b = make_node(_store(redis_server), "b")
+    with contextlib.redirect_stdout(io.StringIO()):
+        node_a.load_or_reset()
+        node_a.start_lease()
+        node_b.load_or_reset()
+        node_b.start_lease()
+
+        assert node_b.state["host_token"] == node_a.state["host_token"]
+        assert node_a.owner and not node_b.owner
+
+        node_a.join("alice", "sid-a", "1.1.1.1")
+        node_b.join("bob", "sid-b", "2.2.2.2")
+        node_b.start_game()
+
+    # node_b started the round, but only the lease holder arms the deadline;
+    # node_a picks it up when it next syncs.
+    assert node_b.state.get("timer_thread") is None
+    assert timers_b.timers == []
+    node_a.keep_lease()
+    assert set(node_a.state["players"]) == {"alice", "bob"}
+    assert node_a.state["timer_thread"].args[1] == node_a.on_question_deadline
+    assert node_a.state["current_question_index"] == 0
+
+    correct = node_a.state["current_question"]["correct"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        node_b.record_answer("sid-b", "bob", correct)
+        node_a.record_answer("sid-a", "alice", (correct + 1) % 4)
+    # The last answer closed the round on node_a, which owns the timers.
+    assert node_a.state["answers_processed"] is True
+    assert node_a.state["timer_thread"] is None
+    assert node_a.state["intermission_timer_thread"].args[1:] == (
+        node_a.auto_next_question, 1)
+    assert node_b.leaderboard_page()["players"][0]["name"] == "bob"
+
+    node_a.release_lease()
+    node_b.keep_lease()
+    assert node_b.owner
+    timer = node_b.state["intermission_timer_thread"]
+    assert timer.args[1:] == (node_b.auto_next_question, 1)
+    assert 0 < timer.args[0] <= 10
+
+
+def test_an_expired_room_lock_is_not_released_or_renewed_by_its_old_holder(redis_server):
+    store = RedisStore(*redis_server.server_address, lock_ttl=0.05)
+
+    with pytest.raises(StoreError, match="lost"):
+        with store.locked("room-lock"):
+            time.sleep(0.1)
+            assert store.acquire("room-lock", "other", 5)
+    assert store.get("room-lock") == "other"
+
+    store.delete("room-lock")
+    with store.locked("room-lock") as lock:
+        time.sleep(0.03)
+        lock.hold()
+        time.sleep(0.03)
+        assert not store.acquire("room-lock", "other", 5)
+    assert store.get("room-lock") is None
+
+
+def test_player_list_deltas_continue_one_sequence_across_nodes(redis_server, make_node, unbatch):
+    node_a, socketio_a, _ = make_node(_store(redis_server), "a")
+    node_b, socketio_b, _ = make_node(_store(redis_server), "b")
+    with contextlib.redirect_stdout(io.StringIO()):
+        node_a.load_or_reset()
+        node_b.load_or_reset()
+        node_a.join("alice", "sid-a", "1.1.1.1")
+        node_b.join("bob", "sid-b", "2.2.2.2")
+        node_a.join("carol", "sid-c", "3.3.3.3")
+
+    deltas = [data for socketio in (socketio_a, socketio_b)
+              for event, payload, to in socketio.sent if to == "shared"
+              for name, data in unbatch(event, payload)
+              if name == "player_list" and not data.get("snapshot")]
+    deltas.sort(key=lambda delta: delta["seq"])
+    assert [delta["seq"] for delta in deltas] == [1, 2, 3]
+    assert [delta["added"][0][0] for delta in deltas] == ["alice", "bob", "carol"]